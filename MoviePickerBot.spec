@@ -5,8 +5,8 @@ a = Analysis(
     ['app.py'],
     pathex=[],
     binaries=[],
-    datas=[('templates', 'templates'), ('static', 'static'), ('data', 'data'), ('scraper', 'scraper')],
-    hiddenimports=['selenium', 'bs4', 'pandas', 'flask', 'requests', 'webbrowser'],
+    datas=[('templates', 'templates'), ('static', 'static'), ('data', 'data'), ('scraper', 'scraper'), ('catalog', 'catalog'), ('monitoring', 'monitoring')],
+    hiddenimports=['selenium', 'bs4', 'pandas', 'scipy', 'flask', 'requests', 'webbrowser', 'PIL.Image'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
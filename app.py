@@ -1,12 +1,32 @@
-from flask import Flask, render_template, request, jsonify
-import pandas as pd
+from flask import (Flask, Response, before_render_template, g, render_template, request, jsonify,
+                   send_from_directory, template_rendered, url_for)
 import os
-# import functions from custom package
-from scraper.movie_scraper import scrape_movies, get_movie_description
+import time
+import gzip
+import hashlib
+import json
+# The scraper (Selenium, requests, BeautifulSoup) and pandas are imported where they are used,
+# so the app starts serving without waiting for them
+from catalog.movie_catalog import get_catalog, store_details, catalog_version, movie_id, ANY_GENRE
+from catalog.deltas import publish_delta, write_movies
+from catalog.genres import GENRE_MODES
+from catalog.description import description_html
+from catalog.pagination import paginate, parse_page_size
+from catalog.text_index import cast_matches
+from scraper.scheduler import RefreshScheduler
+from scraper.posters import VARIANT_DIR, VARIANT_FORMATS, VariantIndex, make_variants
+from monitoring import metrics
+from monitoring.metrics import DOWNLOADED_BYTES, REQUEST_SECONDS, STAGE_SECONDS, timed
+from monitoring.profiling import PROFILE_DIR, PROFILE_MODES, StackSampler, maybe_profiled, profiled
 from datetime import datetime, timedelta
-import requests
 import threading
 
+# Brotli is optional; responses fall back to gzip without it
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 app = Flask(__name__)
 app.secret_key = 'movie_bot_secret_key'  # Required for session
 
@@ -17,6 +37,26 @@ os.makedirs('static/images', exist_ok=True)
 # Path to the CSV file
 DATA_FILE = 'data/movies.csv'
 UPDATE_INTERVAL = timedelta(days=1)  # Update database every day
+REFRESH_JITTER = 0.1  # Scheduled refreshes drift by up to 10% of the interval
+REFRESH_OFF_PEAK_HOURS = (2, 6)  # Scheduled refreshes start between 02:00 and 06:00 (None for any time)
+MIN_COMPRESS_SIZE = 500  # Smaller responses are not worth compressing
+POSTER_MAX_AGE = 365 * 24 * 60 * 60  # Poster variants have fingerprinted names, so browsers keep them for a year
+
+# Profiling is off unless asked for. A request from one of PROFILE_HEADER_HOSTS with the
+# header "X-Profile: cprofile" or "X-Profile: sample" is profiled into data/profiles/;
+# on /quick_update, /update_database and /refresh_ratings the header profiles the job.
+PROFILE_HEADER = 'X-Profile'
+PROFILE_HEADER_HOSTS = ('127.0.0.1', '::1')
+PROFILE_JOBS = None  # 'cprofile' or 'sample' profiles every update job, scheduled ones included
+ALWAYS_ON_SAMPLING = False  # Sample every thread for the life of the app into data/profiles/sampled.folded
+ALWAYS_ON_FLUSH_SECONDS = 60
+
+# Where the app listens when started directly. The browser opens once the port is bound;
+# MOVIEBOT_OPEN_BROWSER=0 and MOVIEBOT_SCHEDULED_REFRESH=0 turn that and the background refresh off
+HOST = '0.0.0.0'
+PORT = int(os.environ.get('MOVIEBOT_PORT', 5000))
+OPEN_BROWSER = os.environ.get('MOVIEBOT_OPEN_BROWSER', '1') != '0'
+SCHEDULED_REFRESH = os.environ.get('MOVIEBOT_SCHEDULED_REFRESH', '1') != '0'
 
 # Global progress tracking
 progress_data = {
@@ -28,6 +68,9 @@ progress_data = {
 # Flag to signal stopping the update process
 stop_update_flag = False
 
+# Held by whichever update is running, so scheduled and manual updates never overlap
+update_lock = threading.Lock()
+
 def should_update_database():
     """Check if database should be updated based on last modification time"""
     if not os.path.exists(DATA_FILE):
@@ -52,11 +95,23 @@ def reset_progress():
     }
     stop_update_flag = False
 
-def run_quick_update():
+def page_url(endpoint, after, before, **params):
+    """Build a next/previous page link, or None if there is no such page"""
+    if not after and not before:
+        return None
+    params = {key: value for key, value in params.items() if value is not False}
+    if after:
+        params['after'] = after
+    else:
+        params['before'] = before
+    return url_for(endpoint, **params)
+
+def run_quick_update(profile=None):
     """Run quick update in a separate thread with progress tracking"""
     try:
         from scraper.movie_scraper import quick_update_titles
-        success = quick_update_titles(update_progress, lambda: stop_update_flag)
+        with update_lock, maybe_profiled('quick_update', profile or PROFILE_JOBS, all_threads=True):
+            success = quick_update_titles(update_progress, lambda: stop_update_flag)
         progress_data['complete'] = True
         progress_data['progress'] = 1.0
         progress_data['status'] = 'Complete' if success else 'Stopped' if stop_update_flag else 'Failed'
@@ -64,10 +119,12 @@ def run_quick_update():
         progress_data['status'] = f"Error: {str(e)}"
         progress_data['complete'] = True
 
-def run_full_update():
+def run_full_update(profile=None):
     """Run full update in a separate thread with progress tracking"""
     try:
-        success = scrape_movies(update_progress, lambda: stop_update_flag)
+        from scraper.movie_scraper import scrape_movies
+        with update_lock, maybe_profiled('full_update', profile or PROFILE_JOBS, all_threads=True):
+            success = scrape_movies(update_progress, lambda: stop_update_flag)
         progress_data['complete'] = True
         progress_data['progress'] = 1.0
         progress_data['status'] = 'Complete' if success else 'Stopped' if stop_update_flag else 'Failed'
@@ -75,6 +132,138 @@ def run_full_update():
         progress_data['status'] = f"Error: {str(e)}"
         progress_data['complete'] = True
 
+def run_rating_refresh(profile=None):
+    """Run the rating refresh in a separate thread with progress tracking"""
+    try:
+        from scraper.movie_scraper import refresh_ratings
+        with update_lock, maybe_profiled('refresh_ratings', profile or PROFILE_JOBS, all_threads=True):
+            refresh_ratings(update_progress, lambda: stop_update_flag)
+        progress_data['complete'] = True
+        progress_data['progress'] = 1.0
+        if stop_update_flag:
+            progress_data['status'] = 'Stopped'
+    except Exception as e:
+        progress_data['status'] = f"Error: {str(e)}"
+        progress_data['complete'] = True
+
+def run_scheduled_refresh(should_stop):
+    """Refresh the database in the background; should_stop pauses while requests are slow"""
+    global stop_update_flag
+    from scraper.movie_scraper import quick_update_titles
+    if not update_lock.acquire(blocking=False):
+        print("Skipping scheduled refresh, an update is already running")
+        return False
+    try:
+        # "Stop Update" stops a scheduled refresh too, but only if clicked while it runs: the flag is
+        # left set after stopping an earlier update, since only manual updates reset it when they start
+        stop_update_flag = False
+        with maybe_profiled('scheduled_refresh', PROFILE_JOBS, all_threads=True):
+            return quick_update_titles(None, lambda: should_stop() or stop_update_flag)
+    finally:
+        update_lock.release()
+
+# Refreshes the database every UPDATE_INTERVAL, counted from the last change of the CSV file
+scheduler = RefreshScheduler(run_scheduled_refresh, UPDATE_INTERVAL, REFRESH_JITTER, REFRESH_OFF_PEAK_HOURS,
+                             last_run=datetime.fromtimestamp(os.path.getmtime(DATA_FILE))
+                             if os.path.exists(DATA_FILE) else None)
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+def requested_profile():
+    """Return the profile mode asked for by the X-Profile header, if the client may ask for one"""
+    mode = request.headers.get(PROFILE_HEADER)
+    if mode in PROFILE_MODES and request.remote_addr in PROFILE_HEADER_HOSTS:
+        return mode
+    return None
+
+@app.before_request
+def start_profile():
+    mode = requested_profile()
+    # Update routes hand the mode to their job instead; the page itself is not worth profiling
+    if mode and request.endpoint not in ('quick_update', 'update_database', 'refresh_ratings_route'):
+        profile = profiled(request.endpoint or 'unmatched', mode)
+        try:
+            g.profile_result = profile.__enter__()
+            g.profile = profile
+        except ValueError as e:
+            # Only one cProfile can be active at a time on newer Pythons
+            print(f"Could not profile request: {e}")
+
+@app.after_request
+def stop_profile(response):
+    """Write the profile of a profiled request and name its file in the X-Profile-File header"""
+    if 'profile' in g:
+        g.pop('profile').__exit__(None, None, None)
+        response.headers['X-Profile-File'] = g.profile_result['path']
+    return response
+
+@app.teardown_request
+def discard_profile(error=None):
+    # A request that failed before after_request still writes its profile
+    if 'profile' in g:
+        g.pop('profile').__exit__(None, None, None)
+
+@app.after_request
+def record_latency(response):
+    """Feed request latency to the scheduler, so refreshes back off under load, and to the metrics"""
+    if 'request_start' in g:
+        seconds = time.perf_counter() - g.request_start
+        scheduler.record_request(seconds)
+        # Labelled by route pattern, so /movie/<path:movie_url> is one series and not one per movie
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe(seconds, route, request.method, response.status_code)
+    return response
+
+def start_render(sender, template, context, **extra):
+    g.render_start = time.perf_counter()
+
+def record_render(sender, template, context, **extra):
+    if 'render_start' in g:
+        STAGE_SECONDS.observe(time.perf_counter() - g.pop('render_start'), 'render')
+
+# Every render_template call is timed as the render stage
+before_render_template.connect(start_render, app)
+template_rendered.connect(record_render, app)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Request latencies, stage timings and counters in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Poster variants on disk, looked up when pages link posters
+poster_index = VariantIndex()
+
+@app.template_global()
+def poster_variants(image_path):
+    """
+    Return the src and, per format, the srcset of a poster's variants, or
+    None if it has none yet (pages then link the original poster)
+    """
+    variants = poster_index.get(image_path) if isinstance(image_path, str) else None
+    if not variants:
+        return None
+    sources = {extension: ', '.join(f"{url_for('poster_file', filename=name)} {width}w"
+                                    for width, name in variants[extension])
+               for extension, _, _ in VARIANT_FORMATS}
+    # The widest variant of the last (most widely supported) format is the fallback src
+    sources['src'] = url_for('poster_file', filename=variants[VARIANT_FORMATS[-1][0]][-1][1])
+    return sources
+
+@app.route('/posters/<path:filename>')
+def poster_file(filename):
+    """Serve a poster variant; its name changes with its content, so it never needs revalidating"""
+    response = send_from_directory(os.path.abspath(VARIANT_DIR), filename, max_age=POSTER_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/scheduler')
+def scheduler_status():
+    """Return the state and next run time of the scheduled refresh as JSON"""
+    return jsonify(scheduler.status())
+
 @app.route('/progress')
 def get_progress():
     """Return current progress data as JSON"""
@@ -92,18 +281,27 @@ def quick_update():
     """Start quick update process and show progress page"""
     reset_progress()
     # Start update in background thread
-    thread = threading.Thread(target=run_quick_update)
+    thread = threading.Thread(target=run_quick_update, args=(requested_profile(),))
     # daemon - a background thread that automatically terminates when the main program exits
     thread.daemon = True
     thread.start()
     return render_template('progress.html', operation='Quick Update (only titles)')
 
+@app.route('/refresh_ratings')
+def refresh_ratings_route():
+    """Start a refresh of the ratings and years of stored movies and show progress page"""
+    reset_progress()
+    thread = threading.Thread(target=run_rating_refresh, args=(requested_profile(),))
+    thread.daemon = True
+    thread.start()
+    return render_template('progress.html', operation='Refresh Ratings')
+
 @app.route('/update_database')
 def update_database():
     """Start full update process and show progress page"""
     reset_progress()
     # Start update in background thread
-    thread = threading.Thread(target=run_full_update)
+    thread = threading.Thread(target=run_full_update, args=(requested_profile(),))
     thread.daemon = True
     thread.start()
     return render_template('progress.html', operation='Full Database Update')
@@ -111,23 +309,24 @@ def update_database():
 @app.route('/movie/<path:movie_url>')
 def get_description(movie_url):
     """Get and update movie description, cast and image"""
-    from scraper.movie_scraper import close_drivers
+    from scraper.movie_scraper import close_drivers, get_movie_description
     
     try:
         print(f"Received request for movie URL: /{movie_url}")
         
-        # Update CSV file with description
-        df = pd.read_csv(DATA_FILE)
-        
         # Check if the movie exists in the database
-        if not any(df['movie_url'] == f"/{movie_url}"):
+        catalog = get_catalog(DATA_FILE)
+        movie = catalog.get(movie_id(movie_url))
+        if movie is None:
             print(f"Movie URL not found in database: /{movie_url}")
             return jsonify({'error': 'Movie not found in database'}), 404
         
         # Check if we already have a description that's not the default
-        movie_row = df.loc[df['movie_url'] == f"/{movie_url}"]
-        description = movie_row['description'].iloc[0]
-        large_image_path = movie_row['large_image_path'].iloc[0] if 'large_image_path' in movie_row and not pd.isna(movie_row['large_image_path'].iloc[0]) else None
+        # (descriptions and cast are kept in the text store, not in the CSV file)
+        details = catalog.details(movie)
+        description = details['description']
+        cast = details['cast']
+        large_image_path = movie['large_image_path'] if isinstance(movie.get('large_image_path'), str) else None
         letterboxd_url = f"https://letterboxd.com{movie_url}"
         
         # If we don't have a proper description or large image, fetch them
@@ -136,7 +335,7 @@ def get_description(movie_url):
             
             # Reset progress for this operation
             reset_progress()
-            update_progress(0.1, f"Fetching details for {movie_row['title'].iloc[0]}")
+            update_progress(0.1, f"Fetching details for {movie['title']}")
             
             # Get description and image from Letterboxd
             movie_details = get_movie_description(f"/{movie_url}")
@@ -146,44 +345,56 @@ def get_description(movie_url):
             # Update description if needed
             # If we only have a placeholder description, replace it with the real description we just fetched from the web, both in the database and in our current response.
             if description == "Details":
-                df.loc[df['movie_url'] == f"/{movie_url}", 'description'] = movie_details['description']
                 description = movie_details['description']
+                # Store the cast as a structured list instead of inside the description
+                cast = movie_details.get('cast', [])
             
             # Download and save larger image if available and needed
+            new_image = False
             if movie_details['large_image_url'] and not large_image_path:
                 try:
                     update_progress(0.7, "Downloading movie image")
-                    # find the row in the DataFrame that has the matching movie URL, extract the movie title from that row, asign to movie_title
-                    movie_title = df.loc[df['movie_url'] == f"/{movie_url}", 'title'].iloc[0]
-                    movie_year = df.loc[df['movie_url'] == f"/{movie_url}", 'year'].iloc[0]
                     # replaces all non_alphanumerics with "_"
-                    safe_title = "".join([c if c.isalnum() else "_" for c in movie_title])
-                    image_filename = f"{safe_title}_{movie_year}_large.jpg"
+                    safe_title = "".join([c if c.isalnum() else "_" for c in movie['title']])
+                    image_filename = f"{safe_title}_{movie['year']}_large.jpg"
                     large_image_path = f"images/{image_filename}"
+                    new_image = True
                     
                     # Check if the image already exists
                     if not os.path.exists(os.path.join('static', large_image_path)):
                         print(f"Downloading image from: {movie_details['large_image_url']}")
-                        response = requests.get(movie_details['large_image_url'], stream=True)
-                        if response.status_code == 200:
-                            with open(os.path.join('static', large_image_path), 'wb') as img_file:
-                                for chunk in response.iter_content(1024):
-                                    img_file.write(chunk)
-                            print(f"Image saved to: {large_image_path}")
-                        else:
-                            print(f"Failed to download image: {response.status_code}")
+                        import requests
+                        with timed('download'):
+                            response = requests.get(movie_details['large_image_url'], stream=True)
+                            if response.status_code == 200:
+                                with open(os.path.join('static', large_image_path), 'wb') as img_file:
+                                    for chunk in response.iter_content(1024):
+                                        img_file.write(chunk)
+                                        DOWNLOADED_BYTES.inc(len(chunk), 'image')
+                                print(f"Image saved to: {large_image_path}")
+                            else:
+                                print(f"Failed to download image: {response.status_code}")
                     else:
                         print(f"Image already exists at: {large_image_path}")
+                    make_variants(large_image_path)
                 except Exception as img_err:
                     print(f"Error downloading large image: {img_err}")
             
-            # Update the large image path in the database
-            if large_image_path:
-                df.loc[df['movie_url'] == f"/{movie_url}", 'large_image_path'] = large_image_path
-            
-            # Save the updated database
+            # Save the updated database; only the image path lives in the CSV file
             update_progress(0.9, "Saving updated database")
-            df.to_csv(DATA_FILE, index=False)
+            texts = []
+            changes = store_details(catalog.texts, movie['movie_id'], description, cast)
+            if changes is not None:
+                texts.append({'movie_url': movie['movie_url'], 'old': changes[0], 'new': changes[1]})
+            # Publish the change as a delta, so every running app patches its catalog instead of rebuilding it
+            if new_image:
+                import pandas as pd
+                df = pd.read_csv(DATA_FILE)
+                updated = df['movie_url'] == movie['movie_url']
+                df.loc[updated, 'large_image_path'] = large_image_path
+                write_movies(df, DATA_FILE, rows=df[updated], texts=texts)
+            elif texts:
+                publish_delta(DATA_FILE, catalog_version(DATA_FILE), texts=texts)
             update_progress(1.0, "Complete")
             
             # Get the Letterboxd URL if available
@@ -192,13 +403,20 @@ def get_description(movie_url):
         else:
             print(f"Using cached description and image for {movie_url}")
         
+        # Similar movies are precomputed per catalog version (and left out while that is still running)
+        catalog = get_catalog(DATA_FILE)
+        movie = catalog.get(movie_id(movie_url))
+        similar = [movie_json(m) for m in catalog.similar(movie)] if movie else []
+        
         response_data = {
-            'description': description,
+            'description': description_html(description, cast),
             'large_image_path': large_image_path,
-            'letterboxd_url': letterboxd_url
+            'large_image': poster_variants(large_image_path),
+            'letterboxd_url': letterboxd_url,
+            'similar': similar
         }
         print(f"Sending response: {response_data}")
-        return jsonify(response_data)
+        return compress_response(jsonify(response_data))
     except Exception as e:
         print(f"Error in get_description: {e}")
         return jsonify({'error': str(e)}), 500
@@ -222,14 +440,16 @@ def index():
     
     # Get available genres for dropdown
     try:
-        df = pd.read_csv(DATA_FILE)
-        db_status['movie_count'] = len(df)
+        # The catalog holds only the light columns, so the home page never reads descriptions
+        catalog = get_catalog(DATA_FILE)
+        db_status['movie_count'] = catalog.row_count
         # Format the timestamp
         timestamp = os.path.getmtime(DATA_FILE)
         db_status['last_updated'] = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
         db_status['status'] = 'Ready'
+        db_status['next_refresh'] = scheduler.next_run.strftime('%Y-%m-%d %H:%M') if scheduler.next_run else None
         
-        if len(df) == 0:
+        if catalog.row_count == 0:
             default_genres = ['Action', 'Drama', 'Comedy', 'Thriller', 'Horror', 'Science Fiction', 
                             'Romance', 'Adventure', 'Crime', 'Documentary']
             db_status['status'] = 'Empty'
@@ -237,12 +457,8 @@ def index():
                                 error="No movies found in database. Using default genres.",
                                 db_status=db_status, current_year=current_year)
         
-        # Extract all unique genres from the comma-separated lists
-        all_genres = []
-        for genre_list in df['genre'].dropna():
-            genres = [g.strip().title() for g in genre_list.split(',')]
-            all_genres.extend(genres)
-        genres = sorted(list(set(all_genres)))
+        # Unique genres are extracted once per catalog version
+        genres = list(catalog.genres)
 
         
         if not genres:
@@ -256,83 +472,106 @@ def index():
         
     return render_template('index.html', genres=genres, db_status=db_status, current_year=current_year)
 
-@app.route('/recommend', methods=['POST'])
+def parse_genre_filter(values):
+    """Validate the extra genres to combine (AND/OR) or exclude (NOT)"""
+    genre_mode = values.get('genre_mode', 'or').lower()
+    return {
+        'genres': [g.strip()[:50] for g in values.getlist('genres') if g.strip()][:20],
+        'genre_mode': genre_mode if genre_mode in GENRE_MODES else 'or',
+        'exclude': [g.strip()[:50] for g in values.getlist('exclude') if g.strip()][:20]
+    }
+
+def recommendation_ranking(catalog, selected_genre, genre_filter):
+    """Return the ranking for a genre, combined with any extra genres to include or exclude"""
+    include = list(genre_filter['genres'])
+    if selected_genre != "Any Genre":
+        include.insert(0, selected_genre)
+    
+    # A single genre uses the ranking precomputed for it
+    if len(include) <= 1 and not genre_filter['exclude']:
+        return catalog.ranking(include[0] if include else ANY_GENRE)
+    return catalog.filtered_ranking(include, genre_filter['genre_mode'], genre_filter['exclude'])
+
+def describe_genres(selected_genre, genre_filter):
+    """Describe a genre selection for page titles"""
+    include = list(genre_filter['genres'])
+    if selected_genre != "Any Genre" or not include:
+        include.insert(0, selected_genre)
+    joiner = ' and ' if genre_filter['genre_mode'] == 'and' else ' or '
+    description = joiner.join(include)
+    if genre_filter['exclude']:
+        description += f" (excluding {', '.join(genre_filter['exclude'])})"
+    return description
+
+@app.route('/recommend', methods=['GET', 'POST'])
 def recommend():
-    # Get and validate genre parameter
-    selected_genre = request.form.get('genre', '')
+    # Parameters come from the form (first page) or the query string (next/previous links)
+    selected_genre = request.values.get('genre', '')
     if not selected_genre:
         return render_template('index.html', 
                               error="Please select a genre",
-                              genres=sorted(pd.read_csv(DATA_FILE)['genre'].unique()),
+                              genres=get_catalog(DATA_FILE).genres,
                               current_year=datetime.now().year)
     
-    # Validate random parameter
-    is_random = request.form.get('random') == 'true'
+    # Validate random parameter ("weighted" favours higher rated movies)
+    random_mode = request.values.get('random')
+    is_random = random_mode in ('true', 'weighted')
+    page_size = parse_page_size(request.values.get('page_size'), default=5)
+    genre_filter = parse_genre_filter(request.values)
     
     try:
-        # Load the data
-        df = pd.read_csv(DATA_FILE)
-        
-        # Filter by genre (unless "Any Genre" is selected)
-        if selected_genre == "Any Genre":
-            movies = df
-        else:
-            # Sanitize genre input
-            selected_genre = selected_genre.strip()[:50]  # Limit length for security
-            movies = df[df['genre'].str.contains(selected_genre, case=False)]
-            
-            # If no movies found for this genre, return to index with error
-            if len(movies) == 0:
-                return render_template('index.html', 
-                                      error=f"No movies found for genre: {selected_genre}",
-                                      genres=sorted(df['genre'].unique()),
-                                      current_year=datetime.now().year)
-        
-        # Deduplicate movies by URL
-        unique_movies = []
-        seen_urls = set()
+        # Rankings are precomputed once per catalog version
+        catalog = get_catalog(DATA_FILE)
         
-        for _, movie in movies.iterrows():
-            if movie['movie_url'] not in seen_urls:
-                movie_dict = movie.to_dict()
-                # Convert genre to title case
-                if 'genre' in movie_dict and movie_dict['genre']:
-                    movie_dict['genre'] = ', '.join(g.strip().title() for g in movie_dict['genre'].split(','))
-                unique_movies.append(movie_dict)
-                seen_urls.add(movie['movie_url'])
+        # Sanitize genre input
+        selected_genre = selected_genre.strip()[:50]  # Limit length for security
+        with timed('filter'):
+            ranking = recommendation_ranking(catalog, selected_genre, genre_filter)
+        genre_label = describe_genres(selected_genre, genre_filter)
         
-        # Sort by rating
-        unique_movies = sorted(unique_movies, key=lambda x: x['rating'], reverse=True)
+        # If no movies found for this genre, return to index with error
+        if not ranking:
+            return render_template('index.html', 
+                                  error=f"No movies found for genre: {genre_label}",
+                                  genres=catalog.genres,
+                                  current_year=datetime.now().year)
         
-        # If random pick is requested, select a random movie
-        if is_random and unique_movies:
-            import random
-            recommendations = [random.choice(unique_movies)]
+        # If random pick is requested, draw a random movie in constant time
+        if is_random:
+            if random_mode == 'weighted':
+                recommendations = [ranking.weighted_pick()]
+            else:
+                recommendations = [ranking.pick()]
             return render_template('results.html', 
                                   recommendations=recommendations, 
-                                  genre=selected_genre,
+                                  genre=genre_label,
                                   is_random=True)
         else:
-            # Get top 5 recommendations
-            recommendations = unique_movies[:5]
+            # Get one page of top recommendations
+            with timed('filter'):
+                page = paginate(ranking, page_size,
+                                after=request.values.get('after'),
+                                before=request.values.get('before'))
             
             return render_template('results.html', 
-                                  recommendations=recommendations, 
-                                  genre=selected_genre)
+                                  recommendations=page.items, 
+                                  genre=genre_label,
+                                  next_url=page_url('recommend', page.next_cursor, None, genre=selected_genre,
+                                                    page_size=page_size, **genre_filter),
+                                  prev_url=page_url('recommend', None, page.prev_cursor, genre=selected_genre,
+                                                    page_size=page_size, **genre_filter))
     except Exception as e:
         return render_template('index.html', 
-                              error=f"Error processing recommendation: {str(e)}",
-                              genres=sorted(df['genre'].unique()))
+                              error=f"Error processing recommendation: {str(e)}")
 
-# Search and Filtering Functionality
-@app.route('/search', methods=['GET'])
-def search():
+def parse_search_filters(args):
+    """Validate the search query and filters from the request arguments"""
     # Get and sanitize input parameters
-    query = request.args.get('query', '').lower().strip()
+    query = args.get('query', '').lower().strip()
     
     # Validate year inputs
     try:
-        min_year = request.args.get('min_year', '')
+        min_year = args.get('min_year', '')
         if min_year:
             min_year = int(min_year)
             if min_year < 1900 or min_year > datetime.now().year:
@@ -341,7 +580,7 @@ def search():
         min_year = 1900
         
     try:
-        max_year = request.args.get('max_year', '')
+        max_year = args.get('max_year', '')
         if max_year:
             max_year = int(max_year)
             if max_year < 1900 or max_year > datetime.now().year:
@@ -355,7 +594,7 @@ def search():
     
     # Validate rating input
     try:
-        min_rating = request.args.get('min_rating', '')
+        min_rating = args.get('min_rating', '')
         if min_rating:
             min_rating = float(min_rating)
             if min_rating < 0 or min_rating > 5:
@@ -363,64 +602,300 @@ def search():
     except (ValueError, TypeError):
         min_rating = 0
     
-    try:
-        df = pd.read_csv(DATA_FILE)
-        
-        # Filter by search query (title or description)
+    filters = {
+        'query': query[:100],  # Limit query length for security
+        'min_year': min_year,
+        'max_year': max_year,
+        'min_rating': min_rating,
+        'actor': args.get('actor', '').strip()[:100],
+        'fuzzy': args.get('fuzzy') in ('1', 'true', 'on'),
+        'page_size': parse_page_size(args.get('page_size'))
+    }
+    filters.update(parse_genre_filter(args))
+    return filters
+
+def search_ranking(filters, catalog):
+    """Return the ranking to walk for a search, narrowed by index lookups where possible"""
+    candidates = None
+    
+    def narrow(found):
+        # Keep only the movies every index lookup so far agrees on
+        nonlocal candidates
+        found = set(found.tolist()) if hasattr(found, 'tolist') else found
+        candidates = found if candidates is None else candidates & found
+    
+    # The actor and full-text indexes are built in the background; until then the predicate checks every movie
+    actor_index = catalog.actor_index if filters['actor'] else None
+    if actor_index is not None:
+        # Only the actor's movies need to be checked against the other filters
+        narrow(actor_index.movie_indexes(filters['actor']))
+    if filters['min_year'] or filters['max_year']:
+        narrow(catalog.year_index.range(filters['min_year'] or None, filters['max_year'] or None))
+    if filters['min_rating']:
+        narrow(catalog.rating_index.range(filters['min_rating']))
+    text_index = catalog.text_index if filters['query'] else None
+    if text_index is not None:
+        found = text_index.candidates(filters['query'])
+        if found is not None and filters['fuzzy']:
+            # Typo-tolerant title matches need not contain the query itself
+            found |= set(catalog.title_index.fuzzy_scores(filters['query']))
+        if found is not None:
+            narrow(found)
+    
+    if candidates is None and not filters['genres'] and not filters['exclude']:
+        return catalog.ranking(ANY_GENRE)
+    return catalog.filtered_ranking(filters['genres'], filters['genre_mode'], filters['exclude'], candidates)
+
+def search_predicate(filters, catalog):
+    """Build a function checking a movie against the search query and filters"""
+    query = filters['query']
+    min_year = filters['min_year']
+    max_year = filters['max_year']
+    min_rating = filters['min_rating']
+    # Without the actor index the cast of each movie is checked
+    actor = filters['actor'] if filters['actor'] and catalog.actor_index is None else ''
+    
+    # Typo-tolerant mode matches titles through the trigram index
+    fuzzy_matches = None
+    if query and filters['fuzzy']:
+        fuzzy_matches = catalog.title_index.fuzzy_scores(query)
+    
+    def matches(movie):
+        # Filter by search query (title, description or cast)
         if query:
-            # Limit query length for security
-            query = query[:100]
-            df = df[df['title'].str.lower().str.contains(query, na=False) | 
-                   df['description'].str.lower().str.contains(query, na=False)]
+            if fuzzy_matches is not None:
+                title_match = movie['index'] in fuzzy_matches
+            else:
+                title_match = query in str(movie['title']).lower()
+            if not title_match:
+                # Descriptions and cast are read from the text store only when needed
+                details = catalog.details(movie)
+                description = details['description'] if isinstance(details['description'], str) else ''
+                if (query not in description.lower()
+                        and not any(query in name.lower() for name in details['cast'])):
+                    return False
         
         # Filter by year range
-        if min_year:
-            df = df[df['year'].astype(str).str.extract(r'(\d+)', expand=False).astype(float) >= float(min_year)]
-        
-        if max_year:
-            df = df[df['year'].astype(str).str.extract(r'(\d+)', expand=False).astype(float) <= float(max_year)]
+        if min_year or max_year:
+            year = movie['year_value']
+            if year is None:
+                return False
+            if min_year and year < min_year:
+                return False
+            if max_year and year > max_year:
+                return False
         
         # Filter by minimum rating
-        if min_rating:
-            df = df[df['rating'] >= float(min_rating)]
-        
-        # Deduplicate movies by URL
-        unique_movies = []
-        seen_urls = set()
-        
-        for _, movie in df.iterrows():
-            if movie['movie_url'] not in seen_urls:
-                movie_dict = movie.to_dict()
-                # Convert genre to title case
-                if 'genre' in movie_dict and movie_dict['genre']:
-                    movie_dict['genre'] = ', '.join(g.strip().title() for g in movie_dict['genre'].split(','))
-                unique_movies.append(movie_dict)
-                seen_urls.add(movie['movie_url'])
+        if min_rating and movie['rating'] < min_rating:
+            return False
         
-        # Sort by rating
-        unique_movies = sorted(unique_movies, key=lambda x: x['rating'], reverse=True)
-        
-        # Get top 10 results
-        results = unique_movies[:10]
+        if actor and not cast_matches(actor, catalog.details(movie)['cast']):
+            return False
+        return True
+    
+    return matches
+
+# Search and Filtering Functionality
+@app.route('/search', methods=['GET'])
+def search():
+    filters = parse_search_filters(request.args)
+    
+    try:
+        catalog = get_catalog(DATA_FILE)
         
-        # Get all genres for the filter dropdown
-        all_genres = []
-        for genre_list in df['genre'].dropna():
-            genres = [g.strip().title() for g in genre_list.split(',')]
-            all_genres.extend(genres)
-        genres = sorted(list(set(all_genres)))
+        # Walk the precomputed rating order from the cursor until the page is full
+        with timed('filter'):
+            # The predicate comes first: it checks the cast itself while the actor index is not built
+            predicate = search_predicate(filters, catalog)
+            page = paginate(search_ranking(filters, catalog), filters['page_size'],
+                            after=request.args.get('after'),
+                            before=request.args.get('before'),
+                            predicate=predicate)
         
         return render_template('search_results.html', 
-                              results=results, 
-                              query=query,
-                              min_year=min_year,
-                              max_year=max_year,
-                              min_rating=min_rating,
-                              genres=genres)
+                              results=page.items, 
+                              query=filters['query'],
+                              min_year=filters['min_year'],
+                              max_year=filters['max_year'],
+                              min_rating=filters['min_rating'],
+                              actor=filters['actor'],
+                              fuzzy=filters['fuzzy'],
+                              search_genres=filters['genres'],
+                              genre_mode=filters['genre_mode'],
+                              exclude=filters['exclude'],
+                              genres=catalog.genres,
+                              next_url=page_url('search', page.next_cursor, None, **filters),
+                              prev_url=page_url('search', None, page.prev_cursor, **filters))
     except Exception as e:
         return render_template('index.html', error=f"Error searching: {str(e)}")
 
 
+# JSON API
+def movie_json(movie, details=None):
+    """Convert a catalog movie to a JSON-serializable dict, with its text if details are given"""
+    data = {
+        'id': movie['movie_id'],
+        'title': movie['title'],
+        'year': movie['year_value'],
+        'rating': movie['rating'],
+        'genres': movie['genres'],
+        'image_path': movie['image_path'] if isinstance(movie['image_path'], str) else None,
+        'movie_url': movie['movie_url']
+    }
+    if details is not None:
+        large_image_path = movie.get('large_image_path')
+        description = details['description']
+        data['large_image_path'] = large_image_path if isinstance(large_image_path, str) else None
+        # "Details" is the placeholder for a description that was not fetched yet
+        data['description'] = description if isinstance(description, str) and description != "Details" else None
+        data['cast'] = details['cast']
+        data['letterboxd_url'] = f"https://letterboxd.com{movie['movie_url']}"
+    return data
+
+def catalog_etag(catalog):
+    """Derive an ETag from the catalog version, its journal offset and the request URL"""
+    # Descriptions and cast change through text deltas that leave the CSV file (and so the version) as it
+    # was; the journal offset moves with every delta the catalog has applied. Similar movies are left out
+    # until the content indexes are built, so responses from before that get their own ETag
+    seed = f"{catalog.version}:{catalog.journal_offset}:{catalog.content_ready}:{request.full_path}"
+    return hashlib.sha1(seed.encode('utf-8')).hexdigest()[:20]
+
+def compress_response(response):
+    """Compress a response body with the best encoding the client accepts"""
+    response.vary.add('Accept-Encoding')
+    if response.direct_passthrough or response.content_encoding:
+        return response
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_SIZE:
+        return response
+    
+    offers = ['br', 'gzip'] if brotli else ['gzip']
+    encoding = request.accept_encodings.best_match(offers)
+    if encoding == 'br':
+        response.set_data(brotli.compress(body))
+    elif encoding == 'gzip':
+        response.set_data(gzip.compress(body, compresslevel=6))
+    else:
+        return response
+    response.content_encoding = encoding
+    return response
+
+def api_response(build_payload, catalog=None, status=200):
+    """
+    Build a compact, compressed JSON response.
+
+    When a catalog is given the response gets an ETag derived from the
+    catalog version, and a matching If-None-Match is answered with 304
+    before the payload is even built.
+    """
+    etag = catalog_etag(catalog) if catalog is not None else None
+    if etag and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        body = json.dumps(build_payload(), separators=(',', ':'), ensure_ascii=False)
+        response = Response(body, status=status, mimetype='application/json')
+        response = compress_response(response)
+    
+    if etag:
+        # Weak, because the same ETag covers every content encoding
+        response.set_etag(etag, weak=True)
+        response.cache_control.public = True
+        response.cache_control.no_cache = True
+    else:
+        response.cache_control.no_store = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+def api_error(message, status):
+    """Return a JSON error response"""
+    return api_response(lambda: {'error': message}, status=status)
+
+@app.route('/api/recommend')
+def api_recommend():
+    """Top rated movies (or a random pick) for a genre as JSON"""
+    selected_genre = request.args.get('genre', 'Any Genre').strip()[:50]
+    random_mode = request.args.get('random')
+    page_size = parse_page_size(request.args.get('page_size'), default=5)
+    genre_filter = parse_genre_filter(request.args)
+    
+    catalog = get_catalog(DATA_FILE)
+    ranking = recommendation_ranking(catalog, selected_genre, genre_filter)
+    if not ranking:
+        return api_error(f"No movies found for genre: {describe_genres(selected_genre, genre_filter)}", 404)
+    
+    # Random picks differ on every request, so they are never cached
+    if random_mode in ('true', 'weighted'):
+        movie = ranking.weighted_pick() if random_mode == 'weighted' else ranking.pick()
+        return api_response(lambda: {'genre': selected_genre, 'movies': [movie_json(movie)]})
+    
+    def build_payload():
+        with timed('filter'):
+            page = paginate(ranking, page_size,
+                            after=request.args.get('after'),
+                            before=request.args.get('before'))
+        return {
+            'genre': selected_genre,
+            'movies': [movie_json(movie) for movie in page.items],
+            'next': page.next_cursor,
+            'prev': page.prev_cursor
+        }
+    
+    return api_response(build_payload, catalog)
+
+@app.route('/api/search')
+def api_search():
+    """Search results as JSON, using the same filters as /search"""
+    filters = parse_search_filters(request.args)
+    catalog = get_catalog(DATA_FILE)
+    
+    def build_payload():
+        with timed('filter'):
+            # The predicate comes first: it checks the cast itself while the actor index is not built
+            predicate = search_predicate(filters, catalog)
+            page = paginate(search_ranking(filters, catalog), filters['page_size'],
+                            after=request.args.get('after'),
+                            before=request.args.get('before'),
+                            predicate=predicate)
+        return {
+            'movies': [movie_json(movie) for movie in page.items],
+            'next': page.next_cursor,
+            'prev': page.prev_cursor
+        }
+    
+    return api_response(build_payload, catalog)
+
+@app.route('/api/suggest')
+def api_suggest():
+    """Title autocomplete suggestions as JSON"""
+    prefix = request.args.get('q', '')[:100]
+    limit = parse_page_size(request.args.get('limit'), default=8)
+    catalog = get_catalog(DATA_FILE)
+    
+    def build_payload():
+        return {
+            'suggestions': [
+                {'id': movie['movie_id'], 'title': movie['title'], 'year': movie['year_value']}
+                for movie in catalog.title_index.suggest(prefix, limit)
+            ]
+        }
+    
+    return api_response(build_payload, catalog)
+
+@app.route('/api/movies/<movie_id>')
+def api_movie(movie_id):
+    """A single movie with its description as JSON"""
+    catalog = get_catalog(DATA_FILE)
+    movie = catalog.get(movie_id)
+    if movie is None:
+        return api_error('Movie not found in database', 404)
+    def build_payload():
+        data = movie_json(movie, catalog.details(movie))
+        data['similar'] = [movie_json(m) for m in catalog.similar(movie)]
+        return data
+    
+    return api_response(build_payload, catalog)
+
+
 @app.errorhandler(404)
 def page_not_found(error):
     return render_template('error.html',
@@ -488,22 +963,41 @@ if not os.path.exists(DATA_FILE):
         print("Created sample movies.csv file")
 
 def open_browser():
-    """Open browser after a short delay"""
-    import time
+    """Open the app in the browser"""
     import webbrowser
-    time.sleep(1.5)  # Wait for Flask to start
-    webbrowser.open('http://localhost:5000')
+    webbrowser.open(f'http://localhost:{PORT}')
 
 if __name__ == '__main__':
+    # Parse workers are spawned processes; in the frozen build they must not start another server
+    import multiprocessing
+    multiprocessing.freeze_support()
+    
     # Print startup message
     print("Starting Movie Picker Bot...")
     print(f"Working directory: {os.getcwd()}")
     print(f"Data directory: {os.path.abspath('data')}")
     print(f"Movies CSV path: {os.path.abspath(DATA_FILE)}")
     
-    # Start browser in a separate thread
-    import threading
-    threading.Thread(target=open_browser, daemon=True).start()
+    # Refresh in the background on a schedule, right away (off-peak) if the data is already stale
+    if SCHEDULED_REFRESH:
+        if should_update_database():
+            scheduler.run_soon()
+        scheduler.start()
+    
+    if ALWAYS_ON_SAMPLING:
+        StackSampler(path=os.path.join(PROFILE_DIR, 'sampled.folded'), interval=0.01,
+                     flush_seconds=ALWAYS_ON_FLUSH_SECONDS).start()
+    
+    # Load the catalog while the server starts, so the first page does not wait for it
+    threading.Thread(target=get_catalog, args=(DATA_FILE,), daemon=True).start()
+    
+    # Bind the port first and open the browser as soon as it accepts connections,
+    # instead of guessing how long Flask takes to start
+    from werkzeug.serving import make_server
+    server = make_server(HOST, PORT, app, threaded=True)
+    print(f"Serving on http://localhost:{PORT}")
+    if OPEN_BROWSER:
+        threading.Thread(target=open_browser, daemon=True).start()
     
     # Start Flask app
-    app.run(debug=False, host='0.0.0.0', port=5000, use_reloader=False)
\ No newline at end of file
+    server.serve_forever()
\ No newline at end of file
@@ -0,0 +1,231 @@
+"""
+A local stand-in for letterboxd.com, for exercising the scraper offline.
+
+    python -m benchmarks.letterboxd_fixture [--port 8765] [--latency 0.05] [--throttle-rate 0.05]
+
+Serves genre listings, film detail pages and posters in the markup the
+parsers expect, built from the stored catalog (data/movies.csv, its text
+store and static/images) or from a synthetic catalog. Responses can be
+delayed, fail with a 500 or be throttled with a 429 at configurable rates.
+Point the scraper at it with LETTERBOXD_BASE_URL=http://127.0.0.1:8765.
+"""
+import argparse
+import html
+import os
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+from catalog.description import parse_description
+from catalog.movie_table import movie_id
+from catalog.text_store import NO_DESCRIPTION, TextStore, text_store_path
+
+# Movies per genre listing page, as on Letterboxd
+LISTING_PAGE_SIZE = 72
+
+# Served for movies without a stored poster; the scraper only saves the bytes, so a bare JPEG header will do
+PLACEHOLDER_POSTER = bytes.fromhex('ffd8ffe000104a46494600010100000100010000ffd9')
+
+
+class FixtureSite:
+    """The pages of the stand-in site, built once from a catalog DataFrame"""
+
+    def __init__(self, df, texts=None, static_dir='static'):
+        self.static_dir = static_dir
+        self.listings = {}
+        self.films = {}
+        for movie in df.to_dict('records'):
+            slug = movie_id(movie.get('movie_url'))
+            if not slug:
+                continue
+            details = self._details(movie, texts.get(slug) if texts is not None else None)
+            self.films[slug] = {**movie, **details, 'slug': slug}
+            for genre in str(movie.get('genre', '')).split(','):
+                if genre.strip():
+                    self.listings.setdefault(genre.strip().lower(), []).append(slug)
+
+    @staticmethod
+    def _details(movie, stored):
+        """Return the tagline, synopsis and cast of a movie, from the CSV row or the text store"""
+        description = movie.get('description')
+        if (not isinstance(description, str) or description == NO_DESCRIPTION) and stored is not None:
+            description = stored['description']
+        parts = parse_description(description)
+        if stored is not None and stored['cast']:
+            parts['cast'] = stored['cast']
+        elif isinstance(movie.get('cast'), list):
+            parts['cast'] = movie['cast']
+        return parts
+
+    def listing(self, base_url, genre, page):
+        slugs = self.listings.get(genre, [])[(page - 1) * LISTING_PAGE_SIZE:page * LISTING_PAGE_SIZE]
+        items = []
+        for slug in slugs:
+            film = self.films[slug]
+            title = html.escape(str(film['title']))
+            rating = f" {film['rating']:.2f}" if isinstance(film['rating'], float) and film['rating'] > 0 else ''
+            items.append(
+                f'<li class="poster-container"><div class="film-poster" data-film-name="{title}">'
+                f'<img src="{base_url}/posters/{slug}.jpg" alt="{title}">'
+                f'<a class="frame" href="/film/{slug}/" data-original-title="{title} ({film["year"]}){rating}">'
+                f'<span class="frame-title">{title} ({film["year"]})</span></a></div></li>')
+        return f'<html><body><ul class="poster-list">{"".join(items)}</ul></body></html>'
+
+    def film(self, base_url, slug):
+        film = self.films.get(slug)
+        if film is None:
+            return None
+        cast = ''.join(f'<a class="text-slug" href="/actor/{html.escape(name)}/">{html.escape(name)}</a>'
+                       for name in film['cast'])
+        return (f'<html><body><div class="film-poster">'
+                f'<img class="image" src="{base_url}/posters/{slug}-large.jpg"></div><h4 class="tagline">{html.escape(film["tagline"])}</h4>'
+                f'<div class="truncate"><p>{html.escape(film["synopsis"])}</p></div>'
+                f'<div class="cast-list text-sluglist">{cast}</div></body></html>')
+
+    def poster(self, name):
+        slug, large = (name[:-len('-large')], True) if name.endswith('-large') else (name, False)
+        film = self.films.get(slug)
+        if film is None:
+            return None
+        path = film.get('large_image_path') if large else None
+        path = path if isinstance(path, str) else film.get('image_path')
+        if isinstance(path, str) and os.path.exists(os.path.join(self.static_dir, path)):
+            with open(os.path.join(self.static_dir, path), 'rb') as f:
+                return f.read()
+        return PLACEHOLDER_POSTER
+
+
+def stored_site(data_file='data/movies.csv', static_dir='static'):
+    """Build the site from the stored catalog, with descriptions from its text store when there is one"""
+    store = text_store_path(data_file)
+    texts = TextStore(store) if os.path.exists(store) else None
+    return FixtureSite(pd.read_csv(data_file), texts, static_dir)
+
+
+class FixtureServer(ThreadingHTTPServer):
+    """
+    Serves a FixtureSite with injected latency, errors and throttling.
+
+    Every response waits latency plus up to jitter seconds; error_rate of
+    them fail with a 500 and throttle_rate are refused with a 429 carrying
+    Retry-After. Counts per (kind, status) are kept in stats.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, site, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 throttle_rate=0.0, retry_after=1.0, seed=None):
+        super().__init__((host, port), FixtureHandler)
+        self.site = site
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.stats = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def draw(self):
+        """Return (delay, injected status or None) for one response"""
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            roll = self._random.random()
+        if roll < self.throttle_rate:
+            return delay, 429
+        if roll < self.throttle_rate + self.error_rate:
+            return delay, 500
+        return delay, None
+
+    def count(self, kind, status):
+        with self._lock:
+            self.stats[(kind, status)] += 1
+
+    def start(self):
+        """Serve on a background thread; returns the server"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server = self.server
+        parts = [part for part in self.path.split('?')[0].split('/') if part]
+        kind, body, content_type = 'unknown', None, 'text/html; charset=utf-8'
+        if len(parts) >= 3 and parts[:2] == ['films', 'genre']:
+            page = int(parts[-1]) if parts[-2] == 'page' and parts[-1].isdigit() else 1
+            kind, body = 'listing', server.site.listing(server.base_url, parts[2].lower(), page).encode('utf-8')
+        elif len(parts) == 2 and parts[0] == 'film':
+            kind, body = 'film', server.site.film(server.base_url, parts[1])
+            body = body.encode('utf-8') if body is not None else None
+        elif len(parts) == 2 and parts[0] == 'posters' and parts[1].endswith('.jpg'):
+            kind, body, content_type = 'poster', server.site.poster(parts[1][:-len('.jpg')]), 'image/jpeg'
+
+        delay, injected = server.draw()
+        if delay:
+            time.sleep(delay)
+        if injected == 429:
+            self.send_response(429)
+            self.send_header('Retry-After', f"{server.retry_after:g}")
+            self.end_headers()
+            status = 429
+        elif injected == 500 or body is None:
+            status = 500 if injected else 404
+            self.send_error(status)
+        else:
+            status = 200
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        server.count(kind, status)
+
+    def log_message(self, format, *args):
+        # Throughput runs make thousands of requests; the stats hold what matters
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.letterboxd_fixture',
+                                     description='Local Letterboxd stand-in for the scraper')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--data-file', default='data/movies.csv', help='catalog the pages are built from')
+    parser.add_argument('--synthetic', type=int, default=0, help='serve this many synthetic movies instead')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds every response waits')
+    parser.add_argument('--jitter', type=float, default=0.0, help='up to this many more seconds, at random')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of responses failing with 500')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='share of responses refused with 429')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After of throttled responses')
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        from benchmarks.synthetic import synthetic_movies
+        site = FixtureSite(synthetic_movies(args.synthetic))
+    else:
+        site = stored_site(args.data_file)
+    server = FixtureServer(site, port=args.port, latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                           retry_after=args.retry_after)
+    print(f"Serving {len(site.films)} films in {len(site.listings)} genres at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for (kind, status), count in sorted(server.stats.items()):
+            print(f"{kind:>8} {status}: {count}")
+
+
+if __name__ == '__main__':
+    import multiprocessing
+    multiprocessing.freeze_support()
+    main()
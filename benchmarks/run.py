@@ -0,0 +1,293 @@
+"""
+Benchmarks of the catalog and the Flask routes over synthetic catalogs.
+
+    python -m benchmarks.run [--sizes 1000,10000] [--repeat 5] [--save]
+
+Every case is timed on a freshly generated catalog of each size and
+compared with the saved baseline; a case slower than its baseline by more
+than the tolerance is reported as a regression and the run exits with
+status 1, as it does for a case without a baseline. Without a baseline
+file the run stops before timing anything. --save records the timings of
+this run as the new baseline.
+Baselines depend on the machine, so save them on the machine that runs the
+comparison. Each size runs in its own process, so a size that runs out of
+memory fails the run without losing the timings of the others.
+"""
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+import app as movie_app
+from catalog import movie_catalog
+from catalog.deltas import catalog_version, publish_delta, write_movies
+from catalog.movie_catalog import MovieCatalog, clear_catalog, get_catalog, load_catalog, store_details, write_snapshot
+from catalog.movie_table import movie_id
+from benchmarks.synthetic import write_catalog
+
+# Catalog sizes benchmarked by default
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# The similarity index grows faster than linearly, so it is only timed up to this size
+SIMILARITY_MAX_SIZE = 100_000
+
+# Index builds of larger catalogs take long enough to be timed once
+REPEAT_BUILDS_MAX_SIZE = 10_000
+
+# A case regresses when it is this much slower than its baseline...
+TOLERANCE = 0.25
+# ...and by more than this many milliseconds, so timer noise on fast cases is not a regression
+MIN_REGRESSION_MS = 5.0
+# Cases ending in this suffix measure bytes per movie instead of milliseconds; they regress by more than
+# MIN_REGRESSION_BYTES over their baseline
+BYTES_SUFFIX = '_bytes'
+MIN_REGRESSION_BYTES = 16
+
+# Requests timed through the Flask test client
+REQUESTS = {
+    'index': '/',
+    'recommend_genre': '/recommend?genre=drama',
+    'recommend_filter': '/recommend?genre=Any Genre&genres=drama&genres=crime&genre_mode=and&exclude=comedy',
+    'search_range': '/search?min_year=1990&max_year=1999&min_rating=3.8'
+}
+# Requests that need the text indexes, timed once they are built
+TEXT_REQUESTS = {
+    'search_text': '/search?query=night river',
+    'search_actor': '/search?actor=clara',
+    'api_search': '/api/search?query=love&min_rating=3'
+}
+
+
+def best_ms(fn, repeat, warmup=True):
+    """
+    Run fn repeat times (plus one untimed run) and return the fastest time
+    in milliseconds; background work such as index patches only ever adds
+    time, so the fastest run is the most repeatable one
+    """
+    if warmup:
+        fn(-1)
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(i)
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+
+def best_build_ms(data_file, build, repeat):
+    """Return the fastest of repeat index builds, each on a freshly loaded catalog"""
+    times = []
+    for _ in range(repeat):
+        catalog = load_catalog(data_file)
+        start = time.perf_counter()
+        build(catalog)
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+
+def catalog_memory(data_file):
+    """
+    Return the bytes per movie of the catalog columns (MovieTable.nbytes) and
+    of everything a catalog built from the CSV file keeps allocated, as
+    traced by tracemalloc (numpy arrays included; the text store is not read)
+    """
+    df = pd.read_csv(data_file)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        catalog = MovieCatalog(df)
+        traced = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return catalog.movies.nbytes / len(catalog), traced / len(catalog)
+
+
+def get(client, url):
+    response = client.get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f"{url} returned {response.status_code}")
+    return response
+
+
+def results_path(workdir, count):
+    return os.path.join(workdir, f"results-{count}.json")
+
+
+def bench_size(count, repeat, workdir):
+    """
+    Generate a catalog of count movies and time every case on it.
+
+    Timings are saved to the results file after every case, cheapest first,
+    so the cases finished before a size runs out of memory are not lost.
+    """
+    directory = os.path.join(workdir, str(count))
+    start = time.perf_counter()
+    data_file = write_catalog(directory, count)
+    print(f"Generated {count} movies in {time.perf_counter() - start:.1f} s")
+
+    results = {}
+
+    def record(case, ms):
+        results[case] = ms
+        with open(results_path(workdir, count), 'w', encoding='utf-8') as f:
+            json.dump(results, f)
+
+    # Indexes are built in the foreground, so no background build competes with the timed requests;
+    # catalog_load times a build from the CSV file and snapshot_load a start from the saved catalog
+    movie_catalog.BUILD_CONTENT_IN_BACKGROUND = False
+    movie_catalog.CATALOG_SNAPSHOT = False
+    movie_app.DATA_FILE = data_file
+
+    def load(i):
+        clear_catalog()
+        get_catalog(data_file)
+    record('catalog_load', best_ms(load, min(repeat, 3), warmup=False))
+
+    write_snapshot(get_catalog(data_file), data_file)
+    movie_catalog.CATALOG_SNAPSHOT = True
+    record('snapshot_load', best_ms(load, min(repeat, 3), warmup=False))
+    movie_catalog.CATALOG_SNAPSHOT = False
+
+    client = movie_app.app.test_client()
+    for case, url in REQUESTS.items():
+        record(case, best_ms(lambda i: get(client, url), repeat))
+
+    # Enrichment writes: store a description, publish it as a delta, and serve the next request with it
+    movies = pd.read_csv(data_file)
+    texts = get_catalog(data_file).texts
+
+    def enrich(i):
+        movie_url = movies['movie_url'].iat[i + 1]
+        changes = store_details(texts, movie_id(movie_url), f"<strong>Benchmark {i}</strong><br>Synopsis.",
+                                ['Benchmark Actor'])
+        publish_delta(data_file, catalog_version(data_file),
+                      texts=[{'movie_url': movie_url, 'old': changes[0], 'new': changes[1]}])
+        get(client, REQUESTS['recommend_genre'])
+    record('enrich_write', best_ms(enrich, repeat))
+    # A fast write is no good if the catalog lost the text on the way
+    enriched = get_catalog(data_file).get(movie_id(movies['movie_url'].iat[repeat]))
+    if get_catalog(data_file).details(enriched)['cast'] != ['Benchmark Actor']:
+        raise RuntimeError("Enriched details did not reach the catalog")
+
+    # Rating writes: rewrite the CSV file with one changed row and serve the next request with it
+    def rate(i):
+        movies.loc[i + 1, 'rating'] = 4.99 - (i + 1) * 0.01
+        write_movies(movies, data_file, rows=movies.loc[[i + 1]])
+        get(client, REQUESTS['recommend_genre'])
+    record('rating_write', best_ms(rate, repeat))
+
+    # Memory held by the catalog, per movie; tracing slows the build down, so it is not timed
+    table_bytes, catalog_bytes = catalog_memory(data_file)
+    record('table' + BYTES_SUFFIX, table_bytes)
+    record('catalog' + BYTES_SUFFIX, catalog_bytes)
+
+    builds = min(repeat, 3) if count <= REPEAT_BUILDS_MAX_SIZE else 1
+    record('text_indexes', best_build_ms(data_file, lambda catalog: catalog.build_text_indexes(), builds))
+    get_catalog(data_file).build_text_indexes()
+    for case, url in TEXT_REQUESTS.items():
+        record(case, best_ms(lambda i: get(client, url), repeat))
+
+    if count <= SIMILARITY_MAX_SIZE:
+        record('similarity_index', best_build_ms(data_file, lambda catalog: catalog.build_similarity(), builds))
+    else:
+        print(f"Skipping the similarity index above {SIMILARITY_MAX_SIZE} movies")
+
+    clear_catalog()
+    movie_catalog.BUILD_CONTENT_IN_BACKGROUND = True
+    movie_catalog.CATALOG_SNAPSHOT = True
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print every timing next to its baseline; returns the regressed and the unbaselined (size, case) pairs"""
+    regressions = []
+    missing = []
+    for size, cases in results.items():
+        print(f"\n{int(size):,} movies")
+        for case, value in cases.items():
+            unit, floor = ('B', MIN_REGRESSION_BYTES) if case.endswith(BYTES_SUFFIX) else ('ms', MIN_REGRESSION_MS)
+            base = baseline.get(size, {}).get(case)
+            if base is None:
+                missing.append((size, case))
+                print(f"  {case:<18} {value:>10.1f} {unit:<2}  NO BASELINE")
+                continue
+            change = (value - base) / base if base else 0.0
+            regressed = value > base * (1 + tolerance) and value - base > floor
+            if regressed:
+                regressions.append((size, case))
+            print(f"  {case:<18} {value:>10.1f} {unit:<2}  baseline {base:>10.1f} {unit:<2}  {change:+7.1%}"
+                  f"{'  REGRESSION' if regressed else ''}")
+    return regressions, missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description='Catalog and route benchmarks')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in SIZES),
+                        help='comma-separated catalog sizes')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per case (the fastest is kept)')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='baseline file to compare with')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='allowed slowdown, e.g. 0.25 for 25%%')
+    parser.add_argument('--save', action='store_true', help='save the timings of this run as the baseline')
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['sizes']
+    elif not args.save:
+        # Nothing could be compared, so the run could never fail on a regression
+        print(f"No baseline at {args.baseline}; save one on this machine first with --save")
+        return 2
+
+    workdir = tempfile.mkdtemp(prefix='moviebot-bench-')
+    results = {}
+    failed = []
+    try:
+        for size in args.sizes.split(','):
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1,
+                                                        mp_context=multiprocessing.get_context('spawn')) as pool:
+                try:
+                    results[size] = pool.submit(bench_size, int(size), args.repeat, workdir).result()
+                except Exception as e:
+                    # A worker killed for running out of memory shows up as a broken pool
+                    print(f"Benchmark of {int(size):,} movies failed: {e!r}")
+                    failed.append(size)
+                    path = results_path(workdir, int(size))
+                    if os.path.exists(path):
+                        with open(path, encoding='utf-8') as f:
+                            results[size] = json.load(f)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    regressions, missing = compare(results, baseline, args.tolerance)
+    if args.save:
+        # Sizes not run this time, or that failed, keep their previous baseline
+        finished = {size: cases for size, cases in results.items() if size not in failed}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'machine': platform.node(), 'python': platform.python_version(),
+                       'saved': time.strftime('%Y-%m-%d %H:%M:%S'), 'sizes': {**baseline, **finished}}, f, indent=2)
+        print(f"\nSaved the baseline to {args.baseline}")
+    if failed:
+        print(f"\nFailed sizes: {', '.join(f'{int(size):,}' for size in failed)}")
+    if regressions:
+        print(f"\n{len(regressions)} regressions: "
+              + ', '.join(f"{case} at {int(size):,}" for size, case in regressions))
+    if missing and not args.save:
+        print(f"\n{len(missing)} cases without a baseline: "
+              + ', '.join(f"{case} at {int(size):,}" for size, case in missing)
+              + "; save them with --save")
+    return 1 if failed or regressions or (missing and not args.save) else 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
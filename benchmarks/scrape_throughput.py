@@ -0,0 +1,142 @@
+"""
+End-to-end throughput of the scraper against the local Letterboxd stand-in.
+
+    python -m benchmarks.scrape_throughput [--jobs quick,full,details] [--latency 0.05]
+                                           [--throttle-rate 0.05] [--error-rate 0.01] [--browser]
+
+Starts the fixture server, points the scraper at it and runs whole update
+jobs (quick_update_titles, scrape_movies, and detail pages as the app
+fetches them) in a scratch directory, then reports pages and images per
+second, time to complete and the latency percentiles of every fetch as the
+scraper saw it, retries included. Politeness delays are skipped unless
+--keep-delays is given, so the numbers measure the pipeline itself.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+import numpy as np
+from benchmarks.letterboxd_fixture import FixtureServer, FixtureSite, stored_site
+from scraper import movie_scraper
+
+JOBS = ('quick', 'full', 'details')
+
+
+class Recorder:
+    """Wraps scraper functions to record how long every call took, by kind"""
+
+    def __init__(self):
+        self.latencies = {}
+        self._lock = threading.Lock()
+
+    def wrap(self, kind, fn):
+        def timed_fn(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.latencies.setdefault(kind, []).append(time.perf_counter() - start)
+        return timed_fn
+
+    def reset(self):
+        with self._lock:
+            self.latencies = {}
+
+
+def run_job(job, details):
+    """Run one update job in the current directory; returns whether it succeeded"""
+    if job == 'quick':
+        return movie_scraper.quick_update_titles()
+    if job == 'full':
+        return movie_scraper.scrape_movies()
+    return all(movie_scraper.get_movie_description(movie_url)['description'] != "Error loading description"
+               for movie_url in details)
+
+
+def report(job, seconds, ok, latencies, server_stats):
+    print(f"\n{job}: {'completed' if ok else 'FAILED'} in {seconds:.2f} s")
+    for kind, values in sorted(latencies.items()):
+        values = np.array(values) * 1000
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        print(f"  {kind:<8} {len(values):>5} calls  {len(values) / seconds:>7.1f}/s  "
+              f"p50 {p50:7.1f} ms  p95 {p95:7.1f} ms  p99 {p99:7.1f} ms  max {values.max():7.1f} ms")
+    injected = {key: count for key, count in server_stats.items() if key[1] != 200}
+    if injected:
+        print("  server: " + ', '.join(f"{count} x {status} on {kind}" for (kind, status), count in
+                                     sorted(injected.items())))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.scrape_throughput',
+                                     description='Scraper throughput against a local Letterboxd stand-in')
+    parser.add_argument('--jobs', default='quick,full', help=f"comma-separated jobs out of {', '.join(JOBS)}")
+    parser.add_argument('--synthetic', type=int, default=0, help='serve this many synthetic movies')
+    parser.add_argument('--details', type=int, default=20, help='detail pages fetched by the details job')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds every response waits')
+    parser.add_argument('--jitter', type=float, default=0.05, help='up to this many more seconds, at random')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of responses failing with 500')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='share of responses refused with 429')
+    parser.add_argument('--retry-after', type=float, default=0.2, help='Retry-After of throttled responses')
+    parser.add_argument('--browser', action='store_true', help='fetch pages with Chrome, as in production')
+    parser.add_argument('--keep-delays', action='store_true', help='keep the rate limiting and page waits')
+    args = parser.parse_args(argv)
+
+    # The site is built from the repository's catalog before moving to the scratch directory
+    if args.synthetic:
+        from benchmarks.synthetic import synthetic_movies
+        site = FixtureSite(synthetic_movies(args.synthetic))
+    else:
+        site = stored_site(os.path.abspath('data/movies.csv'), os.path.abspath('static'))
+    server = FixtureServer(site, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                           throttle_rate=args.throttle_rate, retry_after=args.retry_after, seed=0).start()
+    print(f"Serving {len(site.films)} films in {len(site.listings)} genres at {server.base_url}")
+
+    movie_scraper.BASE_URL = server.base_url
+    movie_scraper.BROWSER_FETCH = args.browser
+    if not args.keep_delays:
+        movie_scraper.RATE_LIMIT_SECONDS = (0, 0)
+        movie_scraper.PAGE_WAIT_SECONDS = 0
+        movie_scraper.DETAIL_WAIT_SECONDS = 0
+    recorder = Recorder()
+    movie_scraper.fetch_genre_page = recorder.wrap('page', movie_scraper.fetch_genre_page)
+    movie_scraper.download_image = recorder.wrap('image', movie_scraper.download_image)
+    movie_scraper.get_movie_description = recorder.wrap('detail', movie_scraper.get_movie_description)
+
+    # Parse workers are spawned after the working directory changes, so they need absolute import paths
+    sys.path[:] = [os.path.abspath(path) for path in sys.path]
+    details = [f"/film/{slug}/" for slug in list(site.films)[:args.details]]
+    cwd = os.getcwd()
+    failed = False
+    try:
+        for job in args.jobs.split(','):
+            # Every job starts from an empty data folder and page cache, like a first run
+            workdir = tempfile.mkdtemp(prefix='moviebot-scrape-')
+            os.makedirs(os.path.join(workdir, 'data'))
+            os.makedirs(os.path.join(workdir, 'static', 'images'))
+            os.chdir(workdir)
+            recorder.reset()
+            stats_before = Counter(server.stats)
+            try:
+                start = time.perf_counter()
+                ok = run_job(job, details)
+                seconds = time.perf_counter() - start
+            finally:
+                os.chdir(cwd)
+                shutil.rmtree(workdir, ignore_errors=True)
+            failed = failed or not ok
+            report(job, seconds, ok, recorder.latencies, Counter(server.stats) - stats_before)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
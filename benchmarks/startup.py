@@ -0,0 +1,121 @@
+"""
+Cold start of the app, from launch to the first page.
+
+    python -m benchmarks.startup [--runs 5] [--synthetic 100000] [--exe dist/MoviePickerBot/MoviePickerBot]
+
+Launches the app (app.py, or a frozen build with --exe) in a scratch folder
+with a copy of the catalog, without a browser or a scheduled refresh, and
+times how long it takes until the port accepts connections and until the
+first byte of the home page arrives. "cold" runs start without a catalog
+snapshot, so the catalog is read from the CSV file; "warm" runs start from
+the snapshot the previous run left behind, as every start after the first
+one does.
+"""
+import argparse
+import http.client
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from catalog.movie_catalog import snapshot_path
+from catalog.text_store import text_store_path
+
+APP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+# How long a start may take before the run is given up
+START_TIMEOUT = 120
+
+
+def prepare(workdir, data_file, synthetic):
+    """Copy the catalog (or write a synthetic one) into workdir/data; returns the CSV path there"""
+    target = os.path.join(workdir, 'data', 'movies.csv')
+    if synthetic:
+        from benchmarks.synthetic import write_catalog
+        return write_catalog(os.path.dirname(target), synthetic)
+    os.makedirs(os.path.dirname(target))
+    shutil.copy(data_file, target)
+    if os.path.exists(text_store_path(data_file)):
+        shutil.copy(text_store_path(data_file), text_store_path(target))
+    return target
+
+
+def wait_for_port(port, process, deadline):
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The app exited with status {process.returncode} before listening")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.005)
+    raise RuntimeError(f"The app did not listen on port {port} within {START_TIMEOUT} s")
+
+
+def time_start(command, workdir, port, data_file, wait_for_snapshot):
+    """Launch the app once; returns (seconds to listen, seconds to the first byte of /, seconds to all of it)"""
+    env = {**os.environ, 'MOVIEBOT_PORT': str(port), 'MOVIEBOT_OPEN_BROWSER': '0',
+           'MOVIEBOT_SCHEDULED_REFRESH': '0', 'PYTHONUNBUFFERED': '1'}
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port, process, start + START_TIMEOUT)
+        listening = time.perf_counter() - start
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=START_TIMEOUT)
+        connection.request('GET', '/')
+        # getresponse() returns once the status line and headers are in
+        response = connection.getresponse()
+        first_byte = time.perf_counter() - start
+        response.read()
+        complete = time.perf_counter() - start
+        connection.close()
+        if response.status != 200:
+            raise RuntimeError(f"/ returned {response.status}")
+        # The snapshot is saved in the background after a cold start; the next run needs it
+        deadline = time.perf_counter() + START_TIMEOUT
+        while wait_for_snapshot and not os.path.exists(snapshot_path(data_file)) and time.perf_counter() < deadline:
+            time.sleep(0.05)
+        return listening, first_byte, complete
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.startup', description='Time to first byte of the app')
+    parser.add_argument('--runs', type=int, default=5, help='starts timed per mode')
+    parser.add_argument('--exe', help='time this frozen build instead of app.py')
+    parser.add_argument('--data-file', default='data/movies.csv', help='catalog copied for the app')
+    parser.add_argument('--synthetic', type=int, default=0, help='start with this many synthetic movies instead')
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args(argv)
+
+    command = [os.path.abspath(args.exe)] if args.exe else [sys.executable, APP_FILE]
+    workdir = tempfile.mkdtemp(prefix='moviebot-startup-')
+    try:
+        data_file = prepare(workdir, os.path.abspath(args.data_file), args.synthetic)
+        timings = {'cold': [], 'warm': []}
+        for run in range(args.runs):
+            for mode in ('cold', 'warm'):
+                if mode == 'cold' and os.path.exists(snapshot_path(data_file)):
+                    os.remove(snapshot_path(data_file))
+                timings[mode].append(time_start(command, workdir, args.port, data_file, mode == 'cold'))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{' '.join(command)}: {args.runs} runs per mode, median (best) in ms")
+    for mode, runs in timings.items():
+        columns = []
+        for name, values in zip(('listening', 'first byte', 'complete'), zip(*runs)):
+            columns.append(f"{name} {statistics.median(values) * 1000:7.0f} ({min(values) * 1000:.0f})")
+        print(f"  {mode:<5} " + '  '.join(columns))
+    return 0
+
+
+if __name__ == '__main__':
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
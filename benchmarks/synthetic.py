@@ -0,0 +1,104 @@
+import os
+import numpy as np
+import pandas as pd
+from catalog.movie_table import movie_id
+from catalog.text_store import NO_DESCRIPTION, get_text_store, text_store_path
+from scraper.movie_scraper import GENRES
+
+# Words titles, taglines and synopses are drawn from
+WORDS = ('love', 'night', 'city', 'dark', 'last', 'house', 'war', 'dream', 'king', 'road', 'blood', 'star',
+         'river', 'ghost', 'summer', 'secret', 'lost', 'world', 'fire', 'heart', 'shadow', 'time', 'girl',
+         'man', 'return', 'story', 'island', 'winter', 'killer', 'family', 'journey', 'light', 'storm',
+         'moon', 'wild', 'silent', 'golden', 'broken', 'empire', 'stranger', 'garden', 'machine', 'ocean',
+         'forest', 'mirror', 'song', 'game', 'letter', 'train', 'escape')
+FILLER = ('the', 'a', 'of', 'and', 'in', 'to', 'with', 'his', 'her', 'their', 'after', 'before', 'who',
+          'when', 'must', 'finds', 'discovers', 'against', 'young', 'old', 'small', 'town', 'detective',
+          'mother', 'father', 'brother', 'sister', 'friend', 'soldier', 'doctor', 'teacher', 'thief')
+FIRST_NAMES = ('Anna', 'Ben', 'Clara', 'David', 'Elena', 'Frank', 'Grace', 'Hugo', 'Iris', 'Jack', 'Kate',
+               'Leo', 'Maya', 'Nina', 'Oscar', 'Paul', 'Rosa', 'Sam', 'Tara', 'Victor', 'Wendy', 'Yuki')
+LAST_NAMES = ('Adams', 'Brown', 'Costa', 'Dubois', 'Evans', 'Fischer', 'Garcia', 'Hill', 'Ito', 'Jones',
+              'Kim', 'Lopez', 'Moreau', 'Novak', 'Olsen', 'Park', 'Quinn', 'Rossi', 'Silva', 'Tanaka',
+              'Ueda', 'Vargas', 'Weber', 'Young', 'Zhang')
+
+# Share of movies whose details page was fetched, i.e. with a description and cast
+ENRICHED_FRACTION = 0.3
+
+
+def _phrases(rng, words, count, lengths):
+    """Return count phrases of random words, each as long as drawn from lengths (low, high)"""
+    sizes = rng.integers(lengths[0], lengths[1] + 1, count)
+    picks = np.asarray(words, dtype=object)[rng.integers(0, len(words), sizes.sum())]
+    ends = np.cumsum(sizes)
+    return [' '.join(picks[end - size:end]) for size, end in zip(sizes.tolist(), ends.tolist())]
+
+
+def synthetic_movies(count, seed=0):
+    """
+    Return a DataFrame of count movies in the schema of data/movies.csv,
+    plus the description and cast columns of enriched movies.
+
+    Ratings, years and genre counts follow roughly the shape of the real
+    listing pages: ratings cluster around 3.4, a few movies have no rating
+    or year yet, and most movies belong to one to three genres.
+    """
+    rng = np.random.default_rng(seed)
+    titles = [title.title() for title in _phrases(rng, WORDS, count, (1, 4))]
+    slugs = [f"/film/{title.lower().replace(' ', '-')}-{i}/" for i, title in enumerate(titles)]
+
+    years = rng.integers(1920, 2025, count).astype(object)
+    years[rng.random(count) < 0.01] = 'Unknown'
+    ratings = np.clip(np.round(rng.normal(3.4, 0.5, count), 2), 0.5, 5.0)
+    ratings[rng.random(count) < 0.02] = 0.0
+
+    genre_names = np.asarray(GENRES, dtype=object)
+    genre_counts = rng.choice([1, 2, 3], count, p=[0.5, 0.35, 0.15])
+    genres = [', '.join(dict.fromkeys(genre_names[rng.integers(0, len(genre_names), n)]))
+              for n in genre_counts.tolist()]
+
+    safe_titles = [''.join(c if c.isalnum() else '_' for c in title) for title in titles]
+    df = pd.DataFrame({
+        'title': titles,
+        'year': years,
+        'rating': ratings,
+        'genre': genres,
+        'description': NO_DESCRIPTION,
+        'image_path': [f"images/{safe}_{year}.jpg" for safe, year in zip(safe_titles, years.tolist())],
+        'movie_url': slugs,
+        'large_image_path': None
+    })
+
+    # Enriched movies carry an HTML description (tagline and a long synopsis) and a cast list
+    enriched = np.flatnonzero(rng.random(count) < ENRICHED_FRACTION)
+    taglines = _phrases(rng, WORDS + FILLER, len(enriched), (4, 9))
+    synopses = _phrases(rng, WORDS + FILLER, len(enriched), (60, 140))
+    df.loc[enriched, 'description'] = [f"<strong>{tagline.capitalize()}.</strong><br>{synopsis.capitalize()}."
+                                       for tagline, synopsis in zip(taglines, synopses)]
+    first = np.asarray(FIRST_NAMES, dtype=object)
+    last = np.asarray(LAST_NAMES, dtype=object)
+    cast_sizes = rng.integers(3, 16, len(enriched))
+    names = first[rng.integers(0, len(first), cast_sizes.sum())] + ' ' + last[rng.integers(0, len(last),
+                                                                                          cast_sizes.sum())]
+    ends = np.cumsum(cast_sizes)
+    df['cast'] = None
+    df.loc[enriched, 'cast'] = pd.Series([list(names[end - size:end]) for size, end in
+                                          zip(cast_sizes.tolist(), ends.tolist())], index=enriched, dtype=object)
+    return df
+
+
+def write_catalog(directory, count, seed=0):
+    """
+    Write a synthetic catalog the way the app stores one: the light columns
+    in movies.csv and the descriptions and cast in the text store next to it.
+    Returns the path of the CSV file.
+    """
+    os.makedirs(directory, exist_ok=True)
+    data_file = os.path.join(directory, 'movies.csv')
+    df = synthetic_movies(count, seed)
+
+    enriched = df[df['description'] != NO_DESCRIPTION]
+    get_text_store(text_store_path(data_file)).put_many(
+        [(movie_id(url), description, cast) for url, description, cast in
+         zip(enriched['movie_url'], enriched['description'], enriched['cast'])])
+    df['description'] = NO_DESCRIPTION
+    df.drop(columns=['cast']).to_csv(data_file, index=False)
+    return data_file
@@ -1,6 +1,11 @@
 import PyInstaller.__main__
 import os
 import shutil
+import sys
+
+# A single file unpacks itself to a temporary folder on every launch; a folder build starts faster
+# (python build_exe_simple.py --onedir)
+ONEDIR = '--onedir' in sys.argv[1:]
 
 # Create a temporary directory for the build
 if os.path.exists('build_temp'):
@@ -17,18 +22,22 @@ if not os.path.exists('data/movies.csv'):
 # Define PyInstaller arguments
 args = [
     'app.py',                          # Use app.py directly
-    '--onefile',                       # Create a single executable
+    '--onedir' if ONEDIR else '--onefile',  # Create a folder or a single executable
     '--name=MoviePickerBot',           # Name of the executable
     '--add-data=templates;templates',  # Include templates folder
     '--add-data=static;static',        # Include static folder
     '--add-data=data;data',            # Include data folder
     '--add-data=scraper;scraper',      # Include scraper folder
+    '--add-data=catalog;catalog',      # Include catalog folder
+    '--add-data=monitoring;monitoring',  # Include monitoring folder
     '--hidden-import=selenium',        # Include hidden imports
     '--hidden-import=bs4',
     '--hidden-import=pandas',
+    '--hidden-import=scipy',
     '--hidden-import=flask',
     '--hidden-import=requests',
     '--hidden-import=webbrowser',
+    '--hidden-import=PIL.Image',       # Poster variants (imported lazily)
     '--console',                       # Show console window for debugging
     '--clean',                         # Clean PyInstaller cache
     '--workpath=build_temp',           # Temporary build directory
@@ -42,4 +51,4 @@ PyInstaller.__main__.run(args)
 if os.path.exists('build_temp'):
     shutil.rmtree('build_temp')
 
-print("Build complete! Executable is in the 'dist' folder.")
\ No newline at end of file
+print(f"Build complete! Executable is in the '{os.path.join('dist', 'MoviePickerBot') if ONEDIR else 'dist'}' folder.")
\ No newline at end of file
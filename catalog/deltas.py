@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+from monitoring.metrics import timed
+
+# Columns of the CSV file the catalog is built from (the text lives in the text store)
+CATALOG_COLUMNS = ('title', 'year', 'rating', 'genre', 'image_path', 'movie_url', 'large_image_path')
+
+# The journal is started afresh once it grows past this size; readers then reload
+MAX_JOURNAL_BYTES = 16 * 1024 * 1024
+
+# Serializes appends from the threads of one process
+_journal_lock = threading.Lock()
+
+
+def catalog_version(data_file):
+    """Return a version string that changes whenever the CSV file changes"""
+    stat = os.stat(data_file)
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def journal_path(data_file):
+    """Return the path of the delta journal kept next to a CSV file"""
+    return os.path.join(os.path.dirname(data_file) or '.', 'catalog_deltas.jsonl')
+
+
+def journal_size(data_file):
+    """Return the size of the delta journal, 0 if there is none"""
+    try:
+        return os.path.getsize(journal_path(data_file))
+    except OSError:
+        return 0
+
+
+def _records(df):
+    """Convert catalog rows to JSON-safe dicts"""
+    columns = [column for column in CATALOG_COLUMNS if column in df.columns]
+    rows = df[columns].astype(object)
+    return rows.where(rows.notna(), None).to_dict('records')
+
+
+def publish_delta(data_file, previous_version, rows=None, texts=()):
+    """
+    Append one delta to the journal.
+
+    previous_version is the CSV version the change was made on; rows is a
+    DataFrame of inserted or updated rows, and texts a list of
+    {'movie_url', 'old', 'new'} dicts for descriptions and cast changed in the
+    text store. A running app applies the delta instead of reloading.
+    """
+    delta = {
+        'from': previous_version,
+        'to': catalog_version(data_file),
+        'rows': _records(rows) if rows is not None else [],
+        'texts': list(texts)
+    }
+    line = json.dumps(delta, ensure_ascii=False) + '\n'
+    path = journal_path(data_file)
+    with _journal_lock:
+        mode = 'w' if journal_size(data_file) > MAX_JOURNAL_BYTES else 'a'
+        with open(path, mode, encoding='utf-8') as f:
+            f.write(line)
+
+
+def read_deltas(data_file, offset):
+    """
+    Return the deltas appended after a byte offset and the offset they end at.
+
+    Returns (None, 0) if the journal was started afresh since, so the
+    deltas in between are lost and the catalog has to be reloaded.
+    """
+    size = journal_size(data_file)
+    if size < offset:
+        return None, 0
+    if size == offset:
+        return [], offset
+    with open(journal_path(data_file), 'rb') as f:
+        f.seek(offset)
+        data = f.read(size - offset)
+    # A writer may be in the middle of a line; leave it for next time
+    end = data.rfind(b'\n') + 1
+    deltas = [json.loads(line) for line in data[:end].decode('utf-8').splitlines() if line.strip()]
+    return deltas, offset + end
+
+
+def _text(frame):
+    """Return a frame as strings, with missing values as empty strings"""
+    frame = frame.astype(object)
+    return frame.where(frame.notna(), '').astype(str)
+
+
+def changed_rows(previous_df, df):
+    """
+    Return the rows of df that are new or differ from previous_df in a catalog column.
+
+    Returns None if a movie was removed, which deltas do not describe.
+    """
+    columns = [column for column in CATALOG_COLUMNS if column in df.columns and column != 'movie_url']
+    old = previous_df.drop_duplicates('movie_url').set_index('movie_url')
+    new = df.drop_duplicates('movie_url').set_index('movie_url')
+    if not old.index.isin(new.index).all():
+        return None
+
+    common = new.index.intersection(old.index)
+    # Compare as text, so 1994 read from the CSV equals '1994' from a scrape
+    # and a missing value equals a missing value of another dtype
+    before = _text(old.reindex(index=common, columns=columns))
+    after = _text(new.loc[common, columns])
+    updated = common[(before != after).any(axis=1).to_numpy()]
+    inserted = new.index.difference(old.index, sort=False)
+    return new.loc[inserted.append(updated)].reset_index()
+
+
+def write_movies(df, data_file, previous_df=None, rows=None, texts=()):
+    """
+    Write the movies CSV file and publish what changed as a delta.
+
+    The changed rows are given as rows, or found by comparing with
+    previous_df. Without either, nothing is published and a running app
+    reloads the whole catalog.
+    """
+    previous_version = catalog_version(data_file) if os.path.exists(data_file) else None
+    if rows is None and previous_df is not None:
+        rows = changed_rows(previous_df, df)
+    with timed('write'):
+        df.to_csv(data_file, index=False)
+    if previous_version is not None and rows is not None:
+        publish_delta(data_file, previous_version, rows, texts)
+        print(f"Published a delta of {len(rows)} rows")
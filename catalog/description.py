@@ -0,0 +1,67 @@
+import html
+import json
+import re
+
+# Marker that get_movie_description puts in front of the cast list
+CAST_MARKER = '<strong>Cast:</strong>'
+
+# Descriptions that are placeholders rather than real text
+PLACEHOLDER_DESCRIPTIONS = {'Details', 'No description available', 'Error loading description'}
+
+
+def strip_tags(fragment):
+    """Remove HTML tags from a fragment and unescape entities"""
+    return html.unescape(re.sub(r'<[^>]+>', ' ', fragment)).strip()
+
+
+def parse_description(description):
+    """
+    Split a description built by get_movie_description into its parts.
+
+    Returns a dict with the tagline, the synopsis and the list of cast names.
+    """
+    parts = {'tagline': '', 'synopsis': '', 'cast': []}
+    if not isinstance(description, str) or description in PLACEHOLDER_DESCRIPTIONS:
+        return parts
+
+    text, marker, cast_text = description.partition(CAST_MARKER)
+    if marker:
+        parts['cast'] = [name.strip() for name in strip_tags(cast_text).split(',') if name.strip()]
+
+    # The tagline, when present, is the bold text at the very start
+    tagline = re.match(r'\s*<strong>(.*?)</strong>', text, re.S)
+    if tagline:
+        parts['tagline'] = strip_tags(tagline.group(1))
+        text = text[tagline.end():]
+
+    parts['synopsis'] = re.sub(r'\s+', ' ', strip_tags(text))
+    return parts
+
+
+def load_cast(cast_cell, description=None):
+    """
+    Return the cast of a movie as a list of names.
+
+    The cast column holds a JSON list. Rows enriched before that column
+    existed only have the cast inside the description, so fall back to it.
+    """
+    if isinstance(cast_cell, str) and cast_cell.startswith('['):
+        try:
+            return [name for name in json.loads(cast_cell) if isinstance(name, str)]
+        except ValueError:
+            pass
+    return parse_description(description)['cast']
+
+
+def dump_cast(cast):
+    """Serialize a cast list for the cast column"""
+    return json.dumps(list(cast), ensure_ascii=False)
+
+
+def description_html(description, cast):
+    """Add the cast to a description for display, unless it already contains it"""
+    if not isinstance(description, str):
+        return description
+    if cast and CAST_MARKER not in description:
+        return f"{description}<br><br>{CAST_MARKER} {html.escape(', '.join(cast))}"
+    return description
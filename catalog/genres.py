@@ -0,0 +1,144 @@
+import copy
+import numpy as np
+
+# Ways several selected genres can be combined
+GENRE_MODES = ('or', 'and')
+
+
+def genre_key(genre):
+    """Normalize a genre name for lookups"""
+    return genre.strip().lower()
+
+
+def split_genres(genre_list):
+    """Split a comma-separated genre cell into title-cased genre names"""
+    if not isinstance(genre_list, str):
+        return []
+    return [g.strip().title() for g in genre_list.split(',') if g.strip()]
+
+
+def join_genres(genre_cells):
+    """Merge several genre cells into one comma-separated cell without duplicates"""
+    merged = []
+    seen = set()
+    for cell in genre_cells:
+        if not isinstance(cell, str):
+            continue
+        for genre in cell.split(','):
+            genre = genre.strip()
+            if genre and genre_key(genre) not in seen:
+                seen.add(genre_key(genre))
+                merged.append(genre)
+    return ', '.join(merged)
+
+
+def merge_genre_rows(df):
+    """
+    Collapse one row per (movie, genre) into one row per movie with all of its genres.
+
+    The first row of each movie wins for every other column, so existing data
+    placed before newly scraped rows is kept.
+    """
+    if df.empty or 'movie_url' not in df.columns:
+        return df
+    # Only movies with several rows need merging
+    duplicated = df['movie_url'].duplicated(keep=False)
+    if not duplicated.any():
+        return df
+    genres = df[duplicated].groupby('movie_url', sort=False)['genre'].agg(join_genres)
+    merged = df.drop_duplicates(subset=['movie_url'], keep='first').copy()
+    merged['genre'] = merged['movie_url'].map(genres).fillna(merged['genre'])
+    return merged
+
+
+class GenreBitmap:
+    """The genres of every movie as a bitmask, so compound filters are vectorized bitwise operations"""
+
+    def __init__(self, genres, genre_lists):
+        # genre_lists holds the genre names of each movie
+        self.genres = list(genres)
+        self.bits = {genre_key(genre): bit for bit, genre in enumerate(genres)}
+        # One 64-bit word holds 64 genres; more genres simply use more words
+        self.words = max(1, (len(genres) + 63) // 64)
+        self.masks = np.zeros((len(genre_lists), self.words), dtype=np.uint64)
+
+        rows, words, values = [], [], []
+        for i, movie_genres in enumerate(genre_lists):
+            for genre in movie_genres:
+                bit = self.bits[genre_key(genre)]
+                rows.append(i)
+                words.append(bit // 64)
+                values.append(1 << (bit % 64))
+        np.bitwise_or.at(self.masks, (np.array(rows, dtype=np.intp), np.array(words, dtype=np.intp)),
+                         np.array(values, dtype=np.uint64))
+
+    def updated(self, positions, genre_lists, count):
+        """
+        Return a copy with the genres of the movies at some positions replaced,
+        grown to count movies. New genres get the next free bits.
+        """
+        bitmap = copy.copy(self)
+        bitmap.genres = list(self.genres)
+        bitmap.bits = dict(self.bits)
+        for movie_genres in genre_lists:
+            for genre in movie_genres:
+                if genre_key(genre) not in bitmap.bits:
+                    bitmap.bits[genre_key(genre)] = len(bitmap.genres)
+                    bitmap.genres.append(genre)
+        bitmap.words = max(1, (len(bitmap.genres) + 63) // 64)
+
+        bitmap.masks = np.zeros((count, bitmap.words), dtype=np.uint64)
+        bitmap.masks[:len(self.masks), :self.words] = self.masks
+        for position, movie_genres in zip(positions, genre_lists):
+            bitmap.masks[position] = 0
+            for genre in movie_genres:
+                bit = bitmap.bits[genre_key(genre)]
+                bitmap.masks[position, bit // 64] |= np.uint64(1 << (bit % 64))
+        return bitmap
+
+    def names(self, i):
+        """Return the genre names of movie i, decoded from its bitmask"""
+        names = []
+        for word, value in enumerate(self.masks[i].tolist()):
+            while value:
+                low = value & -value
+                names.append(self.genres[word * 64 + low.bit_length() - 1])
+                value ^= low
+        return names
+
+    def has(self, rows, genre):
+        """Return a boolean array telling which of the rows have a genre"""
+        bit = self.bits[genre_key(genre)]
+        return (self.masks[rows, bit // 64] & np.uint64(1 << (bit % 64))) != 0
+
+    def mask(self, genres):
+        """Return the bitmask of a list of genres, ignoring unknown genres"""
+        mask = np.zeros(self.words, dtype=np.uint64)
+        for genre in genres:
+            bit = self.bits.get(genre_key(genre))
+            if bit is not None:
+                mask[bit // 64] |= np.uint64(1 << (bit % 64))
+        return mask
+
+    def match(self, include=(), mode='or', exclude=(), rows=None):
+        """
+        Return a boolean array telling which movies match a genre expression.
+
+        With mode "or" a movie needs any of the included genres, with "and"
+        it needs all of them; a movie with any excluded genre never matches.
+        When rows is given, only those movies are checked, in that order.
+        """
+        masks = self.masks if rows is None else self.masks[rows]
+        result = np.ones(len(masks), dtype=bool)
+        if include:
+            wanted = self.mask(include)
+            if mode == 'and':
+                # An unknown genre can never be matched by every movie
+                if any(genre_key(genre) not in self.bits for genre in include):
+                    return np.zeros(len(masks), dtype=bool)
+                result &= ((masks & wanted) == wanted).all(axis=1)
+            else:
+                result &= (masks & wanted).any(axis=1)
+        if exclude:
+            result &= ~(masks & self.mask(exclude)).any(axis=1)
+        return result
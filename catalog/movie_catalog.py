@@ -0,0 +1,536 @@
+import copy
+import os
+import pickle
+import threading
+import time
+import numpy as np
+from catalog.deltas import catalog_version, journal_size, read_deltas
+from catalog.description import load_cast
+from catalog.genres import genre_key, merge_genre_rows
+from catalog.movie_table import NO_YEAR, MovieTable, movie_id
+from catalog.range_index import RangeIndex
+from catalog.rankings import GenreRanking, ranking_key, updated_order
+from catalog.similarity import SimilarityIndex
+from catalog.text_index import ActorIndex, TextIndex, TitleIndex
+from catalog.text_store import NO_DESCRIPTION, get_text_store, text_store_path
+from monitoring.metrics import CACHE_LOOKUPS, timed
+
+# Path to the CSV file
+DATA_FILE = 'data/movies.csv'
+
+# Key used for the ranking that spans every genre
+ANY_GENRE = 'any genre'
+
+# Heavy columns kept in the text store instead of the CSV file
+TEXT_COLUMNS = ('description', 'cast')
+
+# How long a CSV change may wait for its delta before the catalog is reloaded instead
+DELTA_GRACE_SECONDS = 1.0
+
+# Whether a loaded catalog starts building its content indexes right away; otherwise the build starts on first use
+BUILD_CONTENT_IN_BACKGROUND = True
+
+# A built catalog is saved next to the CSV file and loaded from there while the CSV file is unchanged,
+# so a restart skips reading and indexing it; bump SNAPSHOT_FORMAT when the catalog classes change
+CATALOG_SNAPSHOT = True
+SNAPSHOT_FORMAT = 3
+
+# The catalog currently being served and the lock guarding rebuilds
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def document(movie, details):
+    """Join a movie with its description and cast, for the content indexes"""
+    return {'title': movie['title'], 'genres': movie['genres'],
+            'description': details['description'], 'cast': details['cast']}
+
+
+def split_text_columns(df, data_file, texts):
+    """
+    Move descriptions and cast lists from the CSV file into the text store.
+
+    Rows enriched before the text store existed carry their text in the CSV;
+    it is moved once and the CSV file is rewritten with the placeholder, so
+    reading it again no longer costs time proportional to the text.
+    Returns True if the CSV file was rewritten.
+    """
+    import pandas as pd
+    heavy = pd.Series(False, index=df.index)
+    if 'description' in df.columns:
+        heavy |= df['description'].notna() & (df['description'] != NO_DESCRIPTION)
+    if 'cast' in df.columns:
+        heavy |= df['cast'].notna()
+    if not heavy.any():
+        return False
+
+    rows = []
+    for movie in df[heavy].to_dict('records'):
+        description = movie.get('description')
+        if not isinstance(description, str):
+            description = NO_DESCRIPTION
+        rows.append((movie_id(movie.get('movie_url')), description, load_cast(movie.get('cast'), description)))
+    texts.put_many(rows)
+
+    df['description'] = NO_DESCRIPTION
+    df.drop(columns=['cast'], errors='ignore').to_csv(data_file, index=False)
+    print(f"Moved the text of {len(rows)} movies to {texts.path}")
+    return True
+
+
+def store_details(texts, movie_id, description=None, cast=None):
+    """
+    Write a new description and/or cast of a movie to the text store.
+
+    Returns the (old, new) details, or None if nothing changed.
+    """
+    old = texts.get(movie_id)
+    new = {'description': description if description is not None else old['description'],
+           'cast': cast if cast is not None else old['cast']}
+    if new == old:
+        return None
+    texts.put(movie_id, new['description'], new['cast'])
+    return old, new
+
+
+def build_alias_tables(rankings):
+    """Build the alias tables of rankings patched by a delta; rankings that have one are skipped"""
+    for ranking in rankings:
+        ranking.build_alias_table()
+
+
+class ContentIndexes:
+    """
+    The actor, full-text and similarity indexes of a catalog.
+
+    They need the text store and are slow to build, so catalog versions
+    derived from one another by deltas share them and patch them in place.
+    """
+
+    def __init__(self, catalog):
+        # The newest catalog the indexes describe; builds read its documents
+        self.catalog = catalog
+        self.actor_index = None
+        self.text_index = None
+        self.similarity = None
+        self.text_lock = threading.Lock()
+        self.similarity_lock = threading.Lock()
+        # Thread building every index in the background, started once
+        self._builder = None
+        # Patches waiting for the background patcher, applied in the order the deltas came in
+        self._pending = []
+        self._patcher = None
+        self._patch_lock = threading.Lock()
+
+    def _build_text(self, documents=None):
+        if self.text_index is None:
+            documents = documents if documents is not None else self.catalog.documents()
+            self.actor_index = ActorIndex(documents)
+            self.text_index = TextIndex(documents)
+            print(f"Built text indexes for catalog version {self.catalog.version}")
+
+    def build_text(self):
+        """Build the actor and full-text indexes, once"""
+        with self.text_lock:
+            self._build_text()
+            return self.text_index, self.actor_index
+
+    def _build_similarity(self, documents=None):
+        if self.similarity is None:
+            documents = documents if documents is not None else self.catalog.documents()
+            self.similarity = SimilarityIndex(documents)
+            print(f"Built similarity index for catalog version {self.catalog.version}")
+
+    def build_similarity(self):
+        """Build the nearest-neighbour index, once"""
+        with self.similarity_lock:
+            self._build_similarity()
+            return self.similarity
+
+    def build(self):
+        """Read the text store once and build every index"""
+        with self.similarity_lock:
+            # Documents are read under the text lock, so no delta slips in between reading and indexing
+            with self.text_lock:
+                documents = self.catalog.documents() if self.similarity is None or self.text_index is None else None
+                self._build_text(documents)
+            self._build_similarity(documents)
+
+    def start_build(self):
+        """Build every index on a background thread, unless that was started already"""
+        with self._patch_lock:
+            if self._builder is None:
+                self._builder = threading.Thread(target=self.build, daemon=True)
+                self._builder.start()
+
+    def patch(self, catalog, changes):
+        """
+        Switch to a newer catalog and apply its changed movies, given as
+        (position, old document, new document) with None for added movies.
+
+        Patches run on a background thread, so swapping in a catalog never
+        waits for an index build in progress.
+        """
+        with self._patch_lock:
+            self._pending.append((catalog, changes))
+            if self._patcher is None:
+                self._patcher = threading.Thread(target=self._run_patches, daemon=True)
+                self._patcher.start()
+
+    def _run_patches(self):
+        while True:
+            with self._patch_lock:
+                if not self._pending:
+                    self._patcher = None
+                    return
+                catalog, changes = self._pending.pop(0)
+            # Each lock waits for a build in progress; a build that has not started will read the new catalog
+            with self.text_lock:
+                self.catalog = catalog
+                if self.text_index is not None:
+                    for i, old, new in changes:
+                        self.actor_index.update(i, old['cast'] if old else [], new['cast'])
+                        self.text_index.update(i, TextIndex.grams(old) if old else set(), TextIndex.grams(new))
+            with self.similarity_lock:
+                if self.similarity is not None:
+                    for i, old, new in changes:
+                        self.similarity.update(i, new)
+
+
+class MovieCatalog:
+    """Deduplicated movies with per-genre rankings computed once per catalog version"""
+
+    def __init__(self, df, version=None, texts=None):
+        self.version = version
+        # Descriptions and cast live in the text store and are only read on demand
+        self.texts = texts
+        df = df.drop(columns=[column for column in TEXT_COLUMNS if column in df.columns])
+        self.row_count = len(df)
+
+        # One row per movie with the genres of every row for it merged, stored
+        # as columns instead of one dict per movie
+        self.movies = MovieTable(merge_genre_rows(df))
+        self.genres = self.movies.genres
+        # Genres as bitmasks for compound AND/OR/NOT genre filters
+        self.genre_bitmap = self.movies.genre_bitmap
+
+        # Sort once by rating; each genre ranking inherits the order without re-sorting
+        # (catalog indexes of the movies in rating order, also for filtered rankings)
+        self.rank_order = self.movies.rating_order()
+        # Alias tables are built with the rankings, so a weighted pick never builds one in a request
+        self.rankings = {ANY_GENRE: GenreRanking(self.movies, self.rank_order, alias_table=True)}
+        for genre in self.genres:
+            ordered = self.rank_order[self.genre_bitmap.has(self.rank_order, genre)]
+            self.rankings[genre_key(genre)] = GenreRanking(self.movies, ordered, alias_table=True)
+        # Position of each movie in that order, to sort a subset without comparing keys
+        self.rank_position = np.empty(len(self.movies), dtype=np.int32)
+        self.rank_position[self.rank_order] = np.arange(len(self.rank_order), dtype=np.int32)
+
+        # Trigram and prefix indexes for fuzzy search and autocomplete
+        self.title_index = TitleIndex(self.movies)
+
+        # The actor, full-text and similarity indexes need the text store, so
+        # they are built by build_content_indexes() rather than with the catalog
+        self._content = ContentIndexes(self)
+        # Offset in the delta journal up to which this catalog is current
+        self.journal_offset = 0
+
+        # Sorted year and rating columns, so range filters are binary searches
+        self.year_index = RangeIndex(self.movies.years, missing=NO_YEAR)
+        self.rating_index = RangeIndex(self.movies.ratings)
+
+    def __len__(self):
+        return len(self.movies)
+
+    def get(self, movie_id):
+        """Return a movie by id, or None if it is not in the catalog"""
+        i = self.movies.find(movie_id)
+        return self.movies[i] if i is not None else None
+
+    def ranking(self, genre):
+        """Return the ranking for a genre (or "Any Genre"), or None if the genre is unknown"""
+        return self.rankings.get(genre_key(genre))
+
+    def filtered_ranking(self, include=(), mode='or', exclude=(), candidates=None):
+        """
+        Return the movies matching a genre expression, in rating order.
+
+        candidates optionally restricts the result to a set of catalog indexes
+        found by another index (e.g. the actor index); only those movies are
+        then looked at, so the cost follows the number of candidates.
+        """
+        if candidates is not None:
+            rows = np.fromiter(candidates, dtype=np.int32, count=len(candidates))
+            # Shared indexes may already hold movies a newer delta added
+            rows = rows[rows < len(self.movies)]
+            rows = rows[self.genre_bitmap.match(include, mode, exclude, rows)]
+            ordered = rows[np.argsort(self.rank_position[rows])]
+        else:
+            match = self.genre_bitmap.match(include, mode, exclude)
+            ordered = self.rank_order[match[self.rank_order]]
+        return GenreRanking(self.movies, ordered)
+
+    def details(self, movie):
+        """Return the description and cast of a movie from the text store"""
+        if self.texts is None:
+            return {'description': NO_DESCRIPTION, 'cast': []}
+        return self.texts.get(movie['movie_id'])
+
+    def documents(self):
+        """Join every movie with its text, for building the content indexes"""
+        stored = self.texts.all() if self.texts is not None else {}
+        empty = {'description': NO_DESCRIPTION, 'cast': []}
+        return [document(movie, stored.get(movie['movie_id'], empty)) for movie in self.movies]
+
+    def build_text_indexes(self):
+        """Build the actor and full-text indexes, once"""
+        return self._content.build_text()
+
+    @property
+    def text_index(self):
+        """The full-text index, or None while it is being built; callers then scan the ranking instead"""
+        if self._content.text_index is None:
+            self._content.start_build()
+        return self._content.text_index
+
+    @property
+    def actor_index(self):
+        """The actor index, or None while it is being built; callers then check each movie's cast instead"""
+        if self._content.actor_index is None:
+            self._content.start_build()
+        return self._content.actor_index
+
+    def build_similarity(self):
+        """Build the nearest-neighbour index, once"""
+        return self._content.build_similarity()
+
+    def build_content_indexes(self):
+        """Read the text store once and build every index that needs it"""
+        self._content.build()
+
+    @property
+    def content_ready(self):
+        """Whether the content indexes are built; until then responses leave similar movies out"""
+        return self._content.similarity is not None
+
+    def similar(self, movie, k=None):
+        """
+        Return the movies most similar to a movie, using the precomputed
+        neighbours, or none while the similarity index is still being built.
+        """
+        similarity = self._content.similarity
+        if similarity is None:
+            self._content.start_build()
+            return []
+        return [self.movies[i] for i, _ in similarity.similar(movie['index'], k) if i < len(self.movies)]
+
+    def apply_delta(self, delta):
+        """
+        Return a new catalog with a published delta applied, sharing every
+        column and index the delta leaves untouched.
+
+        The current catalog is not modified, so requests holding it keep a
+        consistent view while the new one is swapped in.
+        """
+        import pandas as pd
+        catalog = copy.copy(self)
+        catalog.version = delta['to']
+        changes = []
+
+        rows = pd.DataFrame(delta['rows'])
+        if not rows.empty and 'movie_url' in rows.columns:
+            rows = merge_genre_rows(rows[rows['movie_url'].notna()])
+            movies, positions = self.movies.upsert(rows)
+            added = [i for i in positions if i >= len(self.movies)]
+            catalog.movies = movies
+            catalog.row_count = self.row_count + len(added)
+            catalog.genre_bitmap = movies.genre_bitmap
+
+            # Slot the changed movies into the rankings instead of sorting again
+            existing = [i for i in positions if i < len(self.movies)]
+            key, old_key = ranking_key(movies), ranking_key(self.movies)
+            catalog.rank_order, moved = updated_order(self.rank_order, existing, positions, old_key, key)
+            # Only the movies between the first and the last change moved (or every one after the first,
+            # when movies were added)
+            catalog.rank_position = np.empty(len(movies), dtype=np.int32)
+            catalog.rank_position[:len(self.movies)] = self.rank_position
+            catalog.rank_position[catalog.rank_order[moved]] = np.arange(moved.start, moved.stop, dtype=np.int32)
+            catalog.rankings = {ANY_GENRE: GenreRanking(movies, catalog.rank_order)}
+
+            # Only genres the changed movies had or have now are ranked again; the others keep their order
+            touched = {genre_key(genre) for i in existing for genre in self.movies.genre_bitmap.names(i)}
+            touched |= {genre_key(genre) for i in positions for genre in movies.genre_bitmap.names(i)}
+            empty = np.empty(0, dtype=np.int32)
+            catalog.genres = []
+            for genre in movies.genres:
+                previous = self.rankings.get(genre_key(genre))
+                if genre_key(genre) in touched:
+                    indexes = previous.indexes if previous is not None else empty
+                    members = [i for i, has in zip(positions, movies.genre_bitmap.has(positions, genre)) if has]
+                    ranking = GenreRanking(movies, updated_order(indexes, existing, members, old_key, key)[0])
+                elif previous is not None:
+                    ranking = previous.for_table(movies)
+                else:
+                    continue
+                # A genre left without movies is dropped, as a rebuild would not have it
+                if len(ranking):
+                    catalog.rankings[genre_key(genre)] = ranking
+                    catalog.genres.append(genre)
+            # Building an alias table takes time proportional to the ranking, so the rankings ranked again get
+            # theirs in the background; weighted picks use a cumulative sum until then
+            threading.Thread(target=build_alias_tables, args=(list(catalog.rankings.values()),), daemon=True).start()
+
+            catalog.year_index = self.year_index.updated(positions, movies.years)
+            catalog.rating_index = self.rating_index.updated(positions, movies.ratings)
+            old_titles = [self.movies.titles[i] if i < len(self.movies) else None for i in positions]
+            catalog.title_index = self.title_index.updated(movies, positions, old_titles)
+
+            for i in positions:
+                details = catalog.details(movies[i])
+                old = document(self.movies[i], details) if i < len(self.movies) else None
+                changes.append((i, old, document(movies[i], details)))
+
+        for text in delta['texts']:
+            i = catalog.movies.find(movie_id(text['movie_url']) or '')
+            if i is not None:
+                movie = catalog.movies[i]
+                changes.append((i, document(movie, text['old']), document(movie, text['new'])))
+
+        catalog._content.patch(catalog, changes)
+        return catalog
+
+
+def apply_deltas(catalog, data_file=DATA_FILE):
+    """
+    Return the catalog with the deltas published since it was built applied,
+    or None if they do not lead on from it and it has to be reloaded.
+    """
+    deltas, offset = read_deltas(data_file, catalog.journal_offset)
+    if deltas is None:
+        return None
+    for delta in deltas:
+        if delta['from'] == catalog.version:
+            with timed('delta_apply'):
+                catalog = catalog.apply_delta(delta)
+            print(f"Applied a delta of {len(delta['rows'])} rows and {len(delta['texts'])} texts, "
+                  f"catalog version {catalog.version}")
+        elif delta['to'] != catalog.version:
+            # A change was written without a delta
+            return None
+    catalog.journal_offset = offset
+    return catalog
+
+
+def snapshot_path(data_file):
+    """Return the path of the catalog snapshot kept next to a CSV file"""
+    return os.path.join(os.path.dirname(data_file) or '.', 'catalog_snapshot.pkl')
+
+
+def read_snapshot(data_file, version):
+    """Return the catalog saved for a version of the CSV file, or None if there is no usable snapshot"""
+    try:
+        with open(snapshot_path(data_file), 'rb') as f:
+            # The header comes first, so a stale snapshot is rejected without unpickling the catalog
+            header = pickle.load(f)
+            if header != {'format': SNAPSHOT_FORMAT, 'version': version}:
+                return None
+            catalog = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Ignoring unreadable catalog snapshot: {e}")
+        return None
+    # The content indexes are not saved; the caller attaches the text store
+    catalog._content = ContentIndexes(catalog)
+    return catalog
+
+
+def write_snapshot(catalog, data_file):
+    """Save a catalog next to its CSV file, replacing the previous snapshot in one step"""
+    path = snapshot_path(data_file)
+    # The text store and content indexes hold connections and locks, so a copy without them is saved
+    snapshot = copy.copy(catalog)
+    snapshot.texts = None
+    snapshot._content = None
+    try:
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump({'format': SNAPSHOT_FORMAT, 'version': catalog.version}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        print(f"Could not save the catalog snapshot: {e}")
+
+
+def load_catalog(data_file=DATA_FILE):
+    """Load the catalog from its snapshot, or read the CSV file and build a fresh one"""
+    texts = get_text_store(text_store_path(data_file))
+    # Deltas published from here on are applied to the catalog; earlier ones are in the CSV file
+    offset = journal_size(data_file)
+    version = catalog_version(data_file)
+    if CATALOG_SNAPSHOT:
+        with timed('snapshot_read'):
+            catalog = read_snapshot(data_file, version)
+        if catalog is not None:
+            print(f"Loaded catalog version {version} from its snapshot")
+            catalog.texts = texts
+            catalog.journal_offset = offset
+            return catalog
+
+    # pandas is only needed to read the CSV file, so a start from the snapshot never imports it
+    import pandas as pd
+    with timed('csv_read'):
+        df = pd.read_csv(data_file)
+    if split_text_columns(df, data_file, texts):
+        version = catalog_version(data_file)
+    with timed('catalog_build'):
+        catalog = MovieCatalog(df, version, texts)
+    print(f"Built catalog version {version} with {len(df)} rows")
+    catalog.journal_offset = offset
+    if CATALOG_SNAPSHOT:
+        # Saved in the background, so the first request does not wait for it
+        threading.Thread(target=write_snapshot, args=(catalog, data_file), daemon=True).start()
+    return catalog
+
+
+def clear_catalog():
+    """Forget the cached catalog, so the next get_catalog() loads it again (e.g. from another file)"""
+    global _catalog
+    with _catalog_lock:
+        _catalog = None
+
+
+def get_catalog(data_file=DATA_FILE):
+    """
+    Return the current catalog.
+
+    When the CSV file changed, the deltas its writers published are applied
+    to the cached catalog; it is only rebuilt from the CSV file if a change
+    came without a delta.
+    """
+    global _catalog
+    catalog = _catalog
+    version = catalog_version(data_file)
+    # Text changes are published without touching the CSV file, so the journal is checked too
+    if catalog is not None and catalog.version == version and catalog.journal_offset == journal_size(data_file):
+        CACHE_LOOKUPS.inc(1, 'catalog', 'hit')
+        return catalog
+    CACHE_LOOKUPS.inc(1, 'catalog', 'miss')
+
+    with _catalog_lock:
+        # Another thread may have caught up while we were waiting
+        version = catalog_version(data_file)
+        if _catalog is not None and (_catalog.version != version
+                                     or _catalog.journal_offset != journal_size(data_file)):
+            updated = apply_deltas(_catalog, data_file)
+            if updated is not None:
+                _catalog = updated
+            # A writer publishes its delta just after writing the CSV file
+            recent = time.time() - os.path.getmtime(data_file) < DELTA_GRACE_SECONDS
+            if _catalog.version != version and (updated is None or not recent):
+                _catalog = None
+        if _catalog is None:
+            _catalog = load_catalog(data_file)
+            # Build the text indexes and similar movies in the background; until they are ready, searches scan
+            # the ranking and similar movies are left out, so requests never wait for them
+            if BUILD_CONTENT_IN_BACKGROUND:
+                _catalog._content.start_build()
+        return _catalog
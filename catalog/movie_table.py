@@ -0,0 +1,273 @@
+import copy
+import re
+from bisect import bisect_left
+import numpy as np
+from catalog.genres import GenreBitmap, split_genres
+
+# Fields a Movie view exposes, readable as movie.field or movie['field']
+FIELDS = ('title', 'year', 'year_value', 'rating', 'genres', 'genre', 'image_path',
+          'large_image_path', 'movie_url', 'movie_id', 'index')
+
+# Years are stored as int16 codes; this marks an unknown year
+NO_YEAR = -1
+
+
+def movie_id(movie_url):
+    """Return the short id of a movie, the slug of its Letterboxd URL"""
+    if not isinstance(movie_url, str):
+        return None
+    return movie_url.strip('/').split('/')[-1] or None
+
+
+def parse_year(year):
+    """Extract a numeric year from a year cell, or None if it has no digits"""
+    match = re.search(r'(\d+)', str(year))
+    return int(match.group(1)) if match else None
+
+
+class KeyView:
+    """Sort keys of a sequence computed on access, so bisect can search it without a key list"""
+
+    def __init__(self, sequence, key):
+        self.sequence = sequence
+        self.key = key
+
+    def __len__(self):
+        return len(self.sequence)
+
+    def __getitem__(self, pos):
+        return self.key(self.sequence[pos])
+
+
+class StringColumn:
+    """Strings packed into one UTF-8 buffer plus offsets, instead of one Python object per movie"""
+
+    def __init__(self, values):
+        encoded = [value.encode('utf-8') if isinstance(value, str) else b'' for value in values]
+        self.buffer = b''.join(encoded)
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        self.offsets = offsets.astype(np.int32) if len(self.buffer) < 2 ** 31 else offsets
+        self.count = len(encoded)
+        # Values changed or appended by deltas since the column was built
+        self._changed = {}
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if self._changed and i in self._changed:
+            return self._changed[i]
+        value = self.buffer[self.offsets[i]:self.offsets[i + 1]]
+        return value.decode('utf-8') if value else None
+
+    def updated(self, values):
+        """Return a copy with {position: value} changes; positions past the end are appended"""
+        column = copy.copy(self)
+        column._changed = {**self._changed,
+                           **{i: value if isinstance(value, str) and value else None for i, value in values.items()}}
+        column.count = max(self.count, max(values) + 1) if values else self.count
+        return column
+
+    @property
+    def nbytes(self):
+        return len(self.buffer) + self.offsets.nbytes
+
+
+class Movie:
+    """A view of one movie in a MovieTable; fields are read from the columns when accessed"""
+
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = int(index)
+
+    @property
+    def title(self):
+        return self.table.titles[self.index] or ''
+
+    @property
+    def year_value(self):
+        year = int(self.table.years[self.index])
+        return year if year != NO_YEAR else None
+
+    # The raw year cell is not kept; templates show the parsed year
+    year = year_value
+
+    @property
+    def rating(self):
+        return float(self.table.ratings[self.index])
+
+    @property
+    def genres(self):
+        return self.table.genre_bitmap.names(self.index)
+
+    @property
+    def genre(self):
+        return ', '.join(self.genres)
+
+    @property
+    def image_path(self):
+        return self.table.image_paths[self.index]
+
+    @property
+    def large_image_path(self):
+        return self.table.large_image_paths[self.index]
+
+    @property
+    def movie_url(self):
+        return self.table.movie_urls[self.index]
+
+    @property
+    def movie_id(self):
+        return movie_id(self.movie_url)
+
+    def __getitem__(self, key):
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in FIELDS
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in FIELDS else default
+
+    def __eq__(self, other):
+        return isinstance(other, Movie) and other.table is self.table and other.index == self.index
+
+    def __hash__(self):
+        return hash(self.index)
+
+    def __repr__(self):
+        return f"Movie({self.title!r}, {self.year_value})"
+
+
+class MovieList:
+    """The movies at some positions of a table, with views created only when accessed"""
+
+    def __init__(self, table, indexes):
+        self.table = table
+        self.indexes = indexes
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [Movie(self.table, i) for i in self.indexes[pos]]
+        return Movie(self.table, self.indexes[pos])
+
+    def __iter__(self):
+        return (Movie(self.table, i) for i in self.indexes)
+
+
+class MovieTable:
+    """
+    Movies stored column by column: packed strings, numpy numbers and genre bitmasks.
+
+    One movie costs a few hundred bytes instead of a dict of Python objects;
+    indexing the table returns a Movie view for rendering.
+    """
+
+    def __init__(self, df):
+        count = len(df)
+
+        def column(name):
+            return df[name].tolist() if name in df.columns else [None] * count
+
+        urls = column('movie_url')
+        self.titles = StringColumn(df['title'].fillna('').astype(str).tolist())
+        self.movie_urls = StringColumn(urls)
+        self.image_paths = StringColumn(column('image_path'))
+        self.large_image_paths = StringColumn(column('large_image_path'))
+        self.ratings = np.nan_to_num(np.array(column('rating'), dtype=np.float64), nan=0.0)
+        years = [parse_year(year) for year in column('year')]
+        self.years = np.array([year if year is not None and 0 <= year < 2 ** 15 else NO_YEAR for year in years],
+                              dtype=np.int16)
+
+        # Genre names are interned once; each movie only holds a bitmask
+        genre_lists = [split_genres(cell) for cell in column('genre')]
+        self.genres = sorted({genre for genres in genre_lists for genre in genres})
+        self.genre_bitmap = GenreBitmap(self.genres, genre_lists)
+
+        # Table positions sorted by movie id, to find a movie with a binary search
+        ids = [movie_id(url) or '' for url in urls]
+        self._id_order = np.array(sorted(range(count), key=ids.__getitem__), dtype=np.int32)
+
+    def __len__(self):
+        return len(self.ratings)
+
+    def __getitem__(self, i):
+        return Movie(self, i)
+
+    def __iter__(self):
+        return (Movie(self, i) for i in range(len(self)))
+
+    def find(self, key):
+        """Return the position of the movie with an id, or None"""
+        keys = KeyView(self._id_order, lambda i: movie_id(self.movie_urls[i]) or '')
+        pos = bisect_left(keys, key)
+        if pos < len(keys) and keys[pos] == key:
+            return int(self._id_order[pos])
+        return None
+
+    def upsert(self, df):
+        """
+        Return a copy of the table with the rows of df updated or appended,
+        and the positions of those rows. The table itself is left untouched.
+        """
+        # Movies not found are appended in order
+        positions = []
+        appended = []
+        for url in df['movie_url']:
+            position = self.find(movie_id(url) or '')
+            if position is None:
+                position = len(self) + len(appended)
+                appended.append(position)
+            positions.append(position)
+        count = len(self) + len(appended)
+
+        def column(name):
+            return df[name].tolist() if name in df.columns else [None] * len(df)
+
+        table = copy.copy(self)
+        table.titles = self.titles.updated(dict(zip(positions, df['title'].fillna('').astype(str))))
+        table.movie_urls = self.movie_urls.updated(dict(zip(positions, column('movie_url'))))
+        table.image_paths = self.image_paths.updated(dict(zip(positions, column('image_path'))))
+        table.large_image_paths = self.large_image_paths.updated(dict(zip(positions, column('large_image_path'))))
+
+        table.ratings = np.zeros(count, dtype=np.float64)
+        table.ratings[:len(self)] = self.ratings
+        table.ratings[positions] = np.nan_to_num(np.array(column('rating'), dtype=np.float64), nan=0.0)
+        table.years = np.full(count, NO_YEAR, dtype=np.int16)
+        table.years[:len(self)] = self.years
+        years = [parse_year(year) for year in column('year')]
+        table.years[positions] = [year if year is not None and 0 <= year < 2 ** 15 else NO_YEAR for year in years]
+
+        table.genre_bitmap = self.genre_bitmap.updated(positions, [split_genres(cell) for cell in column('genre')],
+                                                       count)
+        table.genres = sorted(table.genre_bitmap.genres)
+
+        # Slot the new ids into the sorted id order
+        keys = KeyView(self._id_order, lambda i: movie_id(self.movie_urls[i]) or '')
+        appended.sort(key=lambda i: movie_id(table.movie_urls[i]) or '')
+        points = [bisect_left(keys, movie_id(table.movie_urls[i]) or '') for i in appended]
+        table._id_order = np.insert(self._id_order, points, np.array(appended, dtype=np.int32))
+        return table, positions
+
+    def rating_order(self):
+        """Return the table positions sorted by rating (highest first), ties broken by URL"""
+        count = len(self)
+        # Rank the URLs once, so ties are broken without comparing strings in the sort
+        url_rank = np.empty(count, dtype=np.int32)
+        url_rank[sorted(range(count), key=lambda i: self.movie_urls[i] or '')] = np.arange(count, dtype=np.int32)
+        return np.lexsort((url_rank, -self.ratings)).astype(np.int32)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the columns"""
+        return (self.titles.nbytes + self.movie_urls.nbytes + self.image_paths.nbytes
+                + self.large_image_paths.nbytes + self.ratings.nbytes + self.years.nbytes
+                + self.genre_bitmap.masks.nbytes + self._id_order.nbytes)
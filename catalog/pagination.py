@@ -0,0 +1,92 @@
+import base64
+from bisect import bisect_left, bisect_right
+
+# Limits for the page size requested by the user
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+
+
+def sort_key(movie):
+    """Key of the precomputed order: highest rating first, ties broken by URL"""
+    url = movie.get('movie_url')
+    return (-movie['rating'], url if isinstance(url, str) else '')
+
+
+def encode_cursor(movie):
+    """Encode the sort key of a movie into an opaque, URL-safe cursor"""
+    rating, url = sort_key(movie)
+    raw = f"{-rating!r}|{url}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor back into a sort key, or None if it is missing or invalid"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        rating, url = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').split('|', 1)
+        return (-float(rating), url)
+    except (ValueError, UnicodeError):
+        return None
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Validate a page size parameter"""
+    try:
+        page_size = int(value)
+    except (ValueError, TypeError):
+        return default
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+class Page:
+    """One page of results plus the cursors needed to move forwards and backwards"""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def paginate(ranking, page_size, after=None, before=None, predicate=None):
+    """
+    Return a page of a ranking using keyset pagination.
+
+    The cursor is the sort key of the last (or first) movie the user saw, so
+    a page is located with a binary search and costs O(log n + page size)
+    instead of re-filtering and re-sorting the whole result.
+    """
+    movies, keys = ranking.movies, ranking.keys
+
+    before_key = decode_cursor(before)
+    if before_key is not None:
+        # Walk backwards from the first movie of the page the user came from
+        items = []
+        i = bisect_left(keys, before_key) - 1
+        while i >= 0 and len(items) <= page_size:
+            if predicate is None or predicate(movies[i]):
+                items.append(movies[i])
+            i -= 1
+        has_more = len(items) > page_size
+        items = items[:page_size][::-1]
+        if items:
+            return Page(items,
+                        next_cursor=encode_cursor(items[-1]),
+                        prev_cursor=encode_cursor(items[0]) if has_more else None)
+
+    after_key = decode_cursor(after) if before_key is None else None
+    start = bisect_right(keys, after_key) if after_key is not None else 0
+
+    items = []
+    i = start
+    while i < len(movies) and len(items) <= page_size:
+        if predicate is None or predicate(movies[i]):
+            items.append(movies[i])
+        i += 1
+    has_more = len(items) > page_size
+    items = items[:page_size]
+
+    return Page(items,
+                next_cursor=encode_cursor(items[-1]) if has_more else None,
+                prev_cursor=encode_cursor(items[0]) if start > 0 and items else None)
@@ -0,0 +1,60 @@
+import copy
+import numpy as np
+
+
+def tie_position(values, indexes, value, i):
+    """Return where catalog index i with a value sits in sorted arrays whose ties are in index order"""
+    start = np.searchsorted(values, value, side='left')
+    end = np.searchsorted(values, value, side='right')
+    return start + int(np.searchsorted(indexes[start:end], i))
+
+
+class RangeIndex:
+    """Catalog indexes sorted by a numeric value, so a range lookup is a binary search"""
+
+    def __init__(self, values, missing=None):
+        # values is a numpy column; movies holding the missing value (or NaN) never match a range
+        order = np.argsort(values, kind='stable')
+        order = order[self._known(values[order], missing)]
+        self.missing = missing
+        # The column the index was built from, to look up the old values a delta replaces
+        self.column = values
+        # Stable sort, so ties stay in catalog index order and any entry is found by binary search
+        self.values = values[order]
+        self.indexes = order.astype(np.int32)
+
+    @staticmethod
+    def _known(values, missing):
+        return values != missing if missing is not None else ~np.isnan(values)
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def updated(self, positions, column):
+        """Return a copy for a newer version of the column, in which the values at some positions changed"""
+        positions = np.unique(np.asarray(positions, dtype=np.int32))
+        old = positions[positions < len(self.column)]
+        old = old[self._known(self.column[old], self.missing)]
+        removed = [tie_position(self.values, self.indexes, value, i) for value, i in zip(self.column[old], old)]
+        sorted_values, indexes = self.values, self.indexes
+        if removed:
+            sorted_values, indexes = np.delete(sorted_values, removed), np.delete(indexes, removed)
+
+        values = column[positions]
+        known = self._known(values, self.missing)
+        added_values, added_positions = values[known], positions[known]
+        order = np.lexsort((added_positions, added_values))
+        added_values, added_positions = added_values[order], added_positions[order]
+        points = [tie_position(sorted_values, indexes, value, i) for value, i in zip(added_values, added_positions)]
+
+        index = copy.copy(self)
+        index.column = column
+        index.values = np.insert(sorted_values, points, added_values)
+        index.indexes = np.insert(indexes, points, added_positions).astype(np.int32)
+        return index
+
+    def range(self, low=None, high=None):
+        """Return the catalog indexes with low <= value <= high, in O(log n + matches)"""
+        start = np.searchsorted(self.values, low, side='left') if low is not None else 0
+        end = np.searchsorted(self.values, high, side='right') if high is not None else len(self.values)
+        return self.indexes[start:end]
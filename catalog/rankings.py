@@ -0,0 +1,155 @@
+import copy
+import random
+from bisect import bisect_left
+import numpy as np
+from catalog.movie_table import KeyView, MovieList
+
+
+def build_alias_table(weights):
+    """
+    Build Vose alias tables so a weighted draw costs O(1).
+
+    Light buckets (below the average weight) take their alias from the heavy
+    ones in order, and a heavy bucket turns light once it has given away its
+    surplus. Which heavy bucket fills which light one follows from prefix sums
+    of the deficits and surpluses, so the tables are built with numpy alone.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    count = len(weights)
+    probability = np.ones(count, dtype=np.float64)
+    alias = np.arange(count, dtype=np.int32)
+    total = float(weights.sum())
+    # Fall back to a uniform draw when no movie has a positive rating
+    if count == 0 or total <= 0:
+        return probability, alias
+
+    # Scale weights so that the average bucket holds exactly 1.0
+    scaled = weights * count / total
+    light = np.flatnonzero(scaled < 1.0)
+    heavy = np.flatnonzero(scaled >= 1.0)
+    if not len(light) or not len(heavy):
+        return probability, alias
+    deficits = np.cumsum(1.0 - scaled[light])
+    surpluses = np.cumsum(scaled[heavy] - 1.0)
+
+    # A light bucket is filled by the first heavy one whose surplus the deficits before it have not used up
+    before = np.concatenate(([0.0], deficits[:-1]))
+    donor = np.minimum(np.searchsorted(surpluses, before, side='left'), len(heavy) - 1)
+    probability[light] = scaled[light]
+    alias[light] = heavy[donor]
+
+    # A heavy bucket turns light at the first light bucket that uses up its surplus; what it gave away
+    # beyond the surplus is filled by the next heavy bucket. The last one is full up to floating point error.
+    spent = np.searchsorted(deficits, surpluses[:-1], side='right')
+    turned = np.flatnonzero(spent < len(light))
+    probability[heavy[turned]] = np.clip(1.0 - (deficits[spent[turned]] - surpluses[turned]), 0.0, 1.0)
+    alias[heavy[turned]] = heavy[turned + 1]
+    return probability, alias
+
+
+class RankingKey:
+    """The sort key of the rankings: highest rating first, ties broken by URL (a class, so catalogs pickle)"""
+
+    def __init__(self, table):
+        self.table = table
+
+    def __call__(self, i):
+        return -float(self.table.ratings[i]), self.table.movie_urls[i] or ''
+
+
+def ranking_key(table):
+    """Return the sort key of the rankings: highest rating first, ties broken by URL"""
+    return RankingKey(table)
+
+
+def updated_order(indexes, removed, added, old_key, key):
+    """
+    Return a ranking order with some positions taken out and others slotted in,
+    and the slice of the new order whose positions moved.
+
+    Removed positions are found by a binary search with their key in the old
+    table (positions not in the order are skipped), and the kept order is
+    copied once instead of re-sorting the whole catalog, so applying a small
+    delta costs a binary search per changed movie.
+    """
+    old_keys = KeyView(indexes, old_key)
+    points = [bisect_left(old_keys, old_key(i)) for i in removed]
+    points = sorted(point for point, i in zip(points, removed) if point < len(indexes) and indexes[point] == i)
+    kept = np.delete(indexes, points) if points else indexes
+    added = sorted(added, key=key)
+    keys = KeyView(kept, key)
+    inserts = [bisect_left(keys, key(i)) for i in added]
+    order = np.insert(kept, inserts, np.array(added, dtype=np.int32)).astype(np.int32)
+
+    # Positions before the first change keep their place; so do those after the last one if the length is kept
+    changed = points + [point + n for n, point in enumerate(inserts)]
+    if not changed:
+        return order, slice(0, 0)
+    end = max(changed) + 1 if len(order) == len(indexes) else len(order)
+    return order, slice(min(changed), end)
+
+
+class GenreRanking:
+    """Movies of a single genre, sorted by rating, ready for top-k and random picks"""
+
+    def __init__(self, table, indexes, alias_table=False):
+        # indexes are table positions already sorted by rating (highest first)
+        self.table = table
+        self.indexes = indexes
+        self.movies = MovieList(table, indexes)
+        # Sort keys of the movies, computed on access to locate pagination cursors
+        self.keys = KeyView(indexes, ranking_key(table))
+        # The catalog's own rankings build their alias tables with it; one-off filtered rankings do not
+        self._probability = None
+        self._alias = None
+        if alias_table:
+            self.build_alias_table()
+
+    def build_alias_table(self):
+        """Build the alias table for weighted picks, once"""
+        if self._probability is None:
+            probability, alias = build_alias_table(self.weights())
+            # The alias goes in first: a pick only reads it once the probabilities are there
+            self._alias = alias
+            self._probability = probability
+
+    def weights(self):
+        """Return the weights of a weighted pick: the ratings, with negative ones counted as zero"""
+        return np.maximum(self.table.ratings[self.indexes], 0.0)
+
+    def __len__(self):
+        return len(self.movies)
+
+    def for_table(self, table):
+        """Return the same ranking reading a newer version of its table, whose changes left it alone"""
+        ranking = copy.copy(self)
+        ranking.table = table
+        ranking.movies = MovieList(table, self.indexes)
+        ranking.keys = KeyView(self.indexes, ranking_key(table))
+        return ranking
+
+    def top(self, k):
+        """Return the k highest rated movies"""
+        return self.movies[:k]
+
+    def pick(self, rng=random):
+        """Return a uniformly random movie"""
+        if not self.movies:
+            return None
+        return self.movies[rng.randrange(len(self.movies))]
+
+    def weighted_pick(self, rng=random):
+        """Return a random movie, with higher rated movies proportionally more likely"""
+        if not self.movies:
+            return None
+        if self._probability is None:
+            # Rankings without an alias table are drawn from once, so a cumulative sum is cheaper
+            cumulative = np.cumsum(self.weights())
+            if cumulative[-1] <= 0:
+                return self.pick(rng)
+            i = int(np.searchsorted(cumulative, rng.random() * cumulative[-1], side='right'))
+            return self.movies[min(i, len(self.movies) - 1)]
+        i = rng.randrange(len(self.movies))
+        if rng.random() < self._probability[i]:
+            return self.movies[i]
+        return self.movies[self._alias[i]]
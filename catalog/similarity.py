@@ -0,0 +1,175 @@
+import math
+import re
+from collections import Counter
+import numpy as np
+from catalog.description import parse_description
+
+# Number of similar movies kept for each movie
+NEIGHBOR_COUNT = 5
+
+# Relative weight of each kind of feature
+GENRE_WEIGHT = 2.0
+CAST_WEIGHT = 1.5
+SYNOPSIS_WEIGHT = 1.0
+
+# Only the top-billed cast says much about a movie
+MAX_CAST = 20
+
+# Upper bound on the size of a dense block of similarity scores
+BLOCK_ELEMENTS = 4_000_000
+
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from', 'has', 'have', 'he',
+    'her', 'his', 'in', 'into', 'is', 'it', 'its', 'of', 'on', 'one', 'or', 'she', 'that', 'the',
+    'their', 'them', 'they', 'this', 'to', 'was', 'when', 'where', 'which', 'while', 'who', 'will',
+    'with', 'after', 'all', 'about', 'out', 'up', 'what', 'him', 'own', 'only', 'more', 'than'
+}
+
+
+def tokenize(text):
+    """Split text into lowercase words, skipping stop words and very short words"""
+    return [w for w in re.findall(r'[a-z0-9]+', text.lower()) if len(w) > 2 and w not in STOP_WORDS]
+
+
+def movie_features(movie):
+    """Return weighted genre, cast and synopsis terms for a movie"""
+    features = Counter()
+    for genre in movie['genres']:
+        features[f"genre:{genre.lower()}"] += GENRE_WEIGHT
+
+    parts = parse_description(movie['description'])
+    # Weight the cast by billing order, so leads count more than extras
+    for position, name in enumerate(movie['cast'][:MAX_CAST]):
+        features[f"cast:{name.lower()}"] += CAST_WEIGHT / math.sqrt(position + 1)
+
+    for word in tokenize(f"{parts['tagline']} {parts['synopsis']}"):
+        features[f"word:{word}"] += SYNOPSIS_WEIGHT
+    return features
+
+
+class SimilarityIndex:
+    """
+    TF-IDF content vectors with the nearest neighbours of every movie precomputed.
+
+    Neighbours are computed once per catalog version, so looking up similar
+    movies is an array read. Rows enriched later are updated in place with
+    one sparse matrix-vector product instead of a full rebuild.
+    """
+
+    def __init__(self, movies, k=NEIGHBOR_COUNT):
+        self.k = k
+        features = [movie_features(movie) for movie in movies]
+
+        doc_freq = Counter()
+        for terms in features:
+            doc_freq.update(terms.keys())
+        self.vocabulary = {term: j for j, term in enumerate(doc_freq)}
+        count = len(movies)
+        self.idf = np.array([math.log((1 + count) / (1 + doc_freq[term])) + 1 for term in doc_freq],
+                            dtype=np.float64)
+
+        rows, cols, values = [], [], []
+        for i, terms in enumerate(features):
+            for term, weight in terms.items():
+                rows.append(i)
+                cols.append(self.vocabulary[term])
+                values.append(weight)
+        # scipy takes a tenth of a second to import, so it is loaded with the first index rather than at startup
+        from scipy import sparse
+        matrix = sparse.csr_matrix((values, (rows, cols)), shape=(count, len(self.vocabulary)))
+        self.matrix = self._normalize(matrix.multiply(self.idf).tocsr())
+
+        self.neighbor_ids = np.full((count, k), -1, dtype=np.int32)
+        self.neighbor_scores = np.zeros((count, k), dtype=np.float32)
+        self._compute_all_neighbors()
+
+    @staticmethod
+    def _normalize(matrix):
+        """Scale every row to unit length so dot products are cosine similarities"""
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        from scipy import sparse
+        return sparse.diags(1.0 / norms).dot(matrix).tocsr()
+
+    def _compute_all_neighbors(self):
+        """Compute the top k neighbours of every row, a block of rows at a time"""
+        count = self.matrix.shape[0]
+        if count == 0:
+            return
+        block_rows = max(1, BLOCK_ELEMENTS // count)
+        transposed = self.matrix.T.tocsc()
+        for start in range(0, count, block_rows):
+            end = min(start + block_rows, count)
+            scores = (self.matrix[start:end] @ transposed).toarray()
+            # A movie is not similar to itself
+            scores[np.arange(end - start), np.arange(start, end)] = 0.0
+            for offset in range(end - start):
+                self._set_row(start + offset, scores[offset])
+
+    def _set_row(self, i, scores):
+        """Keep the k best scores of a dense row as the neighbours of movie i"""
+        k = min(self.k, len(scores))
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        self._store(i, top, scores[top])
+
+    def _store(self, i, ids, scores):
+        """Write neighbour ids and scores for movie i, dropping non-positive scores"""
+        keep = scores > 0
+        ids, scores = ids[keep][:self.k], scores[keep][:self.k]
+        self.neighbor_ids[i] = -1
+        self.neighbor_scores[i] = 0.0
+        self.neighbor_ids[i, :len(ids)] = ids
+        self.neighbor_scores[i, :len(scores)] = scores
+
+    def _vector(self, movie):
+        """Build the normalized vector of a movie using the existing vocabulary"""
+        # Terms first seen after the last full build are ignored until the next one
+        cols, values = [], []
+        for term, weight in movie_features(movie).items():
+            j = self.vocabulary.get(term)
+            if j is not None:
+                cols.append(j)
+                values.append(weight * self.idf[j])
+        from scipy import sparse
+        vector = sparse.csr_matrix((values, ([0] * len(cols), cols)), shape=(1, len(self.vocabulary)))
+        return self._normalize(vector)
+
+    def update(self, i, movie):
+        """Recompute the vector of one enriched or added movie and patch the affected neighbour lists"""
+        from scipy import sparse
+        vector = self._vector(movie)
+        count = self.matrix.shape[0]
+        if i >= count:
+            # Movies added by a delta start with an empty vector and no neighbours
+            grow = i + 1 - count
+            self.matrix = sparse.vstack([self.matrix, sparse.csr_matrix((grow, self.matrix.shape[1]))]).tocsr()
+            self.neighbor_ids = np.vstack([self.neighbor_ids, np.full((grow, self.k), -1, dtype=np.int32)])
+            self.neighbor_scores = np.vstack([self.neighbor_scores, np.zeros((grow, self.k), dtype=np.float32)])
+        self.matrix = sparse.vstack([self.matrix[:i], vector, self.matrix[i + 1:]]).tocsr()
+
+        scores = np.asarray((self.matrix @ vector.T).toarray()).ravel()
+        scores[i] = 0.0
+        self._set_row(i, scores)
+
+        # Refresh rows that already list this movie, and add it to rows it now beats
+        listed = np.nonzero((self.neighbor_ids == i).any(axis=1))[0]
+        better = np.nonzero(scores > self.neighbor_scores[:, -1])[0]
+        for j in np.union1d(listed, better):
+            if j == i:
+                continue
+            ids = self.neighbor_ids[j]
+            mask = (ids >= 0) & (ids != i)
+            ids = np.append(ids[mask], i)
+            row_scores = np.append(self.neighbor_scores[j][mask], scores[j])
+            order = np.argsort(-row_scores, kind='stable')
+            self._store(j, ids[order], row_scores[order])
+
+    def similar(self, i, k=None):
+        """Return (movie index, score) pairs for the movies most similar to movie i"""
+        k = self.k if k is None else min(k, self.k)
+        return [(int(j), float(score))
+                for j, score in zip(self.neighbor_ids[i, :k], self.neighbor_scores[i, :k]) if j >= 0]
@@ -0,0 +1,234 @@
+import random
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from catalog import movie_catalog
+from catalog.deltas import catalog_version, publish_delta, write_movies
+from catalog.movie_catalog import clear_catalog, get_catalog, load_catalog, store_details, write_snapshot
+from catalog.text_index import ActorIndex, cast_matches
+from catalog.text_store import NO_DESCRIPTION
+
+MOVIES = pd.DataFrame({
+    'title': ['Alpha', 'Bravo', 'Charlie'],
+    'year': [1999, 2004, 2010],
+    'rating': [4.1, 3.7, 3.9],
+    'genre': ['Drama', 'Drama, Crime', 'Comedy'],
+    'description': NO_DESCRIPTION,
+    'image_path': [None, None, None],
+    'movie_url': ['/film/alpha/', '/film/bravo/', '/film/charlie/'],
+    'large_image_path': [None, None, None]
+})
+
+
+@pytest.fixture
+def data_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(movie_catalog, 'BUILD_CONTENT_IN_BACKGROUND', False)
+    monkeypatch.setattr(movie_catalog, 'CATALOG_SNAPSHOT', False)
+    path = str(tmp_path / 'movies.csv')
+    MOVIES.to_csv(path, index=False)
+    clear_catalog()
+    yield path
+    clear_catalog()
+
+
+def wait_for_patches(catalog):
+    """Index patches run on a background thread; wait until they are applied"""
+    deadline = time.time() + 5
+    while catalog._content._patcher is not None and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def enrich(data_file, movie_url, description, cast):
+    """Store details the way the detail route does and publish them as a text delta"""
+    catalog = get_catalog(data_file)
+    changes = store_details(catalog.texts, movie_url.strip('/').split('/')[-1], description, cast)
+    publish_delta(data_file, catalog_version(data_file),
+                  texts=[{'movie_url': movie_url, 'old': changes[0], 'new': changes[1]}])
+
+
+def search(catalog, query):
+    return {catalog.movies[i]['title'] for i in catalog.text_index.candidates(query)}
+
+
+def test_enriched_details_survive_deltas(data_file):
+    catalog = get_catalog(data_file)
+    catalog.build_content_indexes()
+
+    enrich(data_file, '/film/bravo/', '<strong>Deep.</strong><br>A submarine crew.', ['Clara Evans'])
+    catalog = get_catalog(data_file)
+    wait_for_patches(catalog)
+    assert catalog.texts is not None
+    assert catalog.details(catalog.get('bravo'))['cast'] == ['Clara Evans']
+    assert search(catalog, 'submarine') == {'Bravo'}
+    assert {catalog.movies[i]['title'] for i in catalog.actor_index.movie_indexes('clara')} == {'Bravo'}
+
+    # A second enrichment goes through the catalog the first delta produced
+    enrich(data_file, '/film/charlie/', '<strong>Light.</strong><br>A circus in winter.', ['Hugo Park'])
+    catalog = get_catalog(data_file)
+    wait_for_patches(catalog)
+    assert catalog.details(catalog.get('charlie'))['cast'] == ['Hugo Park']
+    assert search(catalog, 'circus') == {'Charlie'}
+    assert search(catalog, 'submarine') == {'Bravo'}
+
+
+def test_snapshot_keeps_text_store(data_file, monkeypatch):
+    catalog = get_catalog(data_file)
+    enrich(data_file, '/film/alpha/', '<strong>Alpha.</strong><br>Mountain climbers.', ['Iris Kim'])
+    catalog = get_catalog(data_file)
+    write_snapshot(catalog, data_file)
+    # Writing the snapshot leaves the catalog being served as it was
+    assert catalog.texts is not None and catalog._content is not None
+
+    monkeypatch.setattr(movie_catalog, 'CATALOG_SNAPSHOT', True)
+    loaded = load_catalog(data_file)
+    loaded.build_content_indexes()
+    assert loaded.texts is not None
+    assert loaded.details(loaded.get('alpha'))['cast'] == ['Iris Kim']
+    assert search(loaded, 'mountain') == {'Alpha'}
+
+
+def urls(movies):
+    return [movie['movie_url'] for movie in movies]
+
+
+def assert_same_catalog(patched, rebuilt):
+    """Check the parts of a catalog patched by deltas against a catalog built from the CSV file"""
+    assert patched.version == rebuilt.version
+    assert len(patched) == len(rebuilt)
+    assert patched.genres == rebuilt.genres
+    assert patched.rankings.keys() == rebuilt.rankings.keys()
+    for key in rebuilt.rankings:
+        assert np.array_equal(patched.rankings[key].indexes, rebuilt.rankings[key].indexes), key
+    assert np.array_equal(patched.rank_order, rebuilt.rank_order)
+    assert np.array_equal(patched.rank_position, rebuilt.rank_position)
+    for name in ('year_index', 'rating_index'):
+        assert np.array_equal(getattr(patched, name).indexes, getattr(rebuilt, name).indexes), name
+        assert np.array_equal(getattr(patched, name).values, getattr(rebuilt, name).values), name
+
+
+def test_delta_matches_full_rebuild(data_file, monkeypatch):
+    get_catalog(data_file)
+    changed = pd.concat([MOVIES, pd.DataFrame([{
+        'title': 'Delta', 'year': 2001, 'rating': 3.7, 'genre': 'Horror', 'description': NO_DESCRIPTION,
+        'image_path': None, 'movie_url': '/film/delta/', 'large_image_path': None}])], ignore_index=True)
+    changed.loc[0, 'genre'] = 'Drama, Horror'
+    changed.loc[1, 'rating'] = 4.6
+    changed.loc[2, 'title'] = 'Charlie Returns'
+    write_movies(changed, data_file, previous_df=MOVIES)
+
+    # The catalog must come from the delta, not from reading the CSV file again
+    monkeypatch.setattr(movie_catalog, 'load_catalog', lambda *args: pytest.fail("the delta was not applied"))
+    patched = get_catalog(data_file)
+    rebuilt = load_catalog(data_file)
+
+    assert_same_catalog(patched, rebuilt)
+    assert len(patched) == 4
+    assert patched.rankings.keys() == rebuilt.rankings.keys()
+    for key in rebuilt.rankings:
+        assert urls(patched.rankings[key].movies) == urls(rebuilt.rankings[key].movies), key
+    assert urls(patched.filtered_ranking(['Drama', 'Horror'], 'and').movies) == \
+        urls(rebuilt.filtered_ranking(['Drama', 'Horror'], 'and').movies)
+    for catalog in (patched, rebuilt):
+        assert sorted(urls(catalog.movies[i] for i in catalog.rating_index.range(3.6, 4.2))) == \
+            ['/film/alpha/', '/film/charlie/', '/film/delta/']
+        assert sorted(urls(catalog.movies[i] for i in catalog.year_index.range(2000, 2005))) == \
+            ['/film/bravo/', '/film/delta/']
+        assert [movie['title'] for movie in catalog.title_index.suggest('char')] == ['Charlie Returns']
+        assert catalog.get('delta')['genres'] == ['Horror']
+
+
+def test_similar_never_waits_for_the_build(data_file):
+    catalog = get_catalog(data_file)
+    content = catalog._content
+    # A build in progress holds the lock for as long as it takes
+    content.similarity_lock.acquire()
+    try:
+        found = []
+        request = threading.Thread(target=lambda: found.append(catalog.similar(catalog.get('alpha'))))
+        request.start()
+        request.join(timeout=2)
+        assert not request.is_alive() and found == [[]]
+        assert not catalog.content_ready
+    finally:
+        content.similarity_lock.release()
+    # The request started the build in the background instead
+    content._builder.join(timeout=5)
+    assert catalog.content_ready
+    assert 'Bravo' in [movie['title'] for movie in catalog.similar(catalog.get('alpha'))]
+
+
+def test_text_indexes_never_wait_for_the_build(data_file):
+    catalog = get_catalog(data_file)
+    enrich(data_file, '/film/alpha/', '<strong>Alpha.</strong><br>Mountain climbers.', ['Iris Kim-Lee'])
+    catalog = get_catalog(data_file)
+    wait_for_patches(catalog)
+    content = catalog._content
+    content.text_lock.acquire()
+    try:
+        found = []
+        request = threading.Thread(target=lambda: found.append((catalog.text_index, catalog.actor_index)))
+        request.start()
+        request.join(timeout=2)
+        assert not request.is_alive() and found == [(None, None)]
+    finally:
+        content.text_lock.release()
+    content._builder.join(timeout=5)
+    assert catalog.text_index is not None and catalog.actor_index is not None
+
+
+def test_cast_matches_like_the_actor_index():
+    casts = [['Iris Kim-Lee'], ['Clara Evans', 'Hugo Park'], ['Zoë Saldaña'], []]
+    index = ActorIndex([{'cast': cast} for cast in casts])
+    for query in ('iris', 'kim', 'lee', 'iris kim', 'Evans', 'hugo p', 'zoe', 'saldana', 'ris', 'ark', 'x', ''):
+        assert {i for i, cast in enumerate(casts) if cast_matches(query, cast)} == index.movie_indexes(query), query
+
+
+def test_delta_reranks_touched_genres_and_drops_emptied_ones(data_file, monkeypatch):
+    catalog = get_catalog(data_file)
+    changed = MOVIES.copy()
+    # Charlie was the only comedy
+    changed.loc[2, 'genre'] = 'Crime'
+    write_movies(changed, data_file, previous_df=MOVIES)
+
+    monkeypatch.setattr(movie_catalog, 'load_catalog', lambda *args: pytest.fail("the delta was not applied"))
+    patched = get_catalog(data_file)
+    rebuilt = load_catalog(data_file)
+    assert_same_catalog(patched, rebuilt)
+    assert patched.genres == ['Crime', 'Drama']
+    assert patched.ranking('Comedy') is None
+    # Drama has none of the changed movies, so its order is reused as it was
+    assert patched.ranking('Drama').indexes is catalog.ranking('Drama').indexes
+    assert patched.ranking('Drama').movies[0].table is patched.movies
+
+
+def test_random_deltas_match_full_rebuilds(data_file, monkeypatch):
+    rng = random.Random(7)
+    genres = ['Drama', 'Comedy', 'Crime', 'Horror', 'Western']
+
+    def movie(n):
+        return {'title': f"Movie {n} {rng.choice(['Red', 'Blue', 'Night'])}", 'year': rng.randint(1990, 2000),
+                'rating': rng.choice([3.0, 3.5, 4.0]), 'description': NO_DESCRIPTION,
+                'genre': ', '.join(rng.sample(genres, rng.randint(1, 2))),
+                'image_path': None, 'movie_url': f"/film/movie-{n}/", 'large_image_path': None}
+
+    df = pd.DataFrame([movie(n) for n in range(60)])
+    df.to_csv(data_file, index=False)
+    get_catalog(data_file)
+    rebuild = load_catalog
+    monkeypatch.setattr(movie_catalog, 'load_catalog', lambda *args: pytest.fail("the delta was not applied"))
+    for step in range(8):
+        changed = df.copy()
+        for i in rng.sample(range(len(changed)), 5):
+            fresh = movie(i)
+            column = rng.choice(['rating', 'year', 'genre', 'title'])
+            changed.loc[i, column] = fresh[column]
+        if step == 3:
+            # Western disappears altogether
+            changed['genre'] = changed['genre'].str.replace('Western', 'Drama').str.replace('Drama, Drama', 'Drama')
+        changed = pd.concat([changed, pd.DataFrame([movie(len(changed) + n) for n in range(step % 3)])],
+                            ignore_index=True)
+        write_movies(changed, data_file, previous_df=df)
+        df = changed
+        assert_same_catalog(get_catalog(data_file), rebuild(data_file))
@@ -0,0 +1,45 @@
+import pandas as pd
+from catalog.movie_table import MovieTable
+
+TABLE = pd.DataFrame({
+    'title': ['Alpha', 'Bravo'],
+    'year': [1999, 2004],
+    'rating': [4.1, 3.7],
+    'genre': ['Drama', 'Crime'],
+    'image_path': [None, None],
+    'movie_url': ['/film/alpha/', '/film/bravo/'],
+    'large_image_path': [None, None]
+})
+
+
+def rows(*movies):
+    return pd.DataFrame([{'title': title, 'year': 2020, 'rating': rating, 'genre': 'Comedy', 'image_path': None,
+                          'movie_url': url, 'large_image_path': None} for title, rating, url in movies])
+
+
+def test_upsert_updates_before_inserts():
+    table = MovieTable(TABLE)
+    updated, positions = table.upsert(rows(('Alpha Redux', 4.5, '/film/alpha/'),
+                                           ('Charlie', 3.2, '/film/charlie/'),
+                                           ('Delta', 2.9, '/film/delta/')))
+    assert positions == [0, 2, 3]
+    assert len(updated) == 4
+    assert [updated[i]['title'] for i in positions] == ['Alpha Redux', 'Charlie', 'Delta']
+    assert updated.find('charlie') == 2 and updated.find('delta') == 3 and updated.find('bravo') == 1
+    assert updated[0]['rating'] == 4.5 and updated[0]['genres'] == ['Comedy']
+
+
+def test_upsert_inserts_before_updates():
+    table = MovieTable(TABLE)
+    updated, positions = table.upsert(rows(('Charlie', 3.2, '/film/charlie/'), ('Bravo', 1.0, '/film/bravo/')))
+    assert positions == [2, 1]
+    assert updated.find('charlie') == 2
+    assert updated[1]['rating'] == 1.0
+
+
+def test_upsert_leaves_the_table_untouched():
+    table = MovieTable(TABLE)
+    table.upsert(rows(('Alpha Redux', 4.5, '/film/alpha/'), ('Charlie', 3.2, '/film/charlie/')))
+    assert len(table) == 2
+    assert table[0]['title'] == 'Alpha' and table[0]['rating'] == 4.1
+    assert table.find('charlie') is None
@@ -0,0 +1,56 @@
+import pandas as pd
+from catalog.movie_catalog import ANY_GENRE, MovieCatalog
+from catalog.pagination import decode_cursor, encode_cursor, paginate, parse_page_size
+
+# 23 movies with many tied ratings, so pages have to break ties by URL
+MOVIES = pd.DataFrame({
+    'title': [f"Movie {i}" for i in range(23)],
+    'year': [2000 + i for i in range(23)],
+    'rating': [round(3.0 + (i % 4) * 0.5, 1) for i in range(23)],
+    'genre': ['Drama' if i % 3 else 'Comedy' for i in range(23)],
+    'image_path': None,
+    'movie_url': [f"/film/movie-{i}/" for i in range(23)],
+    'large_image_path': None
+})
+
+
+def walk_forward(ranking, page_size, predicate=None):
+    pages, after = [], None
+    while True:
+        page = paginate(ranking, page_size, after=after, predicate=predicate)
+        pages.append([movie['movie_url'] for movie in page.items])
+        if page.next_cursor is None:
+            return pages, page
+        after = page.next_cursor
+
+
+def test_pages_cover_the_ranking_in_order():
+    ranking = MovieCatalog(MOVIES).ranking(ANY_GENRE)
+    pages, _ = walk_forward(ranking, 4)
+    assert [len(page) for page in pages] == [4, 4, 4, 4, 4, 3]
+    assert sum(pages, []) == [movie['movie_url'] for movie in ranking.movies]
+
+
+def test_pages_walk_back_to_the_start():
+    ranking = MovieCatalog(MOVIES).ranking(ANY_GENRE)
+    pages, page = walk_forward(ranking, 5)
+    back = []
+    while page.prev_cursor is not None:
+        page = paginate(ranking, 5, before=page.prev_cursor)
+        back.append([movie['movie_url'] for movie in page.items])
+    assert back == pages[-2::-1]
+
+
+def test_pages_with_a_predicate():
+    ranking = MovieCatalog(MOVIES).ranking(ANY_GENRE)
+    pages, _ = walk_forward(ranking, 3, predicate=lambda movie: movie['year'] % 2 == 0)
+    expected = [movie['movie_url'] for movie in ranking.movies if movie['year'] % 2 == 0]
+    assert sum(pages, []) == expected
+    assert all(len(page) == 3 for page in pages[:-1])
+
+
+def test_cursors():
+    movie = MovieCatalog(MOVIES).ranking(ANY_GENRE).movies[0]
+    assert decode_cursor(encode_cursor(movie)) == (-movie['rating'], movie['movie_url'])
+    assert decode_cursor('not a cursor!') is None
+    assert parse_page_size('500') == 50 and parse_page_size('x') == 10 and parse_page_size('0') == 1
@@ -0,0 +1,67 @@
+import random
+import numpy as np
+import pandas as pd
+from catalog.movie_catalog import ANY_GENRE, MovieCatalog
+from catalog.rankings import build_alias_table
+
+MOVIES = pd.DataFrame({
+    'title': ['Alpha', 'Bravo', 'Charlie', 'Delta'],
+    'year': [1999, 2004, 2010, 2012],
+    'rating': [4.0, 2.0, 1.0, 0.0],
+    'genre': ['Drama', 'Drama, Crime', 'Comedy', 'Drama'],
+    'image_path': None,
+    'movie_url': ['/film/alpha/', '/film/bravo/', '/film/charlie/', '/film/delta/'],
+    'large_image_path': None
+})
+
+
+def implied_weights(probability, alias):
+    """Return how much of each bucket's draw lands on each item, scaled like the weights"""
+    implied = probability.copy()
+    np.add.at(implied, alias, 1.0 - probability)
+    return implied
+
+
+def test_alias_table_matches_the_weights():
+    rng = np.random.default_rng(3)
+    for count in (1, 2, 3, 10, 500):
+        for _ in range(20):
+            weights = rng.choice([0.0, 0.5, 1.0, 3.5, 4.5, 5.0], count) * rng.random(count)
+            probability, alias = build_alias_table(weights)
+            expected = weights * count / weights.sum() if weights.sum() > 0 else np.ones(count)
+            assert np.allclose(implied_weights(probability, alias), expected)
+
+
+def test_alias_table_edge_cases():
+    assert [len(table) for table in build_alias_table([])] == [0, 0]
+    probability, alias = build_alias_table([0.0, 0.0])
+    assert probability.tolist() == [1.0, 1.0] and alias.tolist() == [0, 1]
+    probability, alias = build_alias_table([2.0, 2.0, 2.0])
+    assert probability.tolist() == [1.0, 1.0, 1.0]
+
+
+def picks(ranking, draws=20000):
+    rng = random.Random(5)
+    counts = {}
+    for _ in range(draws):
+        title = ranking.weighted_pick(rng)['title']
+        counts[title] = counts.get(title, 0) + 1
+    return {title: count / draws for title, count in counts.items()}
+
+
+def test_catalog_rankings_come_with_alias_tables():
+    catalog = MovieCatalog(MOVIES)
+    assert all(ranking._probability is not None for ranking in catalog.rankings.values())
+    shares = picks(catalog.ranking(ANY_GENRE))
+    assert 'Delta' not in shares
+    assert abs(shares['Alpha'] - 4 / 7) < 0.02 and abs(shares['Charlie'] - 1 / 7) < 0.02
+
+
+def test_filtered_rankings_draw_without_an_alias_table():
+    catalog = MovieCatalog(MOVIES)
+    ranking = catalog.filtered_ranking(['Drama'], 'or', ['Crime'])
+    shares = picks(ranking)
+    assert ranking._probability is None
+    assert shares == {'Alpha': 1.0}
+    shares = picks(catalog.filtered_ranking(['Drama']))
+    assert 'Delta' not in shares and abs(shares['Alpha'] - 4 / 6) < 0.02
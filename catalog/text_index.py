@@ -0,0 +1,320 @@
+import copy
+import re
+import unicodedata
+from bisect import bisect_left
+import numpy as np
+from catalog.movie_table import KeyView
+
+# Minimum share of the query's trigrams a title must contain to count as a fuzzy match
+FUZZY_THRESHOLD = 0.5
+
+# How many distinct matches to look at when ranking autocomplete suggestions
+SUGGEST_SCAN_LIMIT = 64
+
+
+def normalize(text):
+    """Lowercase, strip accents and punctuation, and collapse whitespace"""
+    if not isinstance(text, str):
+        return ''
+    text = text.lower()
+    # Plain ASCII has no accents to strip
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r'[\W_]+', ' ', text).strip()
+
+
+def trigrams(text):
+    """Return the set of character trigrams of normalized text, padded at word edges"""
+    if not text:
+        return set()
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleText:
+    """Reads the normalized title of a table position (a class, so title indexes pickle)"""
+
+    def __init__(self, movies):
+        self.movies = movies
+
+    def __call__(self, i):
+        return normalize(self.movies[i]['title'])
+
+
+class PrefixIndex:
+    """Sorted word starts of texts, so any word of a text can be completed with a binary search"""
+
+    def __init__(self, text, ids):
+        # text(id) returns the normalized text of an id; only (id, offset) pairs are kept
+        self._text = text
+        entries = []
+        for text_id in ids:
+            value = text(text_id)
+            entries.extend((value[offset:], text_id, offset) for offset in self._word_starts(value))
+        entries.sort()
+        self._entries = np.array([(text_id, offset) for _, text_id, offset in entries],
+                                 dtype=np.int32).reshape(-1, 2)
+
+    @staticmethod
+    def _word_starts(text):
+        """Offsets of the words of the text, so any word can be completed"""
+        return [0] + [match.end() for match in re.finditer(' ', text)]
+
+    def _keys(self):
+        return KeyView(self._entries, lambda entry: self._text(entry[0])[entry[1]:])
+
+    def add(self, text_id):
+        """Insert the word starts of a new text, keeping the entries sorted"""
+        value = self._text(text_id)
+        for offset in self._word_starts(value):
+            pos = bisect_left(self._keys(), value[offset:])
+            self._entries = np.insert(self._entries, pos, (text_id, offset), axis=0)
+
+    def _locate(self, text_id, offset):
+        """Return the entry of a word start of a text, found with a binary search on its text"""
+        value = self._text(text_id)[offset:]
+        keys = self._keys()
+        pos = bisect_left(keys, value)
+        # Equal word starts of other texts may come first
+        while pos < len(keys) and keys[pos] == value:
+            if self._entries[pos, 0] == text_id and self._entries[pos, 1] == offset:
+                return pos
+            pos += 1
+        return None
+
+    def updated(self, text, ids, replaced=()):
+        """
+        Return a copy reading texts through text, with the word starts of some
+        ids inserted; those of the ids in replaced are taken out first, found
+        by their old text.
+        """
+        index = copy.copy(self)
+        index._text = text
+        if not ids and not replaced:
+            return index
+        removed = [self._locate(text_id, offset) for text_id in replaced
+                   for offset in self._word_starts(self._text(text_id))]
+        removed = [pos for pos in removed if pos is not None]
+        entries = np.delete(self._entries, removed, axis=0) if removed else self._entries
+
+        added = []
+        for text_id in ids:
+            value = text(text_id)
+            added.extend((value[offset:], text_id, offset) for offset in self._word_starts(value))
+        added.sort()
+        keys = KeyView(entries, lambda entry: text(entry[0])[entry[1]:])
+        points = [bisect_left(keys, value) for value, _, _ in added]
+        index._entries = np.insert(entries, points, np.array([(text_id, offset) for _, text_id, offset in added],
+                                                             dtype=np.int32).reshape(-1, 2), axis=0)
+        return index
+
+    def lookup(self, prefix, limit=SUGGEST_SCAN_LIMIT):
+        """Return up to limit distinct ids with a word start matching the normalized prefix"""
+        keys = self._keys()
+        start = bisect_left(keys, prefix)
+        found = []
+        seen = set()
+        for pos in range(start, len(keys)):
+            if len(found) >= limit or not keys[pos].startswith(prefix):
+                break
+            text_id = int(self._entries[pos, 0])
+            if text_id not in seen:
+                seen.add(text_id)
+                found.append(text_id)
+        return found
+
+
+class TitleIndex:
+    """Trigram and prefix indexes over movie titles, built once per catalog version"""
+
+    def __init__(self, movies):
+        self.movies = movies
+        postings = {}
+        for i, movie in enumerate(movies):
+            for gram in trigrams(normalize(movie['title'])):
+                postings.setdefault(gram, []).append(i)
+        # Posting lists as int32 arrays take a fraction of the memory of lists of ints
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+        self._prefixes = PrefixIndex(TitleText(movies), range(len(movies)))
+
+    def updated(self, movies, positions, old_titles):
+        """
+        Return a copy for a new table in which the movies at some positions
+        changed title or were added; old_titles holds None for added movies.
+        Only the posting arrays of the trigrams that changed are copied.
+        """
+        removed, added = {}, {}
+        # Only titles that changed are indexed again
+        changed, replaced = [], []
+        for i, old_title in zip(positions, old_titles):
+            old_text, new_text = normalize(old_title), normalize(movies[i]['title'])
+            if old_title is not None and old_text == new_text:
+                continue
+            changed.append(i)
+            if old_title is not None:
+                replaced.append(i)
+            old_grams = trigrams(old_text)
+            new_grams = trigrams(new_text)
+            for gram in old_grams - new_grams:
+                removed.setdefault(gram, []).append(i)
+            for gram in new_grams - old_grams:
+                added.setdefault(gram, []).append(i)
+
+        index = copy.copy(self)
+        index.movies = movies
+        index.postings = dict(self.postings)
+        for gram in removed.keys() | added.keys():
+            ids = self.postings.get(gram, np.empty(0, dtype=np.int32))
+            if gram in removed:
+                ids = ids[~np.isin(ids, removed[gram])]
+            if gram in added:
+                ids = np.append(ids, np.array(added[gram], dtype=np.int32))
+            index.postings[gram] = ids
+        index._prefixes = self._prefixes.updated(TitleText(movies), changed, replaced)
+        return index
+
+    def suggest(self, prefix, limit=8):
+        """Return up to limit movies whose title (or a word in it) starts with prefix"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        found = [self.movies[i] for i in self._prefixes.lookup(prefix)]
+
+        # Fall back to typo-tolerant matching if nothing starts with the prefix
+        if not found:
+            return self.fuzzy(prefix)[:limit]
+
+        found.sort(key=lambda movie: movie['rating'], reverse=True)
+        return found[:limit]
+
+    def fuzzy_scores(self, query, threshold=FUZZY_THRESHOLD):
+        """Return {movie index: score} for titles sharing enough trigrams with the query"""
+        query_grams = trigrams(normalize(query))
+        postings = [self.postings[gram] for gram in query_grams if gram in self.postings]
+        if not postings:
+            return {}
+
+        # Score by how much of the query appears in the title, so short
+        # queries still match long titles
+        ids, counts = np.unique(np.concatenate(postings), return_counts=True)
+        scores = counts / len(query_grams)
+        keep = scores >= threshold
+        return dict(zip(ids[keep].tolist(), scores[keep].tolist()))
+
+    def fuzzy(self, query, threshold=FUZZY_THRESHOLD):
+        """Return movies with titles similar to the query, best match first"""
+        scores = self.fuzzy_scores(query, threshold)
+        ranked = sorted(scores, key=lambda i: (-scores[i], -self.movies[i]['rating']))
+        return [self.movies[i] for i in ranked]
+
+
+def cast_matches(query, cast):
+    """Whether a cast has an actor ActorIndex.movie_indexes() would match for the query, without the index"""
+    query = normalize(query)
+    # A match starts at the beginning of a word of the name
+    return bool(query) and any(f" {normalize(name)}".find(f" {query}") >= 0 for name in cast)
+
+
+class ActorIndex:
+    """Inverted index from actor name to the movies they appear in"""
+
+    def __init__(self, movies):
+        self.movies = movies
+        self.postings = {}
+        for i, movie in enumerate(movies):
+            for name in movie['cast']:
+                key = normalize(name)
+                if key:
+                    self.postings.setdefault(key, []).append(i)
+        self._names = list(self.postings)
+        self._prefixes = PrefixIndex(self._names.__getitem__, range(len(self._names)))
+
+    def names(self, query, limit=SUGGEST_SCAN_LIMIT):
+        """Return indexed actor names matching the query exactly or by a word prefix"""
+        query = normalize(query)
+        if not query:
+            return []
+        if query in self.postings:
+            return [query]
+        return [self._names[i] for i in self._prefixes.lookup(query, limit)]
+
+    def movie_indexes(self, query):
+        """Return the set of movie indexes featuring an actor matching the query"""
+        found = set()
+        for name in self.names(query):
+            found.update(self.postings[name])
+        return found
+
+    def update(self, i, old_cast, new_cast):
+        """Move movie i from the postings of its old cast to those of its new cast"""
+        for name in old_cast:
+            postings = self.postings.get(normalize(name))
+            if postings and i in postings:
+                postings.remove(i)
+        for name in new_cast:
+            key = normalize(name)
+            if not key:
+                continue
+            if key not in self.postings:
+                self.postings[key] = []
+                self._names.append(key)
+                self._prefixes.add(len(self._names) - 1)
+            if i not in self.postings[key]:
+                self.postings[key].append(i)
+
+
+def substrings(text):
+    """Return the set of all three-character substrings of a lowercased text"""
+    if not isinstance(text, str):
+        return set()
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TextIndex:
+    """Trigram index over the title, description and cast of each movie, for substring search"""
+
+    def __init__(self, movies):
+        self.postings = {}
+        for i, movie in enumerate(movies):
+            for gram in self.grams(movie):
+                self.postings.setdefault(gram, set()).add(i)
+
+    @staticmethod
+    def grams(movie):
+        """Return the trigrams of every searchable field of a movie"""
+        grams = substrings(movie['title']) | substrings(movie['description'])
+        for name in movie['cast']:
+            grams |= substrings(name)
+        return grams
+
+    def candidates(self, query):
+        """
+        Return the indexes of movies that may contain the query, or None if
+        the query is too short to narrow anything down.
+
+        A movie containing the query contains all of its trigrams, so the
+        result is a superset of the matches that still has to be verified.
+        """
+        grams = substrings(query)
+        if not grams:
+            return None
+        postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+        found = set(postings[0])
+        for posting in postings[1:]:
+            if not found:
+                break
+            found &= posting
+        return found
+
+    def update(self, i, old_grams, new_grams):
+        """Move movie i from the postings of its old trigrams to those of its new ones"""
+        for gram in old_grams - new_grams:
+            posting = self.postings.get(gram)
+            if posting is not None:
+                posting.discard(i)
+        for gram in new_grams - old_grams:
+            self.postings.setdefault(gram, set()).add(i)
@@ -0,0 +1,77 @@
+import os
+import sqlite3
+import threading
+from catalog.description import dump_cast, load_cast
+
+# Placeholder the scraper writes for a description that was not fetched yet
+NO_DESCRIPTION = 'Details'
+
+# Open stores, one per database file
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def text_store_path(data_file):
+    """Return the path of the text store kept next to a CSV file"""
+    return os.path.join(os.path.dirname(data_file) or '.', 'movie_text.db')
+
+
+def get_text_store(path):
+    """Return the shared text store for a database file, opening it on first use"""
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = TextStore(path)
+        return _stores[path]
+
+
+class TextStore:
+    """
+    Descriptions and cast lists keyed by movie id, kept out of the CSV file.
+
+    Only the detail view and the text indexes read them, so listing and
+    recommending movies never loads the heavy text columns.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS movie_text ('
+                           'movie_id TEXT PRIMARY KEY, description TEXT, cast_names TEXT)')
+        self._conn.commit()
+
+    @staticmethod
+    def _details(row):
+        if row is None:
+            return {'description': NO_DESCRIPTION, 'cast': []}
+        return {'description': row[0], 'cast': load_cast(row[1], row[0])}
+
+    def get(self, movie_id):
+        """Return the description and cast of a movie, or the placeholders if it has none"""
+        with self._lock:
+            row = self._conn.execute('SELECT description, cast_names FROM movie_text WHERE movie_id = ?',
+                                     (movie_id,)).fetchone()
+        return self._details(row)
+
+    def put(self, movie_id, description, cast):
+        """Store the description and cast of a movie"""
+        self.put_many([(movie_id, description, cast)])
+
+    def put_many(self, rows):
+        """Store (movie id, description, cast) rows in one transaction"""
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO movie_text (movie_id, description, cast_names) '
+                                   'VALUES (?, ?, ?)',
+                                   [(movie_id, description, dump_cast(cast)) for movie_id, description, cast in rows])
+            self._conn.commit()
+
+    def all(self):
+        """Return {movie id: details} for every stored movie"""
+        # A separate connection, so a long read does not block single lookups
+        conn = sqlite3.connect(self.path)
+        try:
+            return {movie_id: self._details((description, cast))
+                    for movie_id, description, cast in conn.execute(
+                        'SELECT movie_id, description, cast_names FROM movie_text')}
+        finally:
+            conn.close()
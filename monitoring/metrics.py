@@ -0,0 +1,119 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency buckets, from a cached lookup to a full scrape
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Every metric, in the order they are exposed
+_registry = []
+
+
+def _label_text(names, values):
+    """Format label pairs the way Prometheus expects them"""
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+class Counter:
+    """A monotonically increasing count, one per combination of label values"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        # An unlabelled counter is exposed as 0 before anything is counted
+        self._values = {} if self.labels else {(): 0}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(f"{self.name}{_label_text(self.labels, key)}", value) for key, value in values]
+
+
+class Histogram:
+    """Observations counted into cumulative buckets, plus their sum and count"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [bucket counts..., +Inf count, sum]
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *label_values):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(label_values)
+            if counts is None:
+                counts = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[i] += 1
+            counts[-1] += value
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, list(counts)) for key, counts in self._values.items())
+        samples = []
+        for key, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                labels = _label_text(self.labels + ('le',), key + (bound,))
+                samples.append((f"{self.name}_bucket{labels}", cumulative))
+            samples.append((f"{self.name}_sum{_label_text(self.labels, key)}", counts[-1]))
+            samples.append((f"{self.name}_count{_label_text(self.labels, key)}", cumulative))
+        return samples
+
+
+REQUEST_SECONDS = Histogram('moviebot_request_seconds', 'Request latency by route', ('route', 'method', 'status'))
+STAGE_SECONDS = Histogram('moviebot_stage_seconds',
+                          'Time spent in catalog, request and update stages '
+                          '(csv_read, catalog_build, delta_apply, filter, render, fetch, sleep, parse, '
+                          'download, write)', ('stage',))
+CACHE_LOOKUPS = Counter('moviebot_cache_lookups_total', 'Cache lookups by cache and result (hit or miss)',
+                        ('cache', 'result'))
+DRIVER_LAUNCHES = Counter('moviebot_driver_launches_total', 'Chrome drivers started')
+DOWNLOADED_BYTES = Counter('moviebot_downloaded_bytes_total', 'Bytes downloaded by kind (page or image)', ('kind',))
+
+
+@contextmanager
+def timed(stage):
+    """Record the time spent in a with block as a stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage)
+
+
+def sleep(seconds):
+    """time.sleep that is recorded, so updates bound by politeness delays show up as such"""
+    with timed('sleep'):
+        time.sleep(seconds)
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(f"{name} {value!r}" if isinstance(value, float) else f"{name} {value}"
+                     for name, value in metric.samples())
+    return '\n'.join(lines) + '\n'
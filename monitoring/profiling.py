@@ -0,0 +1,134 @@
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# Profiles are written here, one file per profiled request or job
+PROFILE_DIR = 'data/profiles'
+
+# 'cprofile' traces every call (exact counts, slows the profiled code down);
+# 'sample' looks at the stack every SAMPLE_INTERVAL seconds (cheap, statistical)
+PROFILE_MODES = ('cprofile', 'sample')
+SAMPLE_INTERVAL = 0.005
+
+
+def profile_path(name, extension, directory=PROFILE_DIR):
+    """Return a new, timestamped profile file name"""
+    os.makedirs(directory, exist_ok=True)
+    safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', name).strip('_') or 'profile'
+    return os.path.join(directory, f"{safe_name}-{datetime.now():%Y%m%d-%H%M%S-%f}.{extension}")
+
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Samples the stacks of one thread (or of every thread) from a background
+    thread and counts them as collapsed stacks, the input format of flame
+    graph tools: "outer;inner;innermost count" per line.
+
+    With a path and flush_seconds the counts are also written out
+    periodically, for a sampler left running for the life of the process.
+    """
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL, path=None, flush_seconds=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.stacks = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.path:
+            self.write(self.path)
+
+    def sample(self):
+        """Record the current stack of every sampled thread"""
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own or (self.thread_id is not None and thread_id != self.thread_id):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        flushed = time.monotonic()
+        while not self._stopped.wait(self.interval):
+            self.sample()
+            if self.flush_seconds and time.monotonic() - flushed >= self.flush_seconds:
+                self.write(self.path)
+                flushed = time.monotonic()
+
+    def write(self, path):
+        """Write the collapsed stacks, most frequent first"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Write to a temporary file first, so a reader never sees half a profile
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        os.replace(path + '.tmp', path)
+        return path
+
+
+@contextmanager
+def profiled(name, mode, all_threads=False, directory=PROFILE_DIR):
+    """
+    Profile a with block and write the result under the profile directory.
+
+    cprofile writes a .pstats file (open it with pstats or snakeviz) and only
+    sees the calling thread; sample writes a .folded file and with
+    all_threads also samples the threads the block starts, e.g. the fetch
+    and download threads of an update. Yields a dict whose 'path' is set
+    once the profile is written.
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode: {mode}")
+    result = {'path': None}
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield result
+        finally:
+            profiler.disable()
+            result['path'] = profile_path(name, 'pstats', directory)
+            profiler.dump_stats(result['path'])
+            print(f"Wrote {mode} profile of {name} to {result['path']}")
+    else:
+        sampler = StackSampler(None if all_threads else threading.get_ident()).start()
+        try:
+            yield result
+        finally:
+            sampler.stop()
+            result['path'] = sampler.write(profile_path(name, 'folded', directory))
+            print(f"Wrote {mode} profile of {name} ({sampler.samples} samples) to {result['path']}")
+
+
+def maybe_profiled(name, mode, all_threads=False):
+    """profiled() when a mode is given, otherwise a context that does nothing at all"""
+    if not mode:
+        return nullcontext()
+    return profiled(name, mode, all_threads)
@@ -1,19 +1,71 @@
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup
+import numpy as np
 import pandas as pd
 import time
 import os
 import random
 import requests
+import hashlib
+import multiprocessing
 from pathlib import Path
 import concurrent.futures
 import threading
+from catalog.deltas import write_movies
+from catalog.genres import merge_genre_rows
+from catalog.movie_table import parse_year
+from monitoring.metrics import CACHE_LOOKUPS, DOWNLOADED_BYTES, DRIVER_LAUNCHES, STAGE_SECONDS, sleep, timed
+from scraper.parsing import parse_genre_page, parse_movie_page, timed_call
+from scraper.posters import make_variants
+
+# Number of workers of each stage of an update: page fetches and image
+# downloads wait on the network, so they run on threads; parsing is
+# CPU-bound pure Python, so it runs in processes and scales with the cores.
+# A parse worker count of 0 parses in the calling thread instead.
+STAGE_WORKERS = {
+    'fetch': 4,
+    'parse': os.cpu_count() or 1,
+    'images': 8,
+    # Detail pages are parsed one at a time in the web server's request thread: a single page
+    # parses in milliseconds, far less than starting a worker process (which re-imports app.py)
+    'detail_parse': 0
+}
+
+# Site the scraper reads; point it at a local stand-in (see benchmarks/letterboxd_fixture.py) to test updates
+BASE_URL = os.environ.get('LETTERBOXD_BASE_URL', 'https://letterboxd.com').rstrip('/')
+
+# Pages are rendered in Chrome, which waits for their scripts; False fetches them over plain HTTP
+BROWSER_FETCH = True
+
+# Seconds a rendered page is given to load, and the random pause (min, max) before each rate-limited page
+PAGE_WAIT_SECONDS = 2
+DETAIL_WAIT_SECONDS = 3
+RATE_LIMIT_SECONDS = (1, 3)
+
+# Plain HTTP fetches retry throttled (429) and failed (5xx) responses this often, backing off in between
+FETCH_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 1.0
+
+# Fetched genre pages are kept this long, so repeated updates skip the browser
+PAGE_CACHE_DIR = 'data/page_cache'
+PAGE_CACHE_SECONDS = 6 * 60 * 60
+
+# Genres scraped by full and quick updates
+GENRES = ['action', 'drama', 'comedy', 'thriller', 'horror', 'romance', 'adventure', 'crime', 'sci-fi',
+          'animation', 'family', 'fantasy', 'history', 'mystery', 'science-fiction', 'war', 'western']
 
 # Thread-local storage for browser instances
 thread_local = threading.local()
 
+# Drivers of every thread, so an update can close those of its fetch threads
+_drivers = set()
+_drivers_lock = threading.Lock()
+
+# Process pool for parsing detail pages, started on first use
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
 def get_driver():
     """Get a thread-local Chrome driver instance"""
     if not hasattr(thread_local, "driver"):
@@ -24,125 +76,246 @@ def get_driver():
         chrome_options.add_argument("--no-sandbox")
         chrome_options.add_argument("--disable-dev-shm-usage")
         thread_local.driver = webdriver.Chrome(options=chrome_options)
+        DRIVER_LAUNCHES.inc()
+        with _drivers_lock:
+            _drivers.add(thread_local.driver)
     return thread_local.driver
 
 def close_drivers():
     """Close all thread-local drivers"""
     if hasattr(thread_local, "driver"):
+        with _drivers_lock:
+            _drivers.discard(thread_local.driver)
         try:
             thread_local.driver.quit()
         except:
             pass
+        del thread_local.driver
 
-def scrape_genre(genre, max_movies=3, progress_callback=None, progress_start=0, progress_range=0.1, should_stop=None):
-    """Scrape movies for a specific genre"""
+def close_all_drivers(drivers):
+    """Close the given drivers, e.g. those started by the fetch threads of an update"""
+    for driver in drivers:
+        with _drivers_lock:
+            _drivers.discard(driver)
+        try:
+            driver.quit()
+        except:
+            pass
+
+def stage_workers(workers=None):
+    """Return the worker count of each stage, with the given overrides applied"""
+    return {**STAGE_WORKERS, **(workers or {})}
+
+def parse_executor(count):
+    """Return a process pool for the parse stage, or None to parse inline"""
+    if count <= 0:
+        return None
+    # Forking a threaded server is unsafe, so workers are spawned. A spawned worker imports the
+    # parent's main module again (app.py as __mp_main__), so entry points call freeze_support()
+    # and keep their startup work under `if __name__ == '__main__'`
+    return concurrent.futures.ProcessPoolExecutor(max_workers=count, mp_context=multiprocessing.get_context('spawn'))
+
+def submit(executor, fn, *args):
+    """Run fn on an executor, or inline as an already finished future when the stage has no workers"""
+    if executor is not None:
+        return executor.submit(fn, *args)
+    future = concurrent.futures.Future()
     try:
-        driver = get_driver()
-        url = f"https://letterboxd.com/films/genre/{genre}/size/small/"
-        print(f"Scraping {genre} movies...")
-        
-        # Check if we should stop
-        if should_stop and should_stop():
-            print(f"Stopping scrape for genre {genre}")
-            return []
-            
-        driver.get(url)
-        time.sleep(2)
-        
-        # Get movie containers
-        movie_containers = BeautifulSoup(driver.page_source, 'html.parser').find_all('li', class_='poster-container')
-        print(f"Found {len(movie_containers)} movies for {genre}")
-        
-        movie_data = []
-        
-        # Process each movie (limit to max_movies per genre)
-        for j, container in enumerate(movie_containers[:max_movies]):
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def parsed(future):
+    """Return the result of a parse submitted with timed_call, recording the time the worker spent on it"""
+    result, seconds = future.result()
+    STAGE_SECONDS.observe(seconds, 'parse')
+    return result
+
+def parse_page(fn, html):
+    """Parse one page, in the shared parse pool when STAGE_WORKERS['detail_parse'] asks for one"""
+    global _parse_pool
+    count = STAGE_WORKERS['detail_parse']
+    with _parse_pool_lock:
+        if _parse_pool is None and count > 0:
+            _parse_pool = parse_executor(count)
+    return parsed(submit(_parse_pool, timed_call, fn, html))
+
+def page_cache_path(url):
+    """Return the cache file of a fetched page"""
+    return os.path.join(PAGE_CACHE_DIR, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.html')
+
+def http_get(url, stream=False):
+    """GET a URL, retrying throttled (429) and failed (5xx) responses with backoff"""
+    for attempt in range(FETCH_RETRIES + 1):
+        response = requests.get(url, stream=stream, timeout=30)
+        if response.status_code != 429 and response.status_code < 500 or attempt == FETCH_RETRIES:
+            return response
+        # Honour the server's Retry-After when it sends one
+        retry_after = response.headers.get('Retry-After', '')
+        delay = float(retry_after) if retry_after.replace('.', '', 1).isdigit() \
+            else RETRY_BACKOFF_SECONDS * 2 ** attempt
+        print(f"Got {response.status_code} for {url}, retrying in {delay:.1f} s")
+        response.close()
+        sleep(delay)
+
+def fetch_http(url):
+    """Fetch the HTML of a page over plain HTTP"""
+    response = http_get(url)
+    response.raise_for_status()
+    return response.text
+
+def fetch_genre_page(genre, should_stop=None, rate_limit=False, page=1, use_cache=True):
+    """
+    Fetch the HTML of a page of a genre, from the page cache if it is recent
+    enough; with use_cache=False the page is always fetched (and cached again)
+    """
+    url = f"{BASE_URL}/films/genre/{genre}/size/small/"
+    if page > 1:
+        url += f"page/{page}/"
+    cache_path = page_cache_path(url)
+    try:
+        if use_cache and time.time() - os.path.getmtime(cache_path) < PAGE_CACHE_SECONDS:
+            with open(cache_path, encoding='utf-8') as f:
+                print(f"Using cached page for {genre}")
+                html = f.read()
+            CACHE_LOOKUPS.inc(1, 'page', 'hit')
+            return html
+    except OSError:
+        pass
+    CACHE_LOOKUPS.inc(1, 'page', 'miss')
+
+    # Check if we should stop
+    if should_stop and should_stop():
+        print(f"Stopping scrape for genre {genre}")
+        return None
+
+    if rate_limit:
+        # Add rate limiting delay (1-3 seconds) before each page request
+        sleep(random.uniform(*RATE_LIMIT_SECONDS))
+
+    print(f"Scraping {genre} movies (page {page})...")
+    if BROWSER_FETCH:
+        with timed('fetch'):
+            driver = get_driver()
+            driver.get(url)
+        sleep(PAGE_WAIT_SECONDS)
+        html = driver.page_source
+    else:
+        with timed('fetch'):
+            html = fetch_http(url)
+    DOWNLOADED_BYTES.inc(len(html.encode('utf-8')), 'page')
+
+    os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        f.write(html)
+    return html
+
+def download_image(title, year, image_url, large=False):
+    """Download a small (or large) poster, returning its path under static/ or None on error"""
+    try:
+        safe_title = "".join([c if c.isalnum() else "_" for c in title])
+        image_path = f"images/{safe_title}_{year}{'_large' if large else ''}.jpg"
+        with timed('download'):
+            response = http_get(image_url, stream=True)
+            if response.status_code != 200:
+                print(f"Failed to download image for {title}: {response.status_code}")
+                return None
+            with open(os.path.join('static', image_path), 'wb') as img_file:
+                for chunk in response.iter_content(1024):
+                    img_file.write(chunk)
+                    DOWNLOADED_BYTES.inc(len(chunk), 'image')
+            print(f"Downloaded image for {title}")
+        make_variants(image_path)
+        return image_path
+    except Exception as img_err:
+        print(f"Error downloading image: {img_err}")
+        return None
+
+def scrape_genres(genres, max_movies, existing_movies=None, progress_callback=None, progress_start=0.1,
+                  progress_range=0.8, should_stop=None, rate_limit=False, workers=None, new_movies=True,
+                  use_cache=True):
+    """
+    Scrape the movies of several genres as a pipeline: genre pages are
+    fetched on I/O threads, parsed in worker processes as they arrive, and
+    the posters of new movies are downloaded on I/O threads again.
+
+    Movies already in existing_movies only contribute their genre, rating
+    and year; their poster is not downloaded again. With new_movies=False
+    movies not in existing_movies are left out altogether. use_cache=False
+    fetches every page even if the page cache holds a recent copy.
+    """
+    workers = stage_workers(workers)
+    movie_data = []
+    fetchers = concurrent.futures.ThreadPoolExecutor(max_workers=workers['fetch'])
+    downloaders = concurrent.futures.ThreadPoolExecutor(max_workers=workers['images'])
+    parsers = parse_executor(workers['parse'])
+    fetch_drivers = set()
+    try:
+        def fetch(genre):
+            html = fetch_genre_page(genre, should_stop, rate_limit, use_cache=use_cache)
+            if hasattr(thread_local, 'driver'):
+                fetch_drivers.add(thread_local.driver)
+            return html
+
+        fetches = {fetchers.submit(fetch, genre): genre for genre in genres}
+        parses = {}
+        for future in concurrent.futures.as_completed(fetches):
+            genre = fetches[future]
+            # Check if we should stop before parsing more pages
+            if should_stop and should_stop():
+                print("Stopping before parsing more genres")
+                break
             try:
-                # Check if we should stop
-                if should_stop and should_stop():
-                    print(f"Stopping scrape for genre {genre} at movie {j+1}")
-                    break
-                    
-                if progress_callback:
-                    sub_progress = progress_start + (j / max_movies) * progress_range
-                    progress_callback(sub_progress, f"Processing {genre} movie {j+1}/{max_movies}")
-                    
-                # Extract basic movie info
-                poster_div = container.find('div', class_='film-poster')
-                if not poster_div:
-                    continue
-                    
-                title = poster_div.get('data-film-name', "Unknown")
-                
-                # Get year and rating
-                frame_link = poster_div.find('a', class_='frame')
-                if not frame_link:
-                    continue
-                    
-                year = "Unknown"
-                frame_title = frame_link.find('span', class_='frame-title')
-                if frame_title and '(' in frame_title.text and ')' in frame_title.text:
-                    year = frame_title.text.split('(')[-1].split(')')[0]
-                
-                rating = 0.0
-                if frame_link.get('data-original-title'):
-                    rating_text = frame_link.get('data-original-title')
-                    if rating_text and rating_text.split(')')[-1].strip():
-                        try:
-                            rating = float(rating_text.split(')')[-1].strip())
-                        except:
-                            pass
-                
-                # Get image URL and movie URL
-                img_tag = poster_div.find('img')
-                image_url = img_tag.get('src') if img_tag else None
-                film_link = poster_div.find('a')
-                movie_url = film_link.get('href') if film_link else None
-                
-                # Download image
-                image_path = None
-                if image_url:
-                    try:
-                        safe_title = "".join([c if c.isalnum() else "_" for c in title])
-                        image_filename = f"{safe_title}_{year}.jpg"
-                        image_path = f"images/{image_filename}"
-                        full_path = os.path.join('static', image_path)
-                        
-                        response = requests.get(image_url, stream=True)
-                        if response.status_code == 200:
-                            with open(full_path, 'wb') as img_file:
-                                for chunk in response.iter_content(1024):
-                                    img_file.write(chunk)
-                            print(f"Downloaded image for {title}")
-                    except Exception as img_err:
-                        print(f"Error downloading image: {img_err}")
-                        image_path = None
-                
-                # Add movie data
-                movie_data.append({
-                    'title': title,
-                    'year': year,
-                    'rating': rating,
-                    'genre': genre,
-                    'description': "Details",
-                    'image_path': image_path,
-                    'movie_url': movie_url
-                })
-                print(f"Scraped: {title} ({year})")
-                
+                html = future.result()
             except Exception as e:
-                print(f"Error processing movie: {e}")
+                print(f"Error scraping genre {genre}: {e}")
                 continue
-                
+            if html is not None:
+                parses[submit(parsers, timed_call, parse_genre_page, html, genre, max_movies)] = genre
+
+        downloads = []
+        for done, future in enumerate(concurrent.futures.as_completed(parses), 1):
+            genre = parses[future]
+            if should_stop and should_stop():
+                print("Stopping before processing more results")
+                break
+            try:
+                records = parsed(future)
+            except Exception as e:
+                print(f"Error in genre {genre}: {e}")
+                continue
+            if not new_movies:
+                records = [record for record in records if record['movie_url'] in (existing_movies or ())]
+            for record in records:
+                image_url = record.pop('image_url')
+                record['description'] = "Details"
+                record['image_path'] = None
+                if image_url and not (existing_movies and record['movie_url'] in existing_movies):
+                    downloads.append((record, downloaders.submit(download_image, record['title'],
+                                                                 record['year'], image_url)))
+                movie_data.append(record)
+            print(f"Completed scraping {genre} with {len(records)} movies")
+            if progress_callback:
+                progress_callback(progress_start + done / len(genres) * progress_range,
+                                  f"Parsed {genre} ({done}/{len(genres)} genres)")
+
+        for record, future in downloads:
+            record['image_path'] = future.result()
         return movie_data
-        
-    except Exception as e:
-        print(f"Error scraping genre {genre}: {e}")
-        return []
+    finally:
+        # Stopping drops the pages and downloads still queued
+        fetchers.shutdown(wait=True, cancel_futures=True)
+        downloaders.shutdown(wait=True, cancel_futures=True)
+        if parsers is not None:
+            parsers.shutdown(wait=True, cancel_futures=True)
+        close_all_drivers(fetch_drivers)
 
-def scrape_movies(progress_callback=None, should_stop=None):
+def scrape_movies(progress_callback=None, should_stop=None, workers=None):
     """
-    Scrape basic movie data from Letterboxd main genre pages using multithreading
+    Scrape basic movie data from Letterboxd main genre pages, fetching,
+    parsing and downloading posters in separate stages; workers overrides
+    the worker count of a stage (see STAGE_WORKERS)
     """
     try:
         # Create directories if they don't exist
@@ -151,52 +324,9 @@ def scrape_movies(progress_callback=None, should_stop=None):
         if progress_callback:
             progress_callback(0.05, "Initializing scraper")
         
-        # List of genres to scrape
-        genres = ['action', 'drama', 'comedy', 'thriller', 'horror', 'romance', 'adventure', 'crime', 'sci-fi',
-                 'animation', 'family', 'fantasy', 'history', 'mystery', 'science-fiction', 'war', 'western']
-        movie_data = []
-        
-        # Calculate progress segments
-        progress_per_genre = 0.8 / len(genres)
-        
-        # Use ThreadPoolExecutor for parallel scraping
-        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-            # Create a dictionary to track futures
-            future_to_genre = {}
-            
-            # Submit scraping tasks for each genre
-            for i, genre in enumerate(genres):
-                # Check if we should stop before submitting more tasks
-                if should_stop and should_stop():
-                    print("Stopping before submitting more genres")
-                    break
-                    
-                progress_start = 0.1 + (i * progress_per_genre)
-                future = executor.submit(
-                    scrape_genre, 
-                    genre, 
-                    max_movies=3,  # Adjust limit as needed
-                    progress_callback=progress_callback,
-                    progress_start=progress_start,
-                    progress_range=progress_per_genre,
-                    should_stop=should_stop
-                )
-                future_to_genre[future] = genre
-            
-            # Collect results as they complete
-            for future in concurrent.futures.as_completed(future_to_genre):
-                genre = future_to_genre[future]
-                try:
-                    # Check if we should stop before processing more results
-                    if should_stop and should_stop():
-                        print("Stopping before processing more results")
-                        break
-                        
-                    genre_data = future.result()
-                    movie_data.extend(genre_data)
-                    print(f"Completed scraping {genre} with {len(genre_data)} movies")
-                except Exception as e:
-                    print(f"Error in genre {genre}: {e}")
+        movie_data = scrape_genres(GENRES, max_movies=3,  # Adjust limit as needed
+                                   progress_callback=progress_callback, progress_start=0.1, progress_range=0.8,
+                                   should_stop=should_stop, workers=workers)
         
         # Check if we should stop before saving data
         if should_stop and should_stop():
@@ -210,8 +340,11 @@ def scrape_movies(progress_callback=None, should_stop=None):
             progress_callback(0.9, "Saving data to CSV")
             
         if movie_data:
-            df = pd.DataFrame(movie_data)
-            df.to_csv('data/movies.csv', index=False)
+            # One row per movie, with every genre it was found under
+            df = merge_genre_rows(pd.DataFrame(movie_data))
+            # Publish what changed, so a running app patches its catalog instead of reloading it
+            previous_df = pd.read_csv('data/movies.csv') if os.path.exists('data/movies.csv') else None
+            write_movies(df, 'data/movies.csv', previous_df=previous_df)
             print(f"Successfully scraped {len(df)} movies")
             
             if progress_callback:
@@ -243,113 +376,44 @@ def get_movie_description(movie_url):
     """Get movie description, cast and larger image from its details page"""
     driver = None
     try:
-        chrome_options = Options()
-        chrome_options.add_argument("--headless=new")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        driver = webdriver.Chrome(options=chrome_options)
-        
-        url = f"https://letterboxd.com{movie_url}"
+        url = f"{BASE_URL}{movie_url}"
         print(f"Fetching URL: {url}")
-        driver.get(url)
-        time.sleep(3)  # Increase wait time
+        if BROWSER_FETCH:
+            chrome_options = Options()
+            chrome_options.add_argument("--headless=new")
+            chrome_options.add_argument("--disable-gpu")
+            chrome_options.add_argument("--no-sandbox")
+            chrome_options.add_argument("--disable-dev-shm-usage")
+            with timed('fetch'):
+                driver = webdriver.Chrome(options=chrome_options)
+                DRIVER_LAUNCHES.inc()
+                driver.get(url)
+            sleep(DETAIL_WAIT_SECONDS)  # Increase wait time
+            html = driver.page_source
+        else:
+            with timed('fetch'):
+                html = fetch_http(url)
+        DOWNLOADED_BYTES.inc(len(html.encode('utf-8')), 'page')
         
         # Save the page source for debugging
         with open('data/action_full_page.html', 'w', encoding='utf-8') as f:
-            f.write(driver.page_source)
-        
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        
-        # Get description - combine tagline and synopsis
-        tagline = ""
-        synopsis = ""
-        
-        # Try to find the tagline
-        tagline_element = soup.find('h4', class_='tagline')
-        if tagline_element and tagline_element.text.strip():
-            tagline = tagline_element.text.strip()
-        
-        # Try to find the synopsis in the truncate div
-        truncate_element = soup.find('div', class_='truncate')
-        if truncate_element:
-            p_tag = truncate_element.find('p')
-            if p_tag:
-                synopsis = p_tag.text.strip()
-        
-        # If no synopsis yet, try film-text-content
-        if not synopsis:
-            desc_element = soup.find('div', class_='film-text-content')
-            if desc_element:
-                p_tag = desc_element.find('p')
-                if p_tag:
-                    synopsis = p_tag.text.strip()
-        
-        # If still no synopsis, try review body text
-        if not synopsis:
-            desc_element = soup.find('div', class_='review body-text -prose -hero prettify')
-            if desc_element:
-                p_tag = desc_element.find('p')
-                if p_tag:
-                    synopsis = p_tag.text.strip()
+            f.write(html)
         
-        # Extract cast information
-        cast_names = []
-        cast_element = soup.find('div', class_='cast-list text-sluglist')
-        if cast_element:
-            cast_links = cast_element.find_all('a', class_='text-slug')
-            for link in cast_links:
-                if 'show-cast-overflow' not in link.get('id', ''):  # Skip the "Show All" link
-                    cast_names.append(link.text.strip())
-        
-        # Combine tagline, synopsis and cast with HTML formatting
-        if tagline and synopsis:
-            description = f"<strong>{tagline}</strong><br>{synopsis}"
-        elif tagline:
-            description = f"<strong>{tagline}</strong>"
-        elif synopsis:
-            description = synopsis
-        else:
-            description = "No description available"
-            
-        # Add cast if available
-        if cast_names:
-            description += f"<br><br><strong>Cast:</strong> {', '.join(cast_names)}"
-        
-        # Get larger image - try multiple selectors
-        image_url = None
-        
-        # Try poster image first
-        poster_element = soup.find('img', class_='image')
-        if poster_element:
-            image_url = poster_element.get('src')
-        
-        # Try other image locations
-        if not image_url:
-            image_element = soup.find('img', class_='poster-img')
-            if image_element:
-                image_url = image_element.get('src')
-        
-        if not image_url:
-            image_element = soup.find('div', class_='film-poster')
-            if image_element:
-                img_tag = image_element.find('img')
-                if img_tag:
-                    image_url = img_tag.get('src')
+        # Parsed inline unless STAGE_WORKERS['detail_parse'] gives detail pages a process pool
+        details = parse_page(parse_movie_page, html)
+        description = details['description']
+        image_url = details['large_image_url']
         
         print(f"Found description: {description[:50]}...")
         print(f"Found image URL: {image_url}")
         
-        return {
-            'description': description,
-            'large_image_url': image_url,
-            'letterboxd_url': url
-        }
+        return {**details, 'letterboxd_url': url}
         
     except Exception as e:
         print(f"Error getting movie details: {e}")
         return {
             'description': "Error loading description",
+            'cast': [],
             'large_image_url': None
         }
         
@@ -360,127 +424,89 @@ def get_movie_description(movie_url):
         except Exception as e:
             print(f"Error closing driver: {e}")
 
-def process_genre_quick(genre, max_movies=10, existing_movies=None, progress_callback=None, progress_start=0, progress_range=0.1, should_stop=None):
-    """Process a single genre for quick update"""
+def refreshed_rows(existing_df, records):
+    """
+    Return the stored movies with the ratings and years of freshly scraped
+    records applied, and the rows that changed.
+
+    A missing rating (0.0) or unknown year on the listing page never
+    overwrites a stored value.
+    """
+    df = merge_genre_rows(existing_df).reset_index(drop=True)
+    fresh = {}
+    for record in records:
+        fresh.setdefault(record['movie_url'], record)
+    positions = pd.Index(df['movie_url']).get_indexer(list(fresh))
+    found = positions >= 0
+    positions = positions[found]
+    scraped = [record for record, ok in zip(fresh.values(), found) if ok]
+
+    ratings = pd.to_numeric(df['rating'], errors='coerce').to_numpy()
+    new_ratings = np.array([record['rating'] for record in scraped], dtype=np.float64)
+    rating_changed = (new_ratings > 0) & ~np.isclose(new_ratings, ratings[positions])
+
+    years = [parse_year(year) for year in df['year'].to_numpy()[positions]]
+    new_years = [parse_year(record['year']) for record in scraped]
+    year_changed = np.array([new is not None and new != old for new, old in zip(new_years, years)], dtype=bool)
+
+    changed = positions[rating_changed | year_changed]
+    if len(changed):
+        df['rating'] = ratings
+        df.loc[positions[rating_changed], 'rating'] = new_ratings[rating_changed]
+        df['year'] = df['year'].astype(object)
+        df.loc[positions[year_changed], 'year'] = [year for year, flag in zip(new_years, year_changed) if flag]
+    return df, df.loc[changed]
+
+def refresh_ratings(progress_callback=None, should_stop=None, workers=None, max_movies=72):
+    """
+    Re-read the genre listing pages and update the ratings and years of
+    movies already in the database. Only the changed rows are published
+    to a running app; no poster or details page is fetched, and nothing is
+    written at all if nothing changed.
+    """
+    data_file = 'data/movies.csv'
     try:
-        driver = get_driver()
-        url = f"https://letterboxd.com/films/genre/{genre}/size/small/"
-        print(f"Scraping {genre} movies (titles only)...")
-        
-        # Check if we should stop
+        if not os.path.exists(data_file):
+            print("No database to refresh")
+            return False
+        if progress_callback:
+            progress_callback(0.05, "Reading existing database")
+        existing_df = pd.read_csv(data_file)
+        existing_movies = set(existing_df['movie_url'].dropna())
+
+        movie_data = scrape_genres(GENRES, max_movies, existing_movies=existing_movies,
+                                   progress_callback=progress_callback, progress_start=0.1, progress_range=0.8,
+                                   should_stop=should_stop, rate_limit=True, workers=workers, new_movies=False,
+                                   # Cached pages would hold the very ratings being checked for changes
+                                   use_cache=False)
         if should_stop and should_stop():
-            print(f"Stopping quick update for genre {genre}")
-            return []
-        
-        # Add rate limiting delay (1-3 seconds) before each page request
-        delay = 1 + 2 * random.random()  # Random delay between 1-3 seconds
-        time.sleep(delay)
-            
-        driver.get(url)
-        time.sleep(2)
-        
-        # Get movie containers
-        movie_containers = BeautifulSoup(driver.page_source, 'html.parser').find_all('li', class_='poster-container')
-        print(f"Found {len(movie_containers)} movies for {genre}")
-        
-        movie_data = []
-        
-        # Process each movie (limit to max_movies per genre)
-        for j, container in enumerate(movie_containers[:max_movies]):
-            try:
-                # Check if we should stop
-                if should_stop and should_stop():
-                    print(f"Stopping quick update for genre {genre} at movie {j+1}")
-                    break
-                    
-                if progress_callback:
-                    sub_progress = progress_start + (j / max_movies) * progress_range
-                    progress_callback(sub_progress, f"Processing {genre} movie {j+1}/{max_movies}")
-                    
-                # Extract basic movie info
-                poster_div = container.find('div', class_='film-poster')
-                if not poster_div:
-                    continue
-                    
-                title = poster_div.get('data-film-name', "Unknown")
-                
-                # Get year, rating and movie URL
-                frame_link = poster_div.find('a', class_='frame')
-                if not frame_link:
-                    continue
-                    
-                year = "Unknown"
-                frame_title = frame_link.find('span', class_='frame-title')
-                if frame_title and '(' in frame_title.text and ')' in frame_title.text:
-                    year = frame_title.text.split('(')[-1].split(')')[0]
-                
-                # Extract rating from data-original-title attribute
-                rating = 0.0
-                if frame_link.get('data-original-title'):
-                    rating_text = frame_link.get('data-original-title')
-                    if rating_text and rating_text.split(')')[-1].strip():
-                        try:
-                            rating = float(rating_text.split(')')[-1].strip())
-                        except:
-                            pass
-                
-                # Get movie URL
-                film_link = poster_div.find('a')
-                movie_url = film_link.get('href') if film_link else None
-                
-                # Skip if movie already exists in database
-                if existing_movies and movie_url in existing_movies:
-                    print(f"Skipping existing movie: {title}")
-                    continue
-                
-                # Get image URL
-                img_tag = poster_div.find('img')
-                image_url = img_tag.get('src') if img_tag else None
-                
-                # Download image (small version only)
-                image_path = None
-                if image_url:
-                    try:
-                        safe_title = "".join([c if c.isalnum() else "_" for c in title])
-                        image_filename = f"{safe_title}_{year}.jpg"
-                        image_path = f"images/{image_filename}"
-                        full_path = os.path.join('static', image_path)
-                        
-                        response = requests.get(image_url, stream=True)
-                        if response.status_code == 200:
-                            with open(full_path, 'wb') as img_file:
-                                for chunk in response.iter_content(1024):
-                                    img_file.write(chunk)
-                            print(f"Downloaded image for {title}")
-                    except Exception as img_err:
-                        print(f"Error downloading image: {img_err}")
-                        image_path = None
-                
-                # Add movie data with minimal information
-                movie_data.append({
-                    'title': title,
-                    'year': year,
-                    'rating': rating,
-                    'genre': genre,
-                    'description': "Details",  # Default description
-                    'image_path': image_path,
-                    'movie_url': movie_url
-                })
-                print(f"Quick scraped: {title} ({year})")
-                
-            except Exception as e:
-                print(f"Error processing movie: {e}")
-                continue
-                
-        return movie_data
-        
+            print("Rating refresh stopped. No data will be written to CSV.")
+            if progress_callback:
+                progress_callback(1.0, "Update stopped. No changes made.")
+            return False
+
+        df, changed = refreshed_rows(existing_df, movie_data)
+        if len(changed):
+            write_movies(df, data_file, rows=changed)
+        print(f"Refreshed {len(movie_data)} listings, {len(changed)} movies changed")
+        if progress_callback:
+            progress_callback(1.0, f"Checked {len(movie_data)} movies, updated {len(changed)}")
+        return bool(len(changed))
+
     except Exception as e:
-        print(f"Error scraping genre {genre}: {e}")
-        return []
+        print(f"Rating refresh error: {e}")
+        if progress_callback:
+            progress_callback(1.0, f"Error: {str(e)}")
+        return False
+
+    finally:
+        close_drivers()
 
-def quick_update_titles(progress_callback=None, should_stop=None):
+def quick_update_titles(progress_callback=None, should_stop=None, workers=None):
     """
-    Quickly extract movie titles and genres using multithreading
+    Quickly extract movie titles and genres, fetching, parsing and
+    downloading posters in separate stages; workers overrides the worker
+    count of a stage (see STAGE_WORKERS)
     """
     try:
         # Create directories if they don't exist
@@ -489,10 +515,6 @@ def quick_update_titles(progress_callback=None, should_stop=None):
         if progress_callback:
             progress_callback(0.05, "Initializing Chrome driver")
         
-        # List of genres to scrape
-        genres = ['action', 'drama', 'comedy', 'thriller', 'horror', 'romance', 'adventure', 'crime', 'sci-fi',
-                 'animation', 'family', 'fantasy', 'history', 'mystery', 'science-fiction', 'war', 'western']
-        
         # Check if existing data file exists and load it
         data_file = Path('data/movies.csv')
         existing_movies = set()
@@ -510,49 +532,10 @@ def quick_update_titles(progress_callback=None, should_stop=None):
             except Exception as e:
                 print(f"Error reading existing data: {e}")
         
-        # Calculate progress segments
-        progress_per_genre = 0.7 / len(genres)
-        movie_data = []
-        
-        # Use ThreadPoolExecutor for parallel scraping
-        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-            # Create a dictionary to track futures
-            future_to_genre = {}
-            
-            # Submit scraping tasks for each genre
-            for i, genre in enumerate(genres):
-                # Check if we should stop before submitting more tasks
-                if should_stop and should_stop():
-                    print("Stopping before submitting more genres for quick update")
-                    break
-                    
-                progress_start = 0.15 + (i * progress_per_genre)
-                future = executor.submit(
-                    process_genre_quick, 
-                    genre, 
-                    max_movies=10,  # Adjust limit as needed
-                    existing_movies=existing_movies,
-                    progress_callback=progress_callback,
-                    progress_start=progress_start,
-                    progress_range=progress_per_genre,
-                    should_stop=should_stop
-                )
-                future_to_genre[future] = genre
-            
-            # Collect results as they complete
-            for future in concurrent.futures.as_completed(future_to_genre):
-                genre = future_to_genre[future]
-                try:
-                    # Check if we should stop before processing more results
-                    if should_stop and should_stop():
-                        print("Stopping before processing more results for quick update")
-                        break
-                        
-                    genre_data = future.result()
-                    movie_data.extend(genre_data)
-                    print(f"Completed quick scraping {genre} with {len(genre_data)} movies")
-                except Exception as e:
-                    print(f"Error in genre {genre}: {e}")
+        movie_data = scrape_genres(GENRES, max_movies=10,  # Adjust limit as needed
+                                   existing_movies=existing_movies, progress_callback=progress_callback,
+                                   progress_start=0.15, progress_range=0.7, should_stop=should_stop,
+                                   rate_limit=True, workers=workers)
         
         # Check if we should stop before saving data
         if should_stop and should_stop():
@@ -569,16 +552,21 @@ def quick_update_titles(progress_callback=None, should_stop=None):
             new_df = pd.DataFrame(movie_data)
             
             if data_file.exists():
-                # Append to existing data, avoiding duplicates
+                # Append to existing data, merging the genres of movies seen in several genres
                 existing_df = pd.read_csv(data_file)
-                combined_df = pd.concat([existing_df, new_df]).drop_duplicates(subset=['movie_url'], keep='first')
-                combined_df.to_csv(data_file, index=False)
-                print(f"Successfully added {len(new_df)} new movies to database (total: {len(combined_df)})")
+                combined_df = merge_genre_rows(pd.concat([existing_df, new_df]))
+                # The listing pages also carry current ratings and years of the movies already stored
+                combined_df, _ = refreshed_rows(combined_df, movie_data)
+                new_count = int((~combined_df['movie_url'].isin(existing_movies)).sum())
+                # Only the new and changed rows are published to a running app
+                write_movies(combined_df, str(data_file), previous_df=existing_df)
+                print(f"Successfully added {new_count} new movies to database (total: {len(combined_df)})")
                 
                 if progress_callback:
-                    progress_callback(1.0, f"Added {len(new_df)} new movies (total: {len(combined_df)})")
+                    progress_callback(1.0, f"Added {new_count} new movies (total: {len(combined_df)})")
             else:
                 # Create new file
+                new_df = merge_genre_rows(new_df)
                 new_df.to_csv(data_file, index=False)
                 print(f"Successfully scraped {len(new_df)} movies")
                 
@@ -0,0 +1,130 @@
+import time
+from bs4 import BeautifulSoup
+
+# Pure HTML -> record functions. They run in worker processes, so they take
+# and return only plain, picklable values and never touch the network or disk.
+
+
+def parse_genre_page(html, genre, max_movies):
+    """Extract up to max_movies movie records from a Letterboxd genre page"""
+    movie_containers = BeautifulSoup(html, 'html.parser').find_all('li', class_='poster-container')
+    print(f"Found {len(movie_containers)} movies for {genre}")
+
+    movie_data = []
+    for container in movie_containers[:max_movies]:
+        try:
+            # Extract basic movie info
+            poster_div = container.find('div', class_='film-poster')
+            if not poster_div:
+                continue
+
+            title = poster_div.get('data-film-name', "Unknown")
+
+            # Get year and rating
+            frame_link = poster_div.find('a', class_='frame')
+            if not frame_link:
+                continue
+
+            year = "Unknown"
+            frame_title = frame_link.find('span', class_='frame-title')
+            if frame_title and '(' in frame_title.text and ')' in frame_title.text:
+                year = frame_title.text.split('(')[-1].split(')')[0]
+
+            # Extract rating from data-original-title attribute
+            rating = 0.0
+            rating_text = frame_link.get('data-original-title')
+            if rating_text and rating_text.split(')')[-1].strip():
+                try:
+                    rating = float(rating_text.split(')')[-1].strip())
+                except ValueError:
+                    pass
+
+            # Get image URL and movie URL
+            img_tag = poster_div.find('img')
+            film_link = poster_div.find('a')
+
+            movie_data.append({
+                'title': title,
+                'year': year,
+                'rating': rating,
+                'genre': genre,
+                'image_url': img_tag.get('src') if img_tag else None,
+                'movie_url': film_link.get('href') if film_link else None
+            })
+        except Exception as e:
+            print(f"Error processing movie: {e}")
+            continue
+
+    return movie_data
+
+
+def parse_movie_page(html):
+    """Extract the description, cast and larger image URL from a movie details page"""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Get description - combine tagline and synopsis
+    tagline = ""
+    synopsis = ""
+
+    # Try to find the tagline
+    tagline_element = soup.find('h4', class_='tagline')
+    if tagline_element and tagline_element.text.strip():
+        tagline = tagline_element.text.strip()
+
+    # Try to find the synopsis in the truncate div, then film-text-content, then the review body text
+    for tag, class_name in (('div', 'truncate'), ('div', 'film-text-content'),
+                            ('div', 'review body-text -prose -hero prettify')):
+        element = soup.find(tag, class_=class_name)
+        p_tag = element.find('p') if element else None
+        if p_tag:
+            synopsis = p_tag.text.strip()
+        if synopsis:
+            break
+
+    # Extract cast information (returned as a list, stored in its own column)
+    cast_names = []
+    cast_element = soup.find('div', class_='cast-list text-sluglist')
+    if cast_element:
+        for link in cast_element.find_all('a', class_='text-slug'):
+            if 'show-cast-overflow' not in link.get('id', ''):  # Skip the "Show All" link
+                cast_names.append(link.text.strip())
+
+    # Combine tagline and synopsis with HTML formatting
+    if tagline and synopsis:
+        description = f"<strong>{tagline}</strong><br>{synopsis}"
+    elif tagline:
+        description = f"<strong>{tagline}</strong>"
+    elif synopsis:
+        description = synopsis
+    else:
+        description = "No description available"
+
+    # Get larger image - try the poster image first, then other image locations
+    image_url = None
+    poster_element = soup.find('img', class_='image')
+    if poster_element:
+        image_url = poster_element.get('src')
+
+    if not image_url:
+        image_element = soup.find('img', class_='poster-img')
+        if image_element:
+            image_url = image_element.get('src')
+
+    if not image_url:
+        image_element = soup.find('div', class_='film-poster')
+        img_tag = image_element.find('img') if image_element else None
+        if img_tag:
+            image_url = img_tag.get('src')
+
+    return {
+        'description': description,
+        'cast': cast_names,
+        'large_image_url': image_url
+    }
+
+
+def timed_call(fn, *args):
+    """Run a parse function, returning its result and the seconds it took in the worker"""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
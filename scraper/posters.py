@@ -0,0 +1,150 @@
+"""
+Resized WebP and JPEG variants of the downloaded posters.
+
+    python -m scraper.posters
+
+Posters are saved as Letterboxd sends them; every poster also gets
+variants at the widths pages show it at, named after a fingerprint of the
+original (Foo_1999-<fingerprint>-200w.webp), so their URLs change whenever
+the poster does and browsers may cache them for good. Variants need
+Pillow; without it pages keep using the original posters. Run the module
+to create the variants of posters downloaded before.
+"""
+import hashlib
+import io
+import os
+import re
+import threading
+from monitoring.metrics import timed
+
+# Originals live in static/images, their variants in a folder of their own
+IMAGE_DIR = os.path.join('static', 'images')
+VARIANT_DIR = os.path.join(IMAGE_DIR, 'variants')
+
+# Posters are shown 100px wide in result lists and 200px wide with the details open;
+# the larger widths serve high-density screens. A variant is never wider than its original.
+VARIANT_WIDTHS = (100, 200, 400)
+
+# (file extension, Pillow format, save options), the preferred format first
+VARIANT_FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 6}),
+    ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True})
+)
+
+FINGERPRINT_LENGTH = 10
+
+VARIANT_NAME = re.compile(r'^(?P<stem>.+)-(?P<fingerprint>[0-9a-f]{%d})-(?P<width>\d+)w\.(?P<extension>\w+)$'
+                          % FINGERPRINT_LENGTH)
+
+
+def pillow():
+    """Return PIL.Image, or None when Pillow is not installed"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+def poster_stem(image_path):
+    """Name shared by a poster and its variants, e.g. images/Foo_1999.jpg -> Foo_1999"""
+    return os.path.splitext(os.path.basename(image_path))[0]
+
+
+def make_variants(image_path, static_dir='static', variant_dir=VARIANT_DIR):
+    """
+    Create the variants of a poster, given by its path under static/.
+    Returns the fingerprint, or None when Pillow is missing or the poster
+    cannot be read. Variants of an earlier version of the poster are removed.
+    """
+    Image = pillow()
+    if Image is None or not image_path:
+        return None
+    stem = poster_stem(image_path)
+    try:
+        with open(os.path.join(static_dir, image_path), 'rb') as f:
+            data = f.read()
+        fingerprint = hashlib.sha1(data).hexdigest()[:FINGERPRINT_LENGTH]
+        os.makedirs(variant_dir, exist_ok=True)
+        with timed('image_variants'), Image.open(io.BytesIO(data)) as original:
+            image = original.convert('RGB')
+            for width in sorted({min(width, image.width) for width in VARIANT_WIDTHS}):
+                height = max(1, round(image.height * width / image.width))
+                resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+                for extension, image_format, options in VARIANT_FORMATS:
+                    path = os.path.join(variant_dir, f"{stem}-{fingerprint}-{width}w.{extension}")
+                    if os.path.exists(path):
+                        continue
+                    # Written under a temporary name first, so no page links a half-written file
+                    with open(path + '.tmp', 'wb') as f:
+                        resized.save(f, image_format, **options)
+                    os.replace(path + '.tmp', path)
+    except (OSError, ValueError) as e:
+        print(f"Could not create variants of {image_path}: {e}")
+        return None
+
+    for name in os.listdir(variant_dir):
+        match = VARIANT_NAME.match(name)
+        if match and match['stem'] == stem and match['fingerprint'] != fingerprint:
+            os.remove(os.path.join(variant_dir, name))
+    return fingerprint
+
+
+class VariantIndex:
+    """
+    The variants on disk by poster, read again whenever the variant folder
+    changes, so pages can link them without touching the files themselves.
+    """
+
+    def __init__(self, variant_dir=VARIANT_DIR):
+        self.variant_dir = variant_dir
+        self._mtime = None
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        found = {}
+        for name in os.listdir(self.variant_dir):
+            match = VARIANT_NAME.match(name)
+            if match:
+                formats = found.setdefault(match['stem'], {}).setdefault(match['fingerprint'], {})
+                formats.setdefault(match['extension'], []).append((int(match['width']), name))
+        variants = {}
+        for stem, fingerprints in found.items():
+            # Only complete sets count: a poster being converted keeps its old variants until it is done
+            for formats in fingerprints.values():
+                files = {extension: sorted(formats.get(extension, [])) for extension, _, _ in VARIANT_FORMATS}
+                widths = [[width for width, _ in names] for names in files.values()]
+                if all(widths) and all(w == widths[0] for w in widths):
+                    variants[stem] = files
+        return variants
+
+    def get(self, image_path):
+        """Return {extension: [(width, file name)]} for a poster, or None if it has no variants"""
+        if not image_path:
+            return None
+        try:
+            mtime = os.stat(self.variant_dir).st_mtime_ns
+        except OSError:
+            return None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._variants = self._scan()
+                    self._mtime = mtime
+        return self._variants.get(poster_stem(image_path))
+
+
+def main():
+    if pillow() is None:
+        print("Pillow is not installed; install it with: pip install Pillow")
+        return 1
+    # Variants that already exist are kept, so running this again only converts new or changed posters
+    done = sum(make_variants(f"images/{name}") is not None
+               for name in sorted(os.listdir(IMAGE_DIR)) if name.lower().endswith('.jpg'))
+    print(f"{done} posters have variants in {VARIANT_DIR}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,145 @@
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Request latency (seconds, smoothed) above which the foreground counts as busy
+LATENCY_THRESHOLD = 0.5
+
+# Half-life of the smoothed latency, so a past spike stops counting once traffic calms down
+LATENCY_HALF_LIFE = 10.0
+
+# How often a paused refresh checks whether the foreground calmed down
+BUSY_POLL_SECONDS = 2.0
+
+
+def in_window(moment, window):
+    """Tell whether a datetime falls in a (start hour, end hour) window, which may wrap past midnight"""
+    if window is None:
+        return True
+    start, end = window
+    hour = moment.hour
+    return start <= hour < end if start < end else hour >= start or hour < end
+
+
+def window_start(moment, window):
+    """Return the first moment at or after a datetime that falls in the window"""
+    if in_window(moment, window):
+        return moment
+    start = moment.replace(hour=window[0], minute=0, second=0, microsecond=0)
+    return start if start > moment else start + timedelta(days=1)
+
+
+class RefreshScheduler:
+    """
+    Runs a refresh job in the background every interval, give or take some jitter.
+
+    Runs only start inside the off-peak window, and the job is handed a
+    should_stop callback that blocks while request latency is high, so a
+    refresh pauses under foreground load and resumes once it calms down.
+    """
+
+    def __init__(self, job, interval, jitter=0.1, off_peak=None, latency_threshold=LATENCY_THRESHOLD,
+                 last_run=None):
+        # job(should_stop) runs one refresh; interval is a timedelta, jitter a fraction of it
+        self.job = job
+        self.interval = interval
+        self.jitter = jitter
+        self.off_peak = off_peak
+        self.latency_threshold = latency_threshold
+        self.last_run = last_run
+        self.last_result = None
+        self.state = 'stopped'
+
+        self._latency = 0.0
+        self._latency_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self.schedule(last_run)
+
+    def record_request(self, seconds):
+        """Feed the duration of a finished request into the smoothed latency"""
+        with self._lock:
+            self._latency = 0.8 * self._current_latency() + 0.2 * seconds
+            self._latency_at = time.monotonic()
+
+    def _current_latency(self):
+        return self._latency * 0.5 ** ((time.monotonic() - self._latency_at) / LATENCY_HALF_LIFE)
+
+    def busy(self):
+        """Tell whether requests are currently slow enough for a refresh to back off"""
+        return self._current_latency() > self.latency_threshold
+
+    def schedule(self, after=None):
+        """Pick the next run: one interval after a time, with jitter, moved into the off-peak window"""
+        base = (after or datetime.now()) + self.interval
+        base += self.interval * random.uniform(-self.jitter, self.jitter)
+        self.next_run = window_start(max(base, datetime.now()), self.off_peak)
+        return self.next_run
+
+    def run_soon(self):
+        """Run at the next off-peak moment, e.g. because the data is already stale"""
+        self.next_run = window_start(datetime.now(), self.off_peak)
+        self._wake.set()
+
+    def start(self):
+        """Start the scheduler thread"""
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the scheduler; a refresh in progress is asked to stop too"""
+        self._stopping = True
+        self._wake.set()
+
+    def _should_stop(self):
+        """Passed to the job: pauses it while the foreground is busy, and stops it with the scheduler"""
+        while self.busy() and not self._stopping:
+            self.state = 'paused'
+            time.sleep(BUSY_POLL_SECONDS)
+        self.state = 'running'
+        return self._stopping
+
+    def _loop(self):
+        while not self._stopping:
+            self.state = 'waiting'
+            delay = (self.next_run - datetime.now()).total_seconds()
+            if delay > 0:
+                # Wake up at least every minute, so a changed next_run is noticed
+                self._wake.wait(min(delay, 60))
+                self._wake.clear()
+                continue
+
+            # Let a burst of traffic pass before starting, and never start outside the window
+            if self._should_stop():
+                break
+            if not in_window(datetime.now(), self.off_peak):
+                self.next_run = window_start(datetime.now(), self.off_peak)
+                continue
+
+            print(f"Scheduled refresh started at {datetime.now():%Y-%m-%d %H:%M:%S}")
+            try:
+                self.last_result = 'Complete' if self.job(self._should_stop) else 'No changes'
+            except Exception as e:
+                self.last_result = f"Error: {e}"
+            self.last_run = datetime.now()
+            self.schedule(self.last_run)
+            print(f"Scheduled refresh finished ({self.last_result}), next run at {self.next_run:%Y-%m-%d %H:%M:%S}")
+        self.state = 'stopped'
+        self._thread = None
+
+    def status(self):
+        """Return the scheduler state as JSON-serializable values"""
+        return {
+            'state': self.state,
+            'next_run': self.next_run.isoformat(timespec='seconds') if self.next_run else None,
+            'last_run': self.last_run.isoformat(timespec='seconds') if self.last_run else None,
+            'last_result': self.last_result,
+            'request_latency_ms': round(self._current_latency() * 1000, 1),
+            'off_peak_hours': list(self.off_peak) if self.off_peak else None
+        }
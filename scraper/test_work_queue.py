@@ -0,0 +1,83 @@
+from scraper import work_queue
+from scraper.work_queue import WorkQueue
+
+
+def expire_leases(queue):
+    queue._conn.execute("UPDATE tasks SET lease_until = 0 WHERE status = 'leased'")
+
+
+def test_complete_and_fail_need_the_lease(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.db'))
+    queue.enqueue('page', {'genre': 'drama', 'page': 1})
+    task = queue.claim('worker-a')
+
+    # worker-a stalls past its lease and worker-b takes the task over
+    expire_leases(queue)
+    assert queue.claim('worker-b')['id'] == task['id']
+    assert queue.complete(task['id'], 'worker-a', {'rows': []}) is False
+    assert queue.fail(task['id'], 'worker-a', 'too late') is None
+    assert queue.counts() == {('page', 'leased'): 1}
+
+    assert queue.complete(task['id'], 'worker-b', {'rows': [1]}) is True
+    assert queue.results('page')[0][2] == {'rows': [1]}
+    assert queue.complete(task['id'], 'worker-b', {'rows': [2]}) is False
+    queue.close()
+
+
+def test_fail_retries_then_dead_letters(tmp_path, monkeypatch):
+    monkeypatch.setattr(work_queue, 'RETRY_DELAY_SECONDS', 0)
+    queue = WorkQueue(str(tmp_path / 'queue.db'))
+    queue.enqueue('detail', {'movie_url': '/film/alpha/'})
+    for attempt in range(1, work_queue.MAX_ATTEMPTS + 1):
+        task = queue.claim('worker-a')
+        assert task['attempts'] == attempt
+        assert queue.fail(task['id'], 'worker-a', 'boom') is (attempt < work_queue.MAX_ATTEMPTS)
+    assert queue.claim('worker-a') is None
+    assert [task['error'] for task in queue.dead_letters()] == ['boom']
+    queue.close()
+
+
+def fake_listing(genre):
+    return [{'title': f"{genre.title()} Movie", 'year': 2001, 'rating': 3.5, 'genre': genre.title(),
+             'image_url': None, 'movie_url': f"/film/{genre}-movie/"}]
+
+
+def test_crawl_can_be_seeded_again_after_collect(tmp_path, monkeypatch):
+    from scraper import worker
+    monkeypatch.setattr(worker, 'GENRES', ['drama', 'comedy'])
+    monkeypatch.setattr(worker, 'known_movies', lambda: set())
+    monkeypatch.setattr(worker, 'fetch_genre_page', lambda genre, **kwargs: genre)
+    monkeypatch.setattr(worker, 'parse_genre_page', lambda html, genre, max_movies: fake_listing(genre))
+    monkeypatch.setattr(worker, 'close_drivers', lambda: None)
+    data_file = str(tmp_path / 'movies.csv')
+    queue = WorkQueue(str(tmp_path / 'queue.db'))
+
+    for crawl in range(2):
+        assert worker.seed(queue) == 2
+        assert worker.run_worker(queue, exit_when_empty=True) == 4
+        assert worker.collect(queue, data_file) == 2
+        assert queue.counts() == {('genre', 'done'): 2, ('page', 'done'): 2}
+    queue.close()
+
+
+def test_detail_large_posters_are_collected(tmp_path, monkeypatch):
+    from scraper import worker
+    monkeypatch.setattr(worker, 'get_movie_description', lambda movie_url: {
+        'description': '<strong>Drama.</strong>', 'cast': ['Ann Lee'], 'large_image_url': 'https://img/large.jpg'})
+    monkeypatch.setattr(worker, 'download_image', lambda title, year, image_url, large=False:
+                        f"images/{title}_{year}{'_large' if large else ''}.jpg")
+    data_file = str(tmp_path / 'movies.csv')
+    queue = WorkQueue(str(tmp_path / 'queue.db'))
+    queue.enqueue('page', {'genre': 'drama', 'page': 1, 'max_movies': 72, 'details': True})
+    page = queue.claim('worker-a')
+    queue.complete(page['id'], 'worker-a', {'rows': [{**fake_listing('drama')[0], 'image_path': None}]})
+    queue.enqueue('detail', {'movie_url': '/film/drama-movie/', 'title': 'Drama Movie', 'year': 2001})
+    detail = queue.claim('worker-a')
+    queue.complete(detail['id'], 'worker-a', worker.run_detail(detail['payload'], data_file))
+
+    worker.collect(queue, data_file)
+    import pandas as pd
+    movies = pd.read_csv(data_file)
+    assert movies['large_image_path'].tolist() == ['images/Drama Movie_2001_large.jpg']
+    assert queue.results('detail') == []
+    queue.close()
@@ -0,0 +1,148 @@
+import json
+import os
+import sqlite3
+import time
+
+# Database file shared by every worker process
+QUEUE_FILE = 'data/work_queue.db'
+
+# A claimed task returns to the queue if its worker does not finish it in time
+LEASE_SECONDS = 5 * 60
+
+# Failed tasks are retried with exponential backoff, then dead-lettered
+MAX_ATTEMPTS = 3
+RETRY_DELAY_SECONDS = 30
+
+# Kinds of crawl tasks
+TASK_KINDS = ('genre', 'page', 'detail')
+
+
+class WorkQueue:
+    """
+    Durable crawl tasks in SQLite, shared by any number of worker processes.
+
+    A worker leases a task before running it; a worker that crashes simply
+    lets its lease expire and the task is handed out again. Tasks that keep
+    failing are moved to the dead letters instead of being retried forever.
+    """
+
+    def __init__(self, path=QUEUE_FILE):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Each operation is one short transaction; workers in other processes wait up to the timeout
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS tasks ('
+                           'id INTEGER PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, '
+                           "status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, "
+                           'available_at REAL NOT NULL DEFAULT 0, lease_until REAL, worker TEXT, '
+                           'error TEXT, result TEXT, collected INTEGER NOT NULL DEFAULT 0, '
+                           'UNIQUE (kind, payload))')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, available_at)')
+
+    def close(self):
+        self._conn.close()
+
+    @staticmethod
+    def _task(row):
+        task_id, kind, payload, attempts = row
+        return {'id': task_id, 'kind': kind, 'payload': json.loads(payload), 'attempts': attempts}
+
+    def enqueue(self, kind, payload):
+        """Add a task unless the same task is already queued; returns True if it was added"""
+        if kind not in TASK_KINDS:
+            raise ValueError(f"Unknown task kind: {kind}")
+        cursor = self._conn.execute('INSERT OR IGNORE INTO tasks (kind, payload) VALUES (?, ?)',
+                                    (kind, json.dumps(payload, sort_keys=True)))
+        return cursor.rowcount == 1
+
+    def claim(self, worker, kinds=TASK_KINDS):
+        """Lease the next available task to a worker, or return None if there is none"""
+        now = time.time()
+        placeholders = ', '.join('?' * len(kinds))
+        # BEGIN IMMEDIATE takes the write lock, so two workers never lease the same task
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Leases that ran out count as failed attempts
+            self._conn.execute("UPDATE tasks SET status = 'dead', error = 'Lease expired' "
+                               "WHERE status = 'leased' AND lease_until < ? AND attempts >= ?",
+                               (now, MAX_ATTEMPTS))
+            row = self._conn.execute(
+                'SELECT id, kind, payload, attempts FROM tasks '
+                f"WHERE kind IN ({placeholders}) AND ((status = 'pending' AND available_at <= ?) "
+                "OR (status = 'leased' AND lease_until < ?)) ORDER BY id LIMIT 1",
+                (*kinds, now, now)).fetchone()
+            if row is None:
+                self._conn.execute('COMMIT')
+                return None
+            self._conn.execute("UPDATE tasks SET status = 'leased', attempts = attempts + 1, lease_until = ?, "
+                               'worker = ? WHERE id = ?', (now + LEASE_SECONDS, worker, row[0]))
+            self._conn.execute('COMMIT')
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+        task = self._task(row)
+        task['attempts'] += 1
+        return task
+
+    def complete(self, task_id, worker, result=None):
+        """Mark a task leased to worker as done, storing its result; returns False if the lease was lost"""
+        cursor = self._conn.execute("UPDATE tasks SET status = 'done', lease_until = NULL, error = NULL, result = ? "
+                                    "WHERE id = ? AND worker = ? AND status = 'leased'",
+                                    (json.dumps(result), task_id, worker))
+        return cursor.rowcount == 1
+
+    def fail(self, task_id, worker, error):
+        """
+        Return a failed task to the queue with a backoff, or dead-letter it after MAX_ATTEMPTS.
+        Returns True if it will be retried, False if it was dead-lettered and None if the lease was lost.
+        """
+        # The lease may have run out and the task been handed to another worker meanwhile
+        lease = "WHERE id = ? AND worker = ? AND status = 'leased'"
+        row = self._conn.execute(f'SELECT attempts FROM tasks {lease}', (task_id, worker)).fetchone()
+        if row is None:
+            return None
+        attempts = row[0]
+        if attempts >= MAX_ATTEMPTS:
+            cursor = self._conn.execute(f"UPDATE tasks SET status = 'dead', lease_until = NULL, error = ? {lease}",
+                                        (str(error), task_id, worker))
+            return False if cursor.rowcount == 1 else None
+        cursor = self._conn.execute(f"UPDATE tasks SET status = 'pending', lease_until = NULL, error = ?, "
+                                    f'available_at = ? {lease}',
+                                    (str(error), time.time() + RETRY_DELAY_SECONDS * 2 ** (attempts - 1),
+                                     task_id, worker))
+        return True if cursor.rowcount == 1 else None
+
+    def results(self, kind):
+        """Return (task id, payload, result) of finished tasks not collected yet"""
+        rows = self._conn.execute("SELECT id, payload, result FROM tasks WHERE kind = ? AND status = 'done' "
+                                  'AND collected = 0 ORDER BY id', (kind,)).fetchall()
+        return [(task_id, json.loads(payload), json.loads(result)) for task_id, payload, result in rows]
+
+    def mark_collected(self, task_ids):
+        """Mark finished tasks as merged into the catalog"""
+        self._conn.executemany('UPDATE tasks SET collected = 1 WHERE id = ?', [(task_id,) for task_id in task_ids])
+
+    def clear_collected(self):
+        """Forget tasks already merged into the catalog, so the same crawl can be queued again"""
+        # Genre tasks only queue pages and have nothing to collect
+        cursor = self._conn.execute("DELETE FROM tasks WHERE status = 'done' AND (collected = 1 OR kind = 'genre')")
+        return cursor.rowcount
+
+    def dead_letters(self):
+        """Return the tasks that failed too often, with their last error"""
+        rows = self._conn.execute("SELECT id, kind, payload, attempts, error FROM tasks WHERE status = 'dead' "
+                                  'ORDER BY id').fetchall()
+        return [{'id': task_id, 'kind': kind, 'payload': json.loads(payload), 'attempts': attempts, 'error': error}
+                for task_id, kind, payload, attempts, error in rows]
+
+    def retry_dead(self):
+        """Put every dead-lettered task back in the queue; returns how many there were"""
+        cursor = self._conn.execute("UPDATE tasks SET status = 'pending', attempts = 0, available_at = 0 "
+                                    "WHERE status = 'dead'")
+        return cursor.rowcount
+
+    def counts(self):
+        """Return {(kind, status): number of tasks}"""
+        rows = self._conn.execute('SELECT kind, status, COUNT(*) FROM tasks GROUP BY kind, status').fetchall()
+        return {(kind, status): count for kind, status, count in rows}
@@ -0,0 +1,213 @@
+"""
+Crawl worker processes sharing one durable work queue.
+
+    python -m scraper.worker seed [--pages N] [--max-movies N] [--details]
+    python -m scraper.worker run [--kinds genre,page,detail] [--exit-when-empty]
+    python -m scraper.worker collect
+    python -m scraper.worker status
+    python -m scraper.worker retry-dead
+
+Any number of `run` processes, on this machine or others sharing the data
+directory, claim tasks from the queue; `collect` merges their results into
+the movies CSV file and publishes them to running apps as one delta.
+"""
+import argparse
+import os
+import socket
+import time
+import pandas as pd
+from catalog.deltas import catalog_version, publish_delta, write_movies
+from catalog.genres import merge_genre_rows
+from catalog.movie_catalog import DATA_FILE, store_details
+from catalog.movie_table import movie_id
+from catalog.text_store import get_text_store, text_store_path
+from monitoring.metrics import timed
+from scraper.movie_scraper import (GENRES, close_drivers, download_image, fetch_genre_page,
+                                   get_movie_description)
+from scraper.parsing import parse_genre_page
+from scraper.work_queue import QUEUE_FILE, TASK_KINDS, WorkQueue
+
+# How long an idle worker waits before asking the queue again
+POLL_SECONDS = 5
+
+
+def known_movies(data_file=DATA_FILE):
+    """Return the URLs of the movies already in the CSV file"""
+    if not os.path.exists(data_file):
+        return set()
+    return set(pd.read_csv(data_file, usecols=['movie_url'])['movie_url'].dropna())
+
+
+def seed(queue, pages=1, max_movies=72, details=False):
+    """Queue one genre task per genre; each expands into page tasks when it runs"""
+    queue.clear_collected()
+    added = sum(queue.enqueue('genre', {'genre': genre, 'pages': pages, 'max_movies': max_movies,
+                                        'details': details})
+                for genre in GENRES)
+    print(f"Queued {added} genre tasks")
+    return added
+
+
+def run_genre(queue, payload):
+    """Expand a genre into one task per listing page"""
+    for page in range(1, payload['pages'] + 1):
+        queue.enqueue('page', {'genre': payload['genre'], 'page': page, 'max_movies': payload['max_movies'],
+                               'details': payload['details']})
+    return {'pages': payload['pages']}
+
+
+def run_page(queue, payload, known):
+    """Fetch and parse one listing page, download new posters and queue their details"""
+    html = fetch_genre_page(payload['genre'], rate_limit=True, page=payload['page'])
+    with timed('parse'):
+        records = parse_genre_page(html, payload['genre'], payload['max_movies'])
+    for record in records:
+        image_url = record.pop('image_url')
+        record['description'] = "Details"
+        record['image_path'] = None
+        if record['movie_url'] in known:
+            continue
+        if image_url:
+            record['image_path'] = download_image(record['title'], record['year'], image_url)
+        if payload['details'] and record['movie_url']:
+            queue.enqueue('detail', {'movie_url': record['movie_url'], 'title': record['title'],
+                                     'year': record['year']})
+    return {'rows': records}
+
+
+def run_detail(payload, data_file=DATA_FILE):
+    """Fetch the description and cast of a movie straight into the text store, and its large poster"""
+    details = get_movie_description(payload['movie_url'])
+    if details['description'] == "Error loading description":
+        raise RuntimeError(f"Could not load the details of {payload['movie_url']}")
+
+    texts = get_text_store(text_store_path(data_file))
+    changes = store_details(texts, movie_id(payload['movie_url']), details['description'], details['cast'])
+    if changes is not None and os.path.exists(data_file):
+        publish_delta(data_file, catalog_version(data_file),
+                      texts=[{'movie_url': payload['movie_url'], 'old': changes[0], 'new': changes[1]}])
+    # The movie may not be in the CSV file yet, so collect() records the poster path
+    large_image_path = None
+    if details['large_image_url']:
+        large_image_path = download_image(payload['title'], payload['year'], details['large_image_url'], large=True)
+    return {'large_image_path': large_image_path}
+
+
+def run_task(queue, task, known):
+    """Run one claimed task and return its result"""
+    if task['kind'] == 'genre':
+        return run_genre(queue, task['payload'])
+    if task['kind'] == 'page':
+        return run_page(queue, task['payload'], known)
+    return run_detail(task['payload'])
+
+
+def run_worker(queue, kinds=TASK_KINDS, exit_when_empty=False):
+    """Claim and run tasks until the queue is empty (if asked to exit then) or the worker is stopped"""
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    known = known_movies()
+    done = 0
+    print(f"Worker {worker} started")
+    try:
+        while True:
+            task = queue.claim(worker, kinds)
+            if task is None:
+                if exit_when_empty:
+                    break
+                time.sleep(POLL_SECONDS)
+                continue
+            try:
+                if queue.complete(task['id'], worker, run_task(queue, task, known)):
+                    done += 1
+                else:
+                    print(f"Task {task['id']} ({task['kind']}) finished after its lease was lost; result dropped")
+            except Exception as e:
+                retried = queue.fail(task['id'], worker, e)
+                if retried is None:
+                    print(f"Task {task['id']} ({task['kind']}) failed after its lease was lost: {e}")
+                else:
+                    print(f"Task {task['id']} ({task['kind']}) failed: {e}; "
+                          f"{'will retry' if retried else 'moved to dead letters'}")
+    finally:
+        close_drivers()
+    print(f"Worker {worker} finished {done} tasks")
+    return done
+
+
+def collect(queue, data_file=DATA_FILE):
+    """Merge the rows of finished page tasks and the large posters of detail tasks into the CSV file as one delta"""
+    results = queue.results('page')
+    details = queue.results('detail')
+    rows = [row for _, _, result in results for row in result['rows']]
+    large_images = {payload['movie_url']: result['large_image_path'] for _, payload, result in details
+                    if result and result.get('large_image_path')}
+    existing_df = pd.read_csv(data_file) if os.path.exists(data_file) else None
+    if not rows and (not large_images or existing_df is None):
+        print("No new results to collect")
+        return 0
+
+    combined_df = merge_genre_rows(pd.concat([existing_df, pd.DataFrame(rows)]))
+    if 'large_image_path' not in combined_df:
+        combined_df['large_image_path'] = None
+    combined_df['large_image_path'] = combined_df['large_image_path'].astype(object)
+    if large_images:
+        missing = combined_df['movie_url'].isin(list(large_images)) & combined_df['large_image_path'].isna()
+        combined_df.loc[missing, 'large_image_path'] = combined_df.loc[missing, 'movie_url'].map(large_images)
+    if existing_df is not None:
+        write_movies(combined_df, data_file, previous_df=existing_df)
+    else:
+        write_movies(combined_df, data_file)
+    queue.mark_collected([task_id for task_id, _, _ in results + details])
+    print(f"Collected {len(rows)} rows from {len(results)} pages and {len(large_images)} large posters "
+          f"(total: {len(combined_df)} movies)")
+    return len(rows)
+
+
+def print_status(queue):
+    """Print the number of tasks of each kind and status, and the dead letters"""
+    counts = queue.counts()
+    for kind in TASK_KINDS:
+        statuses = {status: count for (task_kind, status), count in counts.items() if task_kind == kind}
+        print(f"{kind:>6}: " + (', '.join(f"{count} {status}" for status, count in sorted(statuses.items()))
+                                or 'none'))
+    for task in queue.dead_letters():
+        print(f"Dead: {task['kind']} {task['payload']} after {task['attempts']} attempts: {task['error']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m scraper.worker', description='Distributed crawl worker')
+    parser.add_argument('--queue', default=QUEUE_FILE, help='work queue database file')
+    commands = parser.add_subparsers(dest='command', required=True)
+    seed_parser = commands.add_parser('seed', help='queue a crawl of every genre')
+    seed_parser.add_argument('--pages', type=int, default=1, help='listing pages per genre')
+    seed_parser.add_argument('--max-movies', type=int, default=72, help='movies taken from each page')
+    seed_parser.add_argument('--details', action='store_true', help='also fetch descriptions and cast')
+    run_parser = commands.add_parser('run', help='claim and run tasks')
+    run_parser.add_argument('--kinds', default=','.join(TASK_KINDS), help='comma-separated task kinds to run')
+    run_parser.add_argument('--exit-when-empty', action='store_true', help='stop once no task is available')
+    commands.add_parser('collect', help='merge finished pages into the movies CSV file')
+    commands.add_parser('status', help='show queue counts and dead letters')
+    commands.add_parser('retry-dead', help='queue dead-lettered tasks again')
+    args = parser.parse_args(argv)
+
+    os.makedirs('static/images', exist_ok=True)
+    queue = WorkQueue(args.queue)
+    try:
+        if args.command == 'seed':
+            seed(queue, args.pages, args.max_movies, args.details)
+        elif args.command == 'run':
+            run_worker(queue, tuple(args.kinds.split(',')), args.exit_when_empty)
+        elif args.command == 'collect':
+            collect(queue)
+        elif args.command == 'status':
+            print_status(queue)
+        else:
+            print(f"Queued {queue.retry_dead()} dead-lettered tasks again")
+    finally:
+        queue.close()
+
+
+if __name__ == '__main__':
+    import multiprocessing
+    multiprocessing.freeze_support()
+    main()
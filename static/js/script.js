@@ -38,12 +38,48 @@ function showMovieDetails(movieUrl) {
                     // Update description - use innerHTML to render HTML formatting
                     descElement.innerHTML = data.description;
                     
-                    // Update image if available
+                    // Add the precomputed similar movies
+                    // Titles come from scraped pages, so they are set as text rather than HTML
+                    if (data.similar && data.similar.length) {
+                        descElement.appendChild(document.createElement('br'));
+                        descElement.appendChild(document.createElement('br'));
+                        const heading = document.createElement('strong');
+                        heading.textContent = 'More like this:';
+                        descElement.appendChild(heading);
+                        data.similar.forEach((movie, i) => {
+                            descElement.appendChild(document.createTextNode(i ? ', ' : ' '));
+                            const link = document.createElement('a');
+                            link.href = `https://letterboxd.com${movie.movie_url}`;
+                            link.target = '_blank';
+                            link.className = 'similar-link';
+                            link.textContent = movie.year ? `${movie.title} (${movie.year})` : movie.title;
+                            descElement.appendChild(link);
+                        });
+                    }
+                    
+                    // Update image if available, with its variants when there are any
                     if (data.large_image_path) {
                         const imgElement = movieCard.querySelector('.movie-poster img');
                         if (imgElement) {
-                            const newImgSrc = `/static/${data.large_image_path}`;
+                            const sourceElement = movieCard.querySelector('.movie-poster source');
+                            const variants = data.large_image;
+                            const newImgSrc = variants ? variants.src : `/static/${data.large_image_path}`;
                             console.log("Setting new image src:", newImgSrc);
+                            // A <source> would keep showing the small poster, so it follows the image
+                            if (sourceElement) {
+                                if (variants) {
+                                    sourceElement.srcset = variants.webp;
+                                    sourceElement.sizes = '200px';
+                                } else {
+                                    sourceElement.remove();
+                                }
+                            }
+                            if (variants) {
+                                imgElement.srcset = variants.jpg;
+                                imgElement.sizes = '200px';
+                            } else {
+                                imgElement.removeAttribute('srcset');
+                            }
                             imgElement.src = newImgSrc;
                         }
                     }
@@ -58,4 +94,28 @@ function showMovieDetails(movieUrl) {
                 });
         }
     }
-}
\ No newline at end of file
+}
+
+let suggestTimeout;
+
+function suggestTitles(input) {
+    // Wait until the user pauses typing before asking for suggestions
+    clearTimeout(suggestTimeout);
+    suggestTimeout = setTimeout(() => {
+        const prefix = input.value.trim();
+        const datalist = document.getElementById(input.getAttribute('list'));
+        if (!datalist || prefix.length < 2) return;
+        
+        fetch(`/api/suggest?q=${encodeURIComponent(prefix)}`)
+            .then(response => response.json())
+            .then(data => {
+                datalist.innerHTML = '';
+                (data.suggestions || []).forEach(movie => {
+                    const option = document.createElement('option');
+                    option.value = movie.title;
+                    datalist.appendChild(option);
+                });
+            })
+            .catch(error => console.error('Error fetching suggestions:', error));
+    }, 150);
+}